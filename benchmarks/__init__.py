@@ -0,0 +1,3 @@
+"""
+Benchmarks for the Canvus-Local-LLM application.
+"""
@@ -0,0 +1,120 @@
+"""
+Benchmark for micro-batching of short prompts.
+
+Replays bursts of short prompts against a simulated Ollama server and
+compares sending them directly with sending them through ``PromptBatcher``
+at several window sizes. Each burst mixes several system prompts.
+
+The simulated server has ``num_parallel`` slots. Each slot keeps the KV
+cache of the last system prompt it processed, as Ollama does. A request
+costs prefill time for every token not covered by its slot's cached prefix,
+plus decode time for its output. The benchmark reports throughput and
+p50/p95 latency for each setup.
+
+Usage:
+    python -m benchmarks.bench_batching [--bursts 5] [--burst-size 24] [--parallel 1]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Set
+
+import httpx
+from loguru import logger
+
+from src.batching import PromptBatcher
+from src.ollama_client import OllamaClient
+
+SYSTEM_TOKENS = 800
+PROMPT_TOKENS = 30
+OUTPUT_TOKENS = 40
+PREFILL_SECONDS = 0.0001
+DECODE_SECONDS = 0.001
+
+
+class SimulatedOllama:
+    """Ollama stand-in with per-slot system prompt caching."""
+
+    def __init__(self, num_parallel: int):
+        self.slot_prefix: List[Optional[str]] = [None] * num_parallel
+        self.free: Set[int] = set(range(num_parallel))
+        self.available = asyncio.Condition()
+        self.cache_hits = 0
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        system = body.get("system", "")
+        async with self.available:
+            await self.available.wait_for(lambda: bool(self.free))
+            warm = [s for s in self.free if self.slot_prefix[s] == system]
+            slot = warm[0] if warm else next(iter(self.free))
+            self.free.discard(slot)
+        hit = self.slot_prefix[slot] == system
+        prefill = PROMPT_TOKENS + (0 if hit else SYSTEM_TOKENS)
+        await asyncio.sleep(prefill * PREFILL_SECONDS + OUTPUT_TOKENS * DECODE_SECONDS)
+        self.slot_prefix[slot] = system
+        self.requests += 1
+        self.cache_hits += hit
+        async with self.available:
+            self.free.add(slot)
+            self.available.notify()
+        return httpx.Response(200, json={"response": "ok", "done": True})
+
+
+async def run(
+    window_ms: Optional[int], bursts: int, burst_size: int, parallel: int, seed: int = 7
+) -> Dict[str, float]:
+    """Replay the workload once; ``window_ms=None`` sends prompts directly."""
+    server = SimulatedOllama(parallel)
+    client = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(server.handle))
+    llm = client if window_ms is None else PromptBatcher(
+        client, window=window_ms / 1000, max_batch=burst_size, parallelism=parallel
+    )
+    rng = random.Random(seed)
+    systems = [f"template {i} " + "instructions " * 100 for i in range(3)]
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        await asyncio.sleep(rng.uniform(0, 0.05))
+        started = time.perf_counter()
+        await llm.generate(f"note {index}", systems[index % len(systems)])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for burst in range(bursts):
+        await asyncio.gather(*(one(burst * burst_size + i) for i in range(burst_size)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "hit_rate": server.cache_hits / server.requests,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=24)
+    parser.add_argument("--parallel", type=int, default=1, help="simulated OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--windows", type=int, nargs="+", default=[5, 25, 50, 100])
+    args = parser.parse_args()
+    logger.remove()
+
+    print(f"{'setup':>12} {'prompts/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'cache hits':>11}")
+    for window in [None, *args.windows]:
+        r = asyncio.run(run(window, args.bursts, args.burst_size, args.parallel))
+        name = "direct" if window is None else f"batch {window}ms"
+        print(f"{name:>12} {r['throughput']:>10.1f} {r['p50'] * 1000:>8.0f} "
+              f"{r['p95'] * 1000:>8.0f} {r['hit_rate']:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for the canvas analysis model.
+
+Builds synthetic canvases (default 10k widgets with 50 anchors and 2k
+connectors) and compares grid-indexed anchor classification against a naive
+containment scan, then times token-budgeted region input generation.
+
+Usage:
+    python -m benchmarks.bench_canvas_model [--widgets 10000] [--anchors 50]
+"""
+
+import argparse
+import random
+import time
+
+from src.canvas_model import CanvasModel
+
+
+def synthetic_canvas(widgets: int, anchors: int, connectors: int, seed: int = 1) -> list:
+    """Return a synthetic ``GET /widgets`` response."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(anchors):
+        items.append({
+            "id": f"a{i}", "widget_type": "Anchor", "anchor_name": f"Area {i}",
+            "location": {"x": rng.uniform(0, 95000), "y": rng.uniform(0, 95000)},
+            "size": {"width": rng.uniform(2000, 8000), "height": rng.uniform(2000, 8000)},
+            "parent_id": "bg", "scale": 1, "state": "normal",
+        })
+    for i in range(widgets):
+        items.append({
+            "id": f"w{i}", "widget_type": rng.choice(["Note", "Note", "Image", "Pdf"]),
+            "title": f"Item {i}", "text": "lorem ipsum dolor sit amet " * rng.randint(1, 8),
+            "location": {"x": rng.uniform(0, 100000), "y": rng.uniform(0, 100000)},
+            "size": {"width": 300, "height": 300},
+            "parent_id": "bg", "scale": 1, "state": "normal",
+        })
+    for i in range(connectors):
+        items.append({
+            "id": f"k{i}", "widget_type": "Connector", "state": "normal",
+            "src": {"id": f"w{rng.randrange(widgets)}"},
+            "dst": {"id": f"w{rng.randrange(widgets)}"},
+        })
+    return items
+
+
+def naive_classify(model: CanvasModel) -> int:
+    """O(widgets x anchors) containment scan, for comparison."""
+    anchors = [i for i in model.items.values() if i.widget_type == "Anchor"]
+    matched = 0
+    for item in model.items.values():
+        if item.widget_type == "Anchor":
+            continue
+        x, y = item.center
+        if [a for a in anchors if a.contains(x, y)]:
+            matched += 1
+    return matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--widgets", type=int, default=10000)
+    parser.add_argument("--anchors", type=int, default=50)
+    parser.add_argument("--connectors", type=int, default=2000)
+    parser.add_argument("--budget", type=int, default=3000)
+    args = parser.parse_args()
+
+    widgets = synthetic_canvas(args.widgets, args.anchors, args.connectors)
+
+    started = time.perf_counter()
+    model = CanvasModel.from_widgets(widgets, cell_size=5000)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive_classify(model)
+    naive = time.perf_counter() - started
+
+    started = time.perf_counter()
+    inputs = model.region_inputs(args.budget)
+    model.global_input({region: "x" * 2000 for region in inputs}, args.budget)
+    render = time.perf_counter() - started
+
+    largest = max(len(text) // 4 for text in inputs.values())
+    print(f"widgets={args.widgets} anchors={args.anchors} connectors={args.connectors}")
+    print(f"build + grid classification: {build * 1000:8.1f} ms")
+    print(f"naive containment scan:      {naive * 1000:8.1f} ms")
+    print(f"region + global inputs:      {render * 1000:8.1f} ms "
+          f"({len(inputs)} regions, largest ~{largest} tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark for the logging pipeline on the event-processing path.
+
+Replays a stream of widget events at a fixed rate (default 1k events/sec)
+through an asyncio loop. Each event emits the application's per-event log
+lines: a widget-diff debug message (sampled with the new setup) plus an
+occasional info line.
+The benchmark reports how long the loop thread spends inside logging calls
+per event, and how long the final flush takes. It compares no sinks, the
+previous synchronous DEBUG file sink, loguru's ``enqueue=True``, and the
+background sinks at INFO, DEBUG (default), and DEBUG with JSON.
+
+Usage:
+    python -m benchmarks.bench_logging [--rate 1000] [--seconds 3]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from loguru import logger
+
+from src.logging_setup import FILE_FORMAT, configure_logging, sampled
+
+_diff_log = sampled("widget_diff")
+
+
+def setup_none(log_dir: Path) -> None:
+    logger.remove()
+
+
+def setup_sync(log_dir: Path) -> None:
+    """The original configuration: unsampled, synchronous DEBUG file sink."""
+    logger.remove()
+    logger.add(log_dir / "sync.log", level="DEBUG", format=FILE_FORMAT)
+
+
+def setup_loguru_enqueue(log_dir: Path) -> None:
+    """Loguru's multiprocessing-queue sink, for comparison."""
+    logger.remove()
+    logger.add(log_dir / "enqueue.log", level="DEBUG", format=FILE_FORMAT, enqueue=True)
+
+
+def setup_background_info(log_dir: Path) -> None:
+    configure_logging(level="ERROR", log_file=str(log_dir / "app.log"), file_level="INFO")
+
+
+def setup_background(log_dir: Path) -> None:
+    configure_logging(level="ERROR", log_file=str(log_dir / "app.log"))
+
+
+def setup_background_json(log_dir: Path) -> None:
+    configure_logging(level="ERROR", log_file=str(log_dir / "app.log"), json_logs=True)
+
+
+async def replay(rate: int, seconds: float, diff_log: Any) -> List[float]:
+    """Emit per-event log lines at ``rate`` events/sec; return per-event costs."""
+    costs = []
+    interval = 1 / rate
+    started = time.perf_counter()
+    for index in range(int(rate * seconds)):
+        before = time.perf_counter()
+        diff_log.debug(
+            "Canvas {} widget change: {}", "c1", f"UPDATED Note w{index % 500} fields=['text']"
+        )
+        if index % 100 == 0:
+            logger.info(f"Processed {index} events")
+        costs.append(time.perf_counter() - before)
+        delay = started + (index + 1) * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    return costs
+
+
+def run(
+    name: str, setup: Callable[[Path], None], rate: int, seconds: float, diff_log: Any
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(Path(tmp))
+        costs = asyncio.run(replay(rate, seconds, diff_log))
+        flush_started = time.perf_counter()
+        logger.remove()
+        flush = time.perf_counter() - flush_started
+    costs.sort()
+    p99 = costs[int(len(costs) * 0.99)]
+    print(
+        f"{name:>14}: mean {statistics.mean(costs) * 1e6:7.1f} us/event  "
+        f"p99 {p99 * 1e6:7.1f} us  "
+        f"loop share {statistics.mean(costs) * rate * 100:5.2f}%  "
+        f"flush {flush * 1000:6.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    for name, setup, diff_log in (
+        ("no sinks", setup_none, logger),
+        ("sync DEBUG", setup_sync, logger),
+        ("loguru enqueue", setup_loguru_enqueue, logger),
+        ("bg INFO", setup_background_info, _diff_log),
+        ("bg DEBUG", setup_background, _diff_log),
+        ("bg DEBUG JSON", setup_background_json, _diff_log),
+    ):
+        run(name, setup, args.rate, args.seconds, diff_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Replay-driven load test for the whole trigger pipeline.
+
+Starts a ``MockCanvus`` and a ``MockOllama`` on loopback ports and runs the
+application itself, ``CanvusLLMInterface``, against them over real HTTP:
+
+canvas discovery -> subscription streams -> widget store diff -> trigger
+detection -> duplicate suppression -> job journal -> processing scheduler
+-> text workflow (strip braces, response note) -> streamed Ollama
+generation -> write-back of the answer and the restored trigger note.
+
+The Canvus stand-in replays a recording (``--recording``) or a synthetic
+workload. The run reports events handled per second, trigger-to-response
+p50/p95/p99 and peak RSS. It needs no GPU or network, so it can run in CI.
+
+Absolute timings depend on the machine, so ``--check`` compares values
+that mostly do not with a stored baseline: the share of the offered event
+rate handled, latencies as a multiple of the simulated generation time,
+Canvus requests per trigger and peak RSS. It exits with status 1 when one
+of them is worse than the baseline by more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--canvases 20] [--rate 5] [--duration 5]
+    python -m benchmarks.bench_pipeline --check
+    python -m benchmarks.bench_pipeline --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from benchmarks.mock_servers import (
+    MockCanvus,
+    MockOllama,
+    load_recording,
+    save_recording,
+    synthetic_events,
+)
+from src.config import Config
+from src.main import CanvusLLMInterface
+
+BASELINE = Path(__file__).with_name("baseline_pipeline.json")
+# Results that --check compares with the baseline, besides delivery_ratio; higher is worse
+CHECKED_KEYS = ("p50_ratio", "p95_ratio", "p99_ratio", "requests_per_trigger", "rss_mb")
+
+
+class BenchApplication(CanvusLLMInterface):
+    """The application with a given configuration, counting the widget events it handles."""
+
+    def __init__(self, config: Config):
+        """Initialize the application without reading the user's configuration."""
+        self._bench_config = config
+        self.handled = 0
+        self.last_handled_at = 0.0
+        super().__init__(headless=True)
+
+    def _load_configuration(self) -> None:
+        """Use the benchmark configuration."""
+        self.config = self._bench_config
+
+    def _setup_logging(self) -> None:
+        """Leave logging to the caller; bench_logging measures its cost."""
+
+    async def _handle_widget_event(self, canvas_id: str, widget: Dict[str, Any]) -> None:
+        """Count the event and handle it as the application does."""
+        self.handled += 1
+        self.last_handled_at = time.monotonic()
+        await super()._handle_widget_event(canvas_id, widget)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+async def _wait_for(condition: Callable[[], bool], timeout: float) -> bool:
+    """Poll ``condition`` until it holds or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def run(args: argparse.Namespace) -> Dict[str, float]:
+    """Run the replay once and return its results."""
+    if args.recording:
+        events = load_recording(Path(args.recording))
+    else:
+        events = synthetic_events(args.canvases, args.rate, args.duration, args.trigger_every)
+    if args.record:
+        save_recording(Path(args.record), events)
+
+    canvus = MockCanvus(events, speed=args.speed)
+    ollama = MockOllama(
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        load_delay=args.load_delay,
+        failure_rate=args.failure_rate,
+        parallel=args.parallel,
+    )
+    canvus_url = await canvus.start()
+    ollama_url = await ollama.start()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        config = Config(
+            canvus_server_url=canvus_url,
+            canvus_api_key="bench",
+            ollama_server_url=ollama_url,
+            ollama_num_parallel=args.parallel,
+            max_retries=2,
+            retry_delay=1,
+            # The write limits protect a shared server; throttled, the run would only measure them
+            write_back_window_ms=20,
+            canvus_write_rate=10000,
+            canvus_write_burst=1000,
+            canvus_write_concurrency=32,
+            cache_dir=cache_dir,
+            metrics_port=0,
+            config_watch_interval_ms=0,
+            shutdown_timeout_ms=30000,
+        )
+        app = BenchApplication(config)
+        running = asyncio.ensure_future(app.start())
+        try:
+            await _wait_for(lambda: canvus.all_subscribed.is_set() or running.done(), timeout=30)
+            if running.done():
+                running.result()  # Raises why the application stopped
+            await _wait_for(lambda: bool(ollama.loaded), timeout=30)
+            started = time.monotonic()
+            canvus.start_replay()
+            replay_seconds = (events[-1][0] if events else 0) / args.speed
+            await asyncio.sleep(replay_seconds)
+            await _wait_for(lambda: app.handled >= len(events), timeout=30)
+            await app.processing_queue.drain(30)
+            await app.write_back.flush()
+            handled_seconds = max(app.last_handled_at - started, 1e-6)
+        finally:
+            app.request_stop()
+            await running
+            await canvus.close()
+            await ollama.close()
+
+    latencies = sorted(canvus.latencies())
+    triggers = len(canvus.triggers_sent)
+    offered = len(events) / replay_seconds if replay_seconds else float(len(events))
+    generation = args.output_tokens / args.tokens_per_second
+    result = {
+        "events": len(events),
+        "events_per_second": round(app.handled / handled_seconds, 1),
+        "triggers": triggers,
+        "answered": len(latencies),
+        "errors": canvus.errors,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else 0.0,
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "canvus_requests": sum(canvus.requests.values()),
+        "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    result.update({
+        "delivery_ratio": round(min(1.0, result["events_per_second"] / offered), 3),
+        "p50_ratio": round(result["p50_ms"] / 1000 / generation, 2),
+        "p95_ratio": round(result["p95_ms"] / 1000 / generation, 2),
+        "p99_ratio": round(result["p99_ms"] / 1000 / generation, 2),
+        "requests_per_trigger": round(result["canvus_requests"] / max(1, triggers), 2),
+    })
+    return result
+
+
+def regressions(result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Compare the machine-independent results with the baseline and describe every regression."""
+    problems = []
+    if result["answered"] + result["errors"] < result["triggers"]:
+        problems.append(
+            f"only {result['answered'] + result['errors']} of {result['triggers']} triggers answered"
+        )
+    if result["delivery_ratio"] < baseline["delivery_ratio"] * (1 - tolerance):
+        problems.append(
+            f"delivery_ratio {result['delivery_ratio']} < baseline {baseline['delivery_ratio']}"
+        )
+    for key in CHECKED_KEYS:
+        limit = baseline[key] * (1 + tolerance)
+        if result[key] > limit:
+            problems.append(f"{key} {result[key]} > {limit:.2f} (baseline {baseline[key]})")
+    return problems
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--canvases", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=5.0, help="events per second per canvas")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of synthetic events")
+    parser.add_argument("--trigger-every", type=int, default=10)
+    parser.add_argument("--recording", help="replay this NDJSON recording instead")
+    parser.add_argument("--record", help="save the replayed events to this file")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--output-tokens", type=int, default=20)
+    parser.add_argument("--load-delay", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--parallel", type=int, default=4, help="simulated OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5,
+        help="allowed relative change; wide, as the baseline may come from another machine",
+    )
+    parser.add_argument("--check", action="store_true", help="fail on regression against the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logger.remove()
+    result = asyncio.run(run(args))
+    for key, value in result.items():
+        print(f"{key:>20} {value}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}")
+    elif args.check:
+        problems = regressions(result, json.loads(baseline_path.read_text()), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print("No regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark for application cold start.
+
+Starts a fresh interpreter several times and measures how long it takes to
+import the application, create the tray and receive the first event from a
+set of canvas subscriptions (served by an in-process mock transport). It
+also lists which heavy optional libraries were loaded on the way, since
+those should only be imported when the feature using them first runs.
+
+The run fails (exit status 1) if the median time to the first event
+exceeds the budget or a heavy library was imported at startup.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--budget 1.0] [--canvases 20]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+HEAVY_MODULES = ("PIL", "numpy", "cv2", "PyPDF2", "fastapi", "uvicorn", "aiohttp", "infi")
+
+CHILD = """
+import time
+started = time.perf_counter()
+import src.main
+imported = time.perf_counter()
+
+import asyncio, json, sys
+import httpx
+from loguru import logger
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.subscription_manager import SubscriptionManager
+from src.tray import CanvusTray
+
+logger.remove()
+
+async def first_event():
+    ready = asyncio.Event()
+
+    async def handler(canvas_id, widget):
+        ready.set()
+
+    client = CanvusClient(
+        Config(canvus_server_url="http://canvus", canvus_api_key="key"),
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=b'{{"id": "w1"}}\\n')
+        ),
+    )
+    CanvusTray(on_restart=lambda: None, on_settings_change=lambda key, value: None)
+    manager = SubscriptionManager(client, handler)
+    for i in range({canvases}):
+        manager.subscribe(f"c{{i}}")
+    await ready.wait()
+    subscribed = time.perf_counter()
+    await manager.close()
+    await client.close()
+    return subscribed
+
+subscribed = asyncio.run(first_event())
+print(json.dumps({{
+    "import": imported - started,
+    "subscribed": subscribed - started,
+    "heavy": sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+def run_once(canvases: int) -> Dict[str, object]:
+    """Start one interpreter and return its timings."""
+    code = CHILD.format(canvases=canvases, heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - started
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds to first event")
+    parser.add_argument("--canvases", type=int, default=20)
+    args = parser.parse_args()
+
+    results: List[Dict[str, object]] = [run_once(args.canvases) for _ in range(args.runs)]
+    imports = statistics.median(r["import"] for r in results)
+    subscribed = statistics.median(r["subscribed"] for r in results)
+    process = statistics.median(r["process"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+
+    print(f"import src.main       {imports * 1000:>7.0f} ms")
+    print(f"first canvas event    {subscribed * 1000:>7.0f} ms")
+    print(f"whole process         {process * 1000:>7.0f} ms")
+    print(f"heavy modules loaded  {', '.join(heavy) or 'none'}")
+
+    if subscribed > args.budget or heavy:
+        print(f"FAILED: budget {args.budget:.2f} s, heavy modules must load on first use")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark for multiplexed canvas subscriptions.
+
+Subscribes 10, 100 and 500 synthetic canvases through a single
+``SubscriptionManager`` and reports Python heap usage, process RSS and CPU time
+while every canvas streams widget updates at a fixed rate.
+
+Usage:
+    python -m benchmarks.bench_subscriptions [--duration 5] [--rate 10]
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import time
+import tracemalloc
+
+import httpx
+from loguru import logger
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.subscription_manager import SubscriptionManager
+
+
+def _stream(rate: float, duration: float):
+    """Synthetic ?subscribe body: one widget update every 1/rate seconds."""
+
+    async def body():
+        deadline = time.monotonic() + duration
+        n = 0
+        yield b"\n"
+        while time.monotonic() < deadline:
+            n += 1
+            widget = {
+                "id": f"w{n % 50}",
+                "widget_type": "Note",
+                "text": f"note {n}",
+                "location": {"x": n, "y": n},
+            }
+            yield json.dumps(widget).encode() + b"\n"
+            await asyncio.sleep(1.0 / rate)
+
+    return body()
+
+
+async def run(canvases: int, duration: float, rate: float) -> dict:
+    """Run one benchmark round and return its measurements."""
+    events = 0
+
+    async def handler(canvas_id, widget):
+        nonlocal events
+        events += 1
+
+    config = Config(canvus_server_url="http://canvus", canvus_api_key="bench")
+    client = CanvusClient(
+        config,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=_stream(rate, duration))
+        ),
+    )
+    manager = SubscriptionManager(client, handler, max_streams=canvases)
+
+    tracemalloc.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i in range(canvases):
+        manager.subscribe(f"canvas-{i}")
+    await asyncio.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await manager.close()
+    await client.close()
+    return {
+        "canvases": canvases,
+        "events": events,
+        "events_per_sec": events / wall,
+        "cpu_percent": 100.0 * cpu / wall,
+        "heap_peak_mb": heap_peak / 1e6,
+        "heap_per_canvas_kb": heap_peak / canvases / 1e3,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=10.0, help="events/sec per canvas")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+    logger.remove()
+
+    print(f"{'canvases':>8} {'events/s':>10} {'cpu %':>7} {'heap MB':>8} "
+          f"{'KB/canvas':>10} {'rss MB':>8}")
+    for count in args.counts:
+        r = asyncio.run(run(count, args.duration, args.rate))
+        print(f"{r['canvases']:>8} {r['events_per_sec']:>10.0f} {r['cpu_percent']:>7.1f} "
+              f"{r['heap_peak_mb']:>8.1f} {r['heap_per_canvas_kb']:>10.1f} "
+              f"{r['rss_peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark for vision preprocessing off the event loop.
+
+Preprocesses a batch of synthetic 4K document snapshots (skewed text,
+PNG encoded) with every stage enabled, in three setups:
+
+- inline: the stages run on the event loop, as a naive workflow would;
+- thread: the stages run in the default thread pool executor;
+- process: the stages run in ``VisionPreprocessor``'s process pool, with
+  the pixels passed through shared memory.
+
+While the images are processed, a ticker measures how late the event loop
+wakes up, which is the stall every canvas subscription sees. The benchmark
+reports wall time, the worst and p99 loop lag, and the mean time of each
+stage in the process setup.
+
+Usage:
+    python -m benchmarks.bench_vision [--images 8] [--width 3840] [--height 2160]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from loguru import logger
+
+from src.vision_preprocess import STAGES, VisionPreprocessor, run_stages
+
+TICK = 0.005
+
+
+def synthetic_document(width: int, height: int, angle: float, seed: int = 0) -> bytes:
+    """Return a PNG of lines of text rotated by ``angle`` degrees."""
+    import cv2
+    import numpy
+
+    image = numpy.full((height, width, 3), 255, numpy.uint8)
+    line_height = max(30, height // 40)
+    scale = line_height / 35
+    for row, y in enumerate(range(line_height, height - line_height, line_height)):
+        text = f"Sticky note {seed}.{row}: the quick brown fox jumps over the lazy dog"
+        cv2.putText(image, text, (width // 30, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (20, 20, 20), 2)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    image = cv2.warpAffine(image, matrix, (width, height), borderValue=(255, 255, 255))
+    ok, encoded = cv2.imencode(".png", image)
+    return encoded.tobytes()
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event) -> None:
+    """Record how late each ``TICK`` sleep wakes up."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def run(mode: str, images: List[bytes], target: int, workers: int) -> Dict[str, float]:
+    """Preprocess every image in one setup and return the results."""
+    loop = asyncio.get_running_loop()
+    preprocessor = VisionPreprocessor(workers=workers, target=target)
+    if mode == "process":
+        # Worker startup is paid once per application, not per image
+        await preprocessor.start()
+    semaphore = asyncio.Semaphore(workers)
+
+    async def one(data: bytes) -> None:
+        async with semaphore:
+            if mode == "inline":
+                run_stages(data, target, deskew_text=True, normalize=True)
+                await asyncio.sleep(0)
+            elif mode == "thread":
+                await loop.run_in_executor(
+                    None, lambda: run_stages(data, target, deskew_text=True, normalize=True)
+                )
+            else:
+                await preprocessor.preprocess(data, deskew_text=True, normalize=True)
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(_ticker(lags, stop))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(one(data) for data in images))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    stages = preprocessor.stats()["stages"]
+    await preprocessor.close()
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "max_lag": lags[-1] if lags else 0.0,
+        "p99_lag": lags[max(0, int(len(lags) * 0.99) - 1)] if lags else 0.0,
+        "median_lag": statistics.median(lags) if lags else 0.0,
+        "stages": stages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--target", type=int, default=896)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    args = parser.parse_args()
+    logger.remove()
+
+    images = [
+        synthetic_document(args.width, args.height, angle=(i % 5) - 2, seed=i)
+        for i in range(args.images)
+    ]
+    print(f"{'setup':>8} {'wall s':>7} {'max lag ms':>11} {'p99 lag ms':>11} {'median ms':>10}")
+    stages = {}
+    for mode in args.modes:
+        r = asyncio.run(run(mode, images, args.target, args.workers))
+        print(f"{mode:>8} {r['elapsed']:>7.2f} {r['max_lag'] * 1000:>11.1f} "
+              f"{r['p99_lag'] * 1000:>11.1f} {r['median_lag'] * 1000:>10.1f}")
+        if mode == "process":
+            stages = r["stages"]
+    if stages:
+        print("\nprocess pool stage timings (mean / max ms):")
+        for stage in STAGES:
+            if stage in stages:
+                print(f"{stage:>10} {stages[stage]['mean_ms']:>8.1f} {stages[stage]['max_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark for write-back batching of Canvus API updates.
+
+Replays the writes a burst of triggers makes against a simulated Canvus
+server and compares sending them directly with sending them through
+``WriteBack``. Each trigger strips the braces from its note, sets the
+processing colour, creates a response note, updates the response note's
+status several times, restores the colour and deletes its snapshot.
+
+The simulated server charges a fixed latency per request and serves a
+limited number of requests at a time. The benchmark reports HTTP requests
+sent, wall time, and p50/p95 trigger latency for each setup.
+
+Usage:
+    python -m benchmarks.bench_write_back [--triggers 50] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.write_back import WriteBack
+
+STATUS_UPDATES = 4
+
+
+class SimulatedCanvus:
+    """Canvus stand-in with fixed per-request latency and limited concurrency."""
+
+    def __init__(self, latency: float, concurrency: int):
+        self.latency = latency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        async with self.slots:
+            await asyncio.sleep(self.latency)
+        self.requests += 1
+        if request.method == "DELETE":
+            return httpx.Response(200)
+        body = json.loads(request.content) if request.content else {}
+        return httpx.Response(200, json={"id": f"w{self.requests}", **body})
+
+
+class DirectWriter:
+    """Sends every write immediately, as the workflows did before write-back."""
+
+    def __init__(self, client: CanvusClient):
+        self.client = client
+
+    async def patch(self, path: str, fields: Dict[str, str]) -> None:
+        await self.client.request_json("PATCH", path, json=fields)
+
+    async def create(self, path: str, body: Dict[str, str]) -> Dict[str, str]:
+        return await self.client.request_json("POST", path, json=body)
+
+    async def delete(self, path: str) -> None:
+        await self.client.request_json("DELETE", path)
+
+    async def close(self) -> None:
+        pass
+
+
+async def trigger(writer, index: int) -> None:
+    """Issue the writes of one trigger."""
+    note = f"/canvases/c1/notes/n{index}"
+    await asyncio.gather(
+        writer.patch(note, {"text": f"prompt {index}"}),
+        writer.patch(note, {"background_color": "#ffcc00ff"}),
+    )
+    created = await writer.create("/canvases/c1/notes", {"text": "Processing..."})
+    response = f"/canvases/c1/notes/{created['id']}"
+    await asyncio.gather(*(
+        writer.patch(response, {"text": f"Processing... step {step}"})
+        for step in range(STATUS_UPDATES)
+    ))
+    await asyncio.gather(
+        writer.patch(response, {"text": f"answer {index}"}),
+        writer.patch(note, {"background_color": "#ffffffff"}),
+        writer.delete(f"/canvases/c1/images/snapshot{index}"),
+    )
+
+
+async def run(
+    window_ms: Optional[int], triggers: int, latency: float, concurrency: int
+) -> Dict[str, float]:
+    """Replay the workload once; ``window_ms=None`` writes directly."""
+    server = SimulatedCanvus(latency, concurrency)
+    config = Config(canvus_server_url="http://canvus", canvus_api_key="key")
+    client = CanvusClient(config, transport=httpx.MockTransport(server.handle))
+    writer = DirectWriter(client) if window_ms is None else WriteBack(
+        client, window=window_ms / 1000, rate=1000, burst=100, concurrency=concurrency
+    )
+    latencies: List[float] = []
+
+    async def one(index: int) -> None:
+        started = time.perf_counter()
+        await trigger(writer, index)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(triggers)))
+    await writer.close()
+    elapsed = time.perf_counter() - started
+    await client.close()
+    latencies.sort()
+    return {
+        "requests": server.requests,
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--triggers", type=int, default=50)
+    parser.add_argument("--latency-ms", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated server slots")
+    parser.add_argument("--windows", type=int, nargs="+", default=[5, 20, 50])
+    args = parser.parse_args()
+    logger.remove()
+
+    latency = args.latency_ms / 1000
+    print(f"{'setup':>15} {'requests':>9} {'wall s':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for window in [None, *args.windows]:
+        r = asyncio.run(run(window, args.triggers, latency, args.concurrency))
+        name = "direct" if window is None else f"write-back {window}ms"
+        print(f"{name:>15} {r['requests']:>9} {r['elapsed']:>7.2f} "
+              f"{r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Local stand-in Canvus and Ollama servers for benchmarks and load tests.
+
+``MockCanvus`` serves ``?subscribe`` widget streams for a set of canvases,
+either replayed from a recording or generated synthetically at a fixed
+rate, and one connected client showing every canvas, so canvas discovery
+finds them. It records when the application answers each trigger.
+``MockOllama`` answers ``/api/generate``, streamed or not, with a
+configurable token rate, model load delay, parallelism and failure rate. Both run on loopback
+ports with aiohttp and need no GPU or network access.
+
+A recording is an NDJSON file with one ``{"t": seconds, "canvas": id,
+"widget": {...}}`` object per line, ``t`` being the offset from the start
+of the replay.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.workflows import PROCESSING_TITLE
+
+CLIENT_ID = "bench-client"
+
+Event = Tuple[float, str, Dict[str, Any]]
+
+
+def synthetic_events(
+    canvases: int, rate: float, duration: float, trigger_every: int = 10, notes: int = 20
+) -> List[Event]:
+    """
+    Generate ``rate`` widget updates per second per canvas for ``duration`` seconds.
+
+    Most updates move one of ``notes`` existing notes; every
+    ``trigger_every``-th update sets a note's text to a ``{{ }}`` prompt.
+    """
+    events: List[Event] = []
+    count = max(1, int(rate * duration))
+    for c in range(canvases):
+        canvas_id = f"canvas-{c}"
+        for n in range(count):
+            note_id = f"{canvas_id}-note-{n % notes}"
+            widget: Dict[str, Any] = {
+                "id": note_id,
+                "widget_type": "Note",
+                "state": "normal",
+                "location": {"x": float(n), "y": float(c)},
+                "size": {"width": 300.0, "height": 200.0},
+            }
+            if n % trigger_every == trigger_every - 1:
+                widget["id"] = f"{canvas_id}-trigger-{n}"
+                widget["text"] = "{{ question %d on %s }}" % (n, canvas_id)
+            else:
+                widget["text"] = f"note {n % notes}"
+            # Stagger canvases so they do not all emit at the same instant
+            events.append((n / rate + c / (rate * canvases), canvas_id, widget))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def load_recording(path: Path) -> List[Event]:
+    """Load a recorded NDJSON widget stream."""
+    events: List[Event] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                events.append((float(item["t"]), item["canvas"], item["widget"]))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def save_recording(path: Path, events: List[Event]) -> None:
+    """Write events in the recording format."""
+    with open(path, "w", encoding="utf-8") as f:
+        for t, canvas_id, widget in events:
+            f.write(json.dumps({"t": round(t, 6), "canvas": canvas_id, "widget": widget}) + "\n")
+
+
+class _Server:
+    """aiohttp application on a loopback port."""
+
+    def __init__(self, app: web.Application):
+        self.server = TestServer(app)
+
+    async def start(self) -> str:
+        """Start serving and return the base URL."""
+        await self.server.start_server()
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def close(self) -> None:
+        """Stop serving."""
+        await self.server.close()
+
+
+class MockCanvus(_Server):
+    """
+    Canvus stand-in replaying widget events and recording responses.
+
+    The application marks a trigger note with ``PROCESSING_TITLE`` while it
+    answers it and restores the title once the answer is written; that
+    restore is when the trigger counts as answered. Failed jobs write an
+    ``Error:`` text to their response note instead.
+    """
+
+    def __init__(self, events: List[Event], speed: float = 1.0):
+        self.events: Dict[str, List[Event]] = defaultdict(list)
+        for event in events:
+            self.events[event[1]].append(event)
+        self.speed = speed
+        self.started_at: Optional[float] = None
+        self.emitted = 0
+        self.triggers_sent: Dict[str, float] = {}
+        self.responses: Dict[str, float] = {}
+        self.errors = 0
+        self.requests: Dict[str, int] = defaultdict(int)
+        self._ids = 0
+        self._streams: List[web.StreamResponse] = []
+        self.all_subscribed = asyncio.Event()
+        app = web.Application()
+        app.router.add_get("/api/v1/clients", self.clients)
+        app.router.add_get("/api/v1/clients/{client}/workspaces", self.workspaces)
+        app.router.add_get("/api/v1/canvases/{canvas}/widgets", self.widgets)
+        app.router.add_post("/api/v1/canvases/{canvas}/notes", self.create_note)
+        app.router.add_patch("/api/v1/canvases/{canvas}/notes/{note}", self.patch_note)
+        super().__init__(app)
+
+    @property
+    def canvases(self) -> List[str]:
+        """IDs of the canvases with events."""
+        return sorted(self.events)
+
+    def start_replay(self) -> None:
+        """Start the replay clock; streams wait for it before emitting."""
+        self.started_at = time.monotonic()
+
+    async def clients(self, request: web.Request) -> web.StreamResponse:
+        """Stream the one connected client."""
+        return await self._collection(request, [{"id": CLIENT_ID, "state": "normal"}])
+
+    async def workspaces(self, request: web.Request) -> web.StreamResponse:
+        """List or stream the client's workspaces, one per canvas."""
+        workspaces = [
+            {"index": index, "canvas_id": canvas_id, "state": "normal"}
+            for index, canvas_id in enumerate(self.canvases)
+        ]
+        if "subscribe" not in request.query:
+            return web.json_response(workspaces)
+        return await self._collection(request, workspaces)
+
+    async def _collection(
+        self, request: web.Request, items: List[Dict[str, Any]]
+    ) -> web.StreamResponse:
+        """Send a collection's state, then keep the stream open."""
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(json.dumps(items).encode() + b"\n")
+        while True:
+            await asyncio.sleep(1)
+            await response.write(b"\n")
+
+    async def widgets(self, request: web.Request) -> web.StreamResponse:
+        """Stream a canvas' events at their recorded offsets, then keep the stream open."""
+        canvas_id = request.match_info["canvas"]
+        response = web.StreamResponse()
+        await response.prepare(request)
+        self._streams.append(response)
+        if len(self._streams) >= len(self.events):
+            self.all_subscribed.set()
+        while self.started_at is None:
+            await asyncio.sleep(0.005)
+        for offset, _, widget in self.events.get(canvas_id, []):
+            delay = self.started_at + offset / self.speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if widget.get("text", "").startswith("{{"):
+                self.triggers_sent[widget["id"]] = time.monotonic()
+            await response.write(json.dumps(widget).encode() + b"\n")
+            self.emitted += 1
+        while True:
+            await asyncio.sleep(1)
+            await response.write(b"\n")
+
+    async def create_note(self, request: web.Request) -> web.Response:
+        """Create a note."""
+        self.requests["POST"] += 1
+        body = await request.json()
+        self._ids += 1
+        return web.json_response(dict(body, id=f"response-{self._ids}"))
+
+    async def patch_note(self, request: web.Request) -> web.Response:
+        """Update a note, recording answered triggers and error notes."""
+        self.requests["PATCH"] += 1
+        body = await request.json()
+        note_id = request.match_info["note"]
+        if (
+            note_id in self.triggers_sent
+            and note_id not in self.responses
+            and body.get("title", PROCESSING_TITLE) != PROCESSING_TITLE
+        ):
+            self.responses[note_id] = time.monotonic()
+        if str(body.get("text", "")).startswith("Error:"):
+            self.errors += 1
+        return web.json_response(dict(body, id=note_id))
+
+    def latencies(self) -> List[float]:
+        """Trigger-to-response latencies of every answered trigger."""
+        return [
+            self.responses[t] - sent for t, sent in self.triggers_sent.items() if t in self.responses
+        ]
+
+
+class MockOllama(_Server):
+    """Ollama stand-in with configurable speed, load delay and failures."""
+
+    def __init__(
+        self,
+        tokens_per_second: float = 200.0,
+        output_tokens: int = 20,
+        load_delay: float = 0.5,
+        failure_rate: float = 0.0,
+        parallel: int = 1,
+        seed: int = 7,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.load_delay = load_delay
+        self.failure_rate = failure_rate
+        self.slots = asyncio.Semaphore(parallel)
+        self.loaded: List[str] = []
+        self.served = 0
+        self.failed = 0
+        self._random = random.Random(seed)
+        self._loading: Optional[asyncio.Lock] = None
+        app = web.Application()
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/generate", self.generate)
+        super().__init__(app)
+
+    async def ps(self, request: web.Request) -> web.Response:
+        """List loaded models."""
+        return web.json_response({"models": [{"name": name} for name in self.loaded]})
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        """Generate a canned answer at the configured token rate, streamed if asked."""
+        body = await request.json()
+        model = body["model"] if ":" in body["model"] else f"{body['model']}:latest"
+        if self._loading is None:
+            self._loading = asyncio.Lock()
+        load_seconds = 0.0
+        async with self._loading:
+            if model not in self.loaded:
+                await asyncio.sleep(self.load_delay)
+                load_seconds = self.load_delay
+                self.loaded.append(model)
+        if not body.get("prompt"):
+            return web.json_response({"model": model, "response": "", "done": True})
+        if self._random.random() < self.failure_rate:
+            self.failed += 1
+            return web.json_response({"error": "injected failure"}, status=500)
+        decode = self.output_tokens / self.tokens_per_second
+        final = {
+            "model": model,
+            "done": True,
+            "eval_count": self.output_tokens,
+            "eval_duration": int(decode * 1e9),
+            "load_duration": int(load_seconds * 1e9),
+        }
+        if body.get("stream") is False:
+            async with self.slots:
+                await asyncio.sleep(decode)
+            self.served += 1
+            return web.json_response(dict(final, response=f"answer {self.served}"))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        async with self.slots:
+            for token in range(self.output_tokens):
+                await asyncio.sleep(1 / self.tokens_per_second)
+                message = {"model": model, "response": f"token{token} ", "done": False}
+                await response.write(json.dumps(message).encode() + b"\n")
+        self.served += 1
+        await response.write(json.dumps(dict(final, response="")).encode() + b"\n")
+        await response.write_eof()
+        return response
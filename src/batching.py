@@ -0,0 +1,186 @@
+"""
+Micro-batching of short prompts for the Canvus-Local-LLM application.
+
+Bursts of short text prompts (typically several ``{{ }}`` notes created at
+once) are gathered for a short window and dispatched together, grouped by
+model and system prompt. Ollama reuses its KV cache when consecutive
+requests in a slot share a prefix, so sending prompts with the same system
+prompt back to back, at no more than the server's parallelism, pays the
+system prompt's processing once per batch instead of once per prompt.
+Prompts with images or long text bypass the batcher.
+
+Ollama's ``context`` field is not used to share the prefix: it carries the
+whole previous exchange, so reusing it would leak one note's prompt and
+answer into the next.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from loguru import logger
+
+from .config import Config
+from .ollama_client import OllamaClient
+from .ollama_pool import OllamaPool
+from .pdf_pipeline import estimate_tokens
+from .processing_queue import TimingStats
+
+BatchKey = Tuple[str, str, str]
+LLMClient = Union[OllamaClient, OllamaPool]
+
+
+class _PendingPrompt:
+    """A prompt waiting in a batch."""
+
+    __slots__ = ("prompt", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, future: "asyncio.Future[str]"):
+        self.prompt = prompt
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _Batch:
+    """Prompts sharing a model, system prompt and options."""
+
+    __slots__ = ("items", "timer")
+
+    def __init__(self) -> None:
+        self.items: List[_PendingPrompt] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PromptBatcher:
+    """
+    Gather short prompts per model and system prompt, then dispatch them together.
+
+    A batch is dispatched ``window`` seconds after its first prompt arrives
+    or as soon as it holds ``max_batch`` prompts. Dispatched prompts share a
+    FIFO semaphore of ``parallelism`` slots, so a batch runs contiguously on
+    the server instead of interleaving with other system prompts.
+    """
+
+    def __init__(
+        self,
+        client: LLMClient,
+        window: float = 0.025,
+        max_batch: int = 8,
+        parallelism: int = 1,
+        max_prompt_tokens: int = 256,
+    ):
+        """Initialize the batcher."""
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.max_prompt_tokens = max_prompt_tokens
+        self._slots = asyncio.Semaphore(parallelism)
+        self._pending: Dict[BatchKey, _Batch] = {}
+        self._dispatching: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched = 0
+        self.bypassed = 0
+        self.wait_time = TimingStats()
+
+    @classmethod
+    def from_config(cls, config: Config, client: LLMClient) -> "PromptBatcher":
+        """Create a batcher using the application configuration."""
+        return cls(
+            client,
+            window=config.batch_window_ms / 1000,
+            max_batch=config.batch_max_size,
+            parallelism=config.ollama_num_parallel * len(config.ollama_endpoints()),
+            max_prompt_tokens=config.batch_max_prompt_tokens,
+        )
+
+    async def generate(
+        self,
+        prompt: str,
+        system: str = "",
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Generate a completion, batching the request if it is short."""
+        model = model or self.client.model
+        if images or estimate_tokens(prompt) > self.max_prompt_tokens:
+            self.bypassed += 1
+            return await self.client.generate(prompt, system, images, model, options)
+
+        key = (model, system, json.dumps(options, sort_keys=True) if options else "")
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush, key
+            )
+        future: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        batch.items.append(_PendingPrompt(prompt, future))
+        if len(batch.items) >= self.max_batch:
+            self._flush(key)
+        return await future
+
+    async def close(self) -> None:
+        """Dispatch pending batches and wait for every dispatched prompt."""
+        for key in list(self._pending):
+            self._flush(key)
+        await asyncio.gather(*self._dispatching, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch counts and the time prompts waited to be batched."""
+        return {
+            "batches": self.batches,
+            "batched": self.batched,
+            "bypassed": self.bypassed,
+            "mean_batch_size": round(self.batched / self.batches, 2) if self.batches else 0.0,
+            "pending": sum(len(b.items) for b in self._pending.values()),
+            "wait_time": self.wait_time.as_dict(),
+        }
+
+    def _flush(self, key: BatchKey) -> None:
+        """Dispatch the batch for ``key``."""
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self.batches += 1
+        self.batched += len(batch.items)
+        model, system, options = key
+        now = time.monotonic()
+        for item in batch.items:
+            self.wait_time.record(now - item.enqueued_at)
+            task = asyncio.ensure_future(
+                self._run(item, model, system, json.loads(options) if options else None)
+            )
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+        logger.debug(f"Dispatched batch of {len(batch.items)} prompts for {model}")
+
+    async def _run(
+        self,
+        item: _PendingPrompt,
+        model: str,
+        system: str,
+        options: Optional[Dict[str, Any]],
+    ) -> None:
+        """Run one prompt of a batch and resolve its future."""
+        if item.future.cancelled():
+            return
+        try:
+            async with self._slots:
+                # The caller may have given up while the prompt waited for a slot
+                if item.future.done():
+                    return
+                result = await self.client.generate(item.prompt, system, None, model, options)
+        except asyncio.CancelledError:
+            # Don't leave the caller awaiting a future nobody will resolve
+            item.future.cancel()
+            raise
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            if not item.future.done():
+                item.future.set_result(result)
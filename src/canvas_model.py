@@ -0,0 +1,375 @@
+"""
+Canvas model for the canvas analysis workflow.
+
+This module turns the widget and connector lists of a canvas into a
+structure suitable for summarisation: a uniform grid spatial index over widget
+bounds, so each widget's anchor region is found with a cell lookup instead of
+an O(n^2) containment scan, and a connector adjacency graph. From it the
+builder produces token-budgeted prompt inputs, one per anchor region and then
+one global input combining the region summaries.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .pdf_pipeline import estimate_tokens
+
+Rect = Tuple[float, float, float, float]
+SummarizeFunc = Callable[[str, str], Awaitable[str]]
+
+UNANCHORED = "Unanchored"
+
+REGION_INSTRUCTION = (
+    "The following lists the content of one area of a collaborative canvas, "
+    "with connections between items. Summarise the area's themes, decisions "
+    "and open questions."
+)
+GLOBAL_INSTRUCTION = (
+    "The following are summaries of the areas of a collaborative canvas and "
+    "the links between them. Write an overview of the whole canvas with key "
+    "insights."
+)
+
+_CONTENT_TYPES = ("Note", "Image", "Pdf", "Video", "Browser")
+
+
+class CanvasItem:
+    """A widget with absolute bounds."""
+
+    __slots__ = ("id", "widget_type", "label", "parent_id", "bounds", "region")
+
+    def __init__(self, widget: Dict[str, Any], bounds: Rect):
+        """Initialize the item from a Canvus widget object."""
+        self.id: str = widget["id"]
+        self.widget_type: str = widget.get("widget_type", "")
+        if self.widget_type == "Anchor":
+            self.label = widget.get("anchor_name") or ""
+        else:
+            self.label = (widget.get("title") or "").strip()
+            text = (widget.get("text") or "").strip()
+            if text:
+                self.label = f"{self.label}: {text}" if self.label else text
+        self.parent_id: Optional[str] = widget.get("parent_id")
+        self.bounds = bounds
+        self.region: Optional[str] = None
+
+    @property
+    def area(self) -> float:
+        """Area of the bounds."""
+        x0, y0, x1, y1 = self.bounds
+        return (x1 - x0) * (y1 - y0)
+
+    def contains(self, x: float, y: float) -> bool:
+        """Return True if the point lies within the bounds."""
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        """Center point of the bounds."""
+        x0, y0, x1, y1 = self.bounds
+        return (x0 + x1) / 2, (y0 + y1) / 2
+
+
+class GridIndex:
+    """
+    Uniform grid spatial index over rectangles.
+
+    Items overlapping more than ``max_item_cells`` cells are kept in a
+    separate list that every query scans, so one huge (or corrupt) widget
+    cannot make insertion allocate millions of cells. Queries only visit the
+    cells inside the occupied extent of the grid.
+    """
+
+    def __init__(self, cell_size: float = 1000.0, max_item_cells: int = 1024):
+        """Initialize the index."""
+        self.cell_size = cell_size
+        self.max_item_cells = max_item_cells
+        self._cells: DefaultDict[Tuple[int, int], List[CanvasItem]] = defaultdict(list)
+        self._large: List[CanvasItem] = []
+        self._extent: Optional[Tuple[int, int, int, int]] = None
+
+    def insert(self, item: CanvasItem) -> None:
+        """Add an item to every cell its bounds overlap."""
+        cx0, cy0, cx1, cy1 = self._cell_range(item.bounds)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_item_cells:
+            self._large.append(item)
+            return
+        if self._extent is None:
+            self._extent = (cx0, cy0, cx1, cy1)
+        else:
+            ex0, ey0, ex1, ey1 = self._extent
+            self._extent = (min(ex0, cx0), min(ey0, cy0), max(ex1, cx1), max(ey1, cy1))
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self._cells[(cx, cy)].append(item)
+
+    def at_point(self, x: float, y: float) -> List[CanvasItem]:
+        """Return the items whose bounds contain a point."""
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        candidates = self._cells.get(cell, [])
+        if self._large:
+            candidates = candidates + self._large
+        return [item for item in candidates if item.contains(x, y)]
+
+    def in_rect(self, rect: Rect) -> List[CanvasItem]:
+        """Return the items whose bounds intersect a rectangle."""
+        x0, y0, x1, y1 = rect
+        seen: Set[str] = set()
+        found = []
+        for cell in self._cells_for(rect):
+            for item in self._cells.get(cell, ()):
+                if item.id in seen:
+                    continue
+                ix0, iy0, ix1, iy1 = item.bounds
+                if ix0 <= x1 and x0 <= ix1 and iy0 <= y1 and y0 <= iy1:
+                    seen.add(item.id)
+                    found.append(item)
+        for item in self._large:
+            ix0, iy0, ix1, iy1 = item.bounds
+            if ix0 <= x1 and x0 <= ix1 and iy0 <= y1 and y0 <= iy1:
+                found.append(item)
+        return found
+
+    def _cell_range(self, rect: Rect) -> Tuple[int, int, int, int]:
+        """Return the first and last cell coordinates overlapped by a rectangle."""
+        x0, y0, x1, y1 = rect
+        size = self.cell_size
+        return int(x0 // size), int(y0 // size), int(x1 // size), int(y1 // size)
+
+    def _cells_for(self, rect: Rect) -> Iterable[Tuple[int, int]]:
+        """Yield the occupied-extent cells overlapped by a rectangle."""
+        if self._extent is None:
+            return
+        cx0, cy0, cx1, cy1 = self._cell_range(rect)
+        ex0, ey0, ex1, ey1 = self._extent
+        cx0, cy0, cx1, cy1 = max(cx0, ex0), max(cy0, ey0), min(cx1, ex1), min(cy1, ey1)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # Sparser to walk the occupied cells than the clamped range
+            for cx, cy in list(self._cells):
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield cx, cy
+            return
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield cx, cy
+
+
+class CanvasModel:
+    """Spatially indexed widgets, anchor regions and connector graph of a canvas."""
+
+    def __init__(self, cell_size: float = 1000.0):
+        """Initialize an empty model."""
+        self.items: Dict[str, CanvasItem] = {}
+        self.anchors = GridIndex(cell_size)
+        self.edges: DefaultDict[str, Set[str]] = defaultdict(set)
+        self.regions: DefaultDict[str, List[CanvasItem]] = defaultdict(list)
+        self.region_names: Dict[str, str] = {UNANCHORED: UNANCHORED}
+
+    @classmethod
+    def from_widgets(
+        cls, widgets: Iterable[Dict[str, Any]], cell_size: float = 1000.0
+    ) -> "CanvasModel":
+        """Build a model from the response of ``GET /canvases/{id}/widgets``."""
+        model = cls(cell_size)
+        raw: Dict[str, Dict[str, Any]] = {}
+        connectors = []
+        for widget in widgets:
+            if widget.get("state") == "deleted" or "id" not in widget:
+                continue
+            if widget.get("widget_type") == "Connector":
+                connectors.append(widget)
+            else:
+                raw[widget["id"]] = widget
+
+        resolved: Dict[str, Tuple[float, float, float]] = {}
+        for widget_id, widget in raw.items():
+            x, y, scale = _absolute_origin(widget_id, raw, resolved)
+            size = widget.get("size") or {}
+            bounds = (
+                x,
+                y,
+                x + size.get("width", 0) * scale,
+                y + size.get("height", 0) * scale,
+            )
+            item = CanvasItem(widget, bounds)
+            model.items[widget_id] = item
+            if item.widget_type == "Anchor":
+                model.anchors.insert(item)
+
+        for connector in connectors:
+            src = (connector.get("src") or {}).get("id")
+            dst = (connector.get("dst") or {}).get("id")
+            if src in model.items and dst in model.items:
+                model.edges[src].add(dst)
+                model.edges[dst].add(src)
+
+        model._classify()
+        return model
+
+    def _classify(self) -> None:
+        """Assign each content widget to the smallest anchor containing its center."""
+        for item in self.items.values():
+            if item.widget_type not in _CONTENT_TYPES:
+                continue
+            anchors = self.anchors.at_point(*item.center)
+            if anchors:
+                item.region = min(anchors, key=lambda a: a.area).id
+            else:
+                item.region = UNANCHORED
+            self.regions[item.region].append(item)
+        self._name_regions()
+
+    def _name_regions(self) -> None:
+        """Name regions after their anchors, numbering anchors that share a name."""
+        counts: DefaultDict[str, int] = defaultdict(int)
+        for region in self.regions:
+            if region == UNANCHORED:
+                continue
+            name = self.items[region].label or region
+            counts[name] += 1
+            self.region_names[region] = name if counts[name] == 1 else f"{name} ({counts[name]})"
+
+    def region_name(self, region: str) -> str:
+        """Return the display name of a region."""
+        return self.region_names.get(region, region)
+
+    def region_inputs(self, token_budget: int) -> Dict[str, str]:
+        """
+        Return one prompt input per region ID, each within ``token_budget``.
+
+        Items are listed in reading order (top to bottom, left to right) with
+        their connections; labels are shortened and the list cut off with a
+        count of omitted items when the budget is exceeded.
+        """
+        inputs = {}
+        for region, items in self.regions.items():
+            ordered = sorted(items, key=lambda i: (i.bounds[1], i.bounds[0]))
+            header = f"Area: {self.region_name(region)} ({len(ordered)} items)"
+            per_item = max(12, (token_budget - estimate_tokens(header)) // max(1, len(ordered)))
+            lines = [header]
+            used = estimate_tokens(header)
+            for index, item in enumerate(ordered):
+                line = self._describe(item, per_item * 4)
+                cost = estimate_tokens(line) + 1
+                if used + cost > token_budget:
+                    lines.append(f"... and {len(ordered) - index} more items")
+                    break
+                lines.append(line)
+                used += cost
+            inputs[region] = "\n".join(lines)
+        return inputs
+
+    def global_input(self, region_summaries: Dict[str, str], token_budget: int) -> str:
+        """Return the global prompt input from per-region summaries."""
+        links = self.region_links()
+        link_lines = [
+            f"- {self.region_name(a)} <-> {self.region_name(b)}: {count} connections"
+            for (a, b), count in links.items()
+        ]
+        link_text = "\n".join(["Links between areas:", *link_lines]) if link_lines else ""
+        headers = [f"## {self.region_name(region)}\n" for region in region_summaries]
+        budget_chars = (
+            token_budget - estimate_tokens(link_text) - estimate_tokens("".join(headers))
+        ) * 4
+        # Split what the headers and links leave; no per-region floor may exceed it
+        per_region = max(0, budget_chars) // max(1, len(region_summaries))
+        sections = [
+            f"{header}{_truncate(summary, per_region)}"
+            for header, summary in zip(headers, region_summaries.values())
+        ]
+        return "\n\n".join(sections + ([link_text] if link_text else []))
+
+    def region_links(self) -> Dict[Tuple[str, str], int]:
+        """Count connectors joining items in different regions, keyed by region ID."""
+        counts: DefaultDict[Tuple[str, str], int] = defaultdict(int)
+        for src, targets in self.edges.items():
+            a = self.items[src].region
+            for dst in targets:
+                b = self.items[dst].region
+                if a and b and a < b:
+                    counts[(a, b)] += 1
+        return dict(counts)
+
+    def _describe(self, item: CanvasItem, max_chars: int) -> str:
+        """One-line description of an item and its connections."""
+        line = f"- [{item.widget_type}] {_truncate(item.label, max_chars) or '(untitled)'}"
+        neighbours = self.edges.get(item.id)
+        if neighbours:
+            names = [
+                _truncate(self.items[n].label, 30) or self.items[n].widget_type
+                for n in sorted(neighbours)[:3]
+            ]
+            line += f" -> {'; '.join(names)}"
+        return line
+
+
+async def summarize_canvas(
+    model: CanvasModel,
+    summarize: SummarizeFunc,
+    token_budget: int = 3000,
+    parallelism: int = 4,
+) -> str:
+    """Summarise each region concurrently, then the canvas as a whole."""
+    slots = asyncio.Semaphore(parallelism)
+
+    async def region_summary(text: str) -> str:
+        async with slots:
+            return await summarize(REGION_INSTRUCTION, text)
+
+    inputs = model.region_inputs(token_budget)
+    summaries = await asyncio.gather(*(region_summary(t) for t in inputs.values()))
+    if len(summaries) == 1:
+        return summaries[0]
+    global_text = model.global_input(dict(zip(inputs, summaries)), token_budget)
+    return await summarize(GLOBAL_INSTRUCTION, global_text)
+
+
+def _absolute_origin(
+    widget_id: str,
+    raw: Dict[str, Dict[str, Any]],
+    resolved: Dict[str, Tuple[float, float, float]],
+) -> Tuple[float, float, float]:
+    """
+    Return (x, y, scale) of a widget in canvas coordinates.
+
+    Widget locations are relative to their parent; parents missing from the
+    widget list (the canvas background) are treated as the origin.
+    """
+    chain = []
+    current: Optional[str] = widget_id
+    while current in raw and current not in resolved and current not in chain:
+        chain.append(current)
+        current = raw[current].get("parent_id")
+    base = resolved.get(current, (0.0, 0.0, 1.0)) if current else (0.0, 0.0, 1.0)
+    for node in reversed(chain):
+        widget = raw[node]
+        location = widget.get("location") or {}
+        px, py, pscale = base
+        base = (
+            px + location.get("x", 0) * pscale,
+            py + location.get("y", 0) * pscale,
+            pscale * widget.get("scale", 1),
+        )
+        resolved[node] = base
+    return resolved[widget_id]
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Shorten text to ``max_chars`` with an ellipsis."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 3)].rstrip() + "..."
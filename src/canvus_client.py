@@ -0,0 +1,143 @@
+"""
+Canvus API client for the Canvus-Local-LLM application.
+
+This module wraps a single pooled ``httpx.AsyncClient`` that every component
+talking to the Canvus server shares, so all canvas subscriptions and API calls
+reuse the same keep-alive connections. Requests go through the shared
+resilience layer when one is supplied.
+"""
+
+from typing import Any, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from .config import Config
+from .exceptions import AuthenticationError, CanvusAPIError, ConnectionError
+from .resilience import Resilience, clip_timeout
+
+API_PREFIX = "/api/v1"
+IDEMPOTENT_METHODS = ("GET", "PUT", "PATCH", "DELETE")
+
+
+class CanvusClient:
+    """Pooled asynchronous client for the Canvus REST API."""
+
+    def __init__(
+        self,
+        config: Config,
+        max_connections: int = 100,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        resilience: Optional[Resilience] = None,
+        hedge_delay: Optional[float] = None,
+    ):
+        """Initialize the client."""
+        self.config = config
+        self.resilience = resilience
+        self.hedge_delay = hedge_delay
+        self._token: Optional[str] = config.canvus_api_key
+        self.http = httpx.AsyncClient(
+            base_url=str(config.canvus_server_url),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(30.0),
+            transport=transport,
+        )
+        if self._token:
+            self.http.headers["Private-Token"] = self._token
+
+    async def login(self) -> None:
+        """Obtain an access token when using username/password authentication."""
+        if self._token:
+            return
+        if not (self.config.canvus_username and self.config.canvus_password):
+            raise AuthenticationError("No Canvus credentials configured")
+        response = await self.http.post(
+            f"{API_PREFIX}/users/login",
+            json={
+                "email": self.config.canvus_username,
+                "password": self.config.canvus_password,
+            },
+        )
+        if response.status_code != 200:
+            raise AuthenticationError(
+                "Canvus login failed", {"status": response.status_code}
+            )
+        self._token = response.json()["token"]
+        self.http.headers["Private-Token"] = self._token
+        logger.info("Authenticated with Canvus server")
+
+    async def get_json(
+        self, path: str, headers: Optional[Dict[str, str]] = None, **params: Any
+    ) -> Any:
+        """GET an API path and return the decoded JSON body."""
+        response = await self._send("GET", path, params=params or None, headers=headers)
+        return self._check(response)
+
+    async def get_bytes(
+        self, path: str, headers: Optional[Dict[str, str]] = None, **params: Any
+    ) -> bytes:
+        """GET an API path and return the raw response body."""
+        response = await self._send("GET", path, params=params or None, headers=headers)
+        return response.content
+
+    async def request_json(
+        self, method: str, path: str, json: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """Send a request with a JSON body and return the decoded response."""
+        response = await self._send(method, path, json=json)
+        return self._check(response)
+
+    async def _send(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request, raising for error statuses.
+
+        Idempotent methods are retried and GETs optionally hedged; a breaker
+        is kept per server and top-level API resource (e.g. ``/canvases``).
+        """
+
+        async def attempt() -> httpx.Response:
+            try:
+                response = await self.http.request(
+                    method,
+                    f"{API_PREFIX}{path}",
+                    timeout=clip_timeout(self.http.timeout),
+                    **kwargs,
+                )
+            except httpx.HTTPError as e:
+                raise ConnectionError(f"Canvus request failed: {e}", {"path": path})
+            self._check(response, decode=False)
+            return response
+
+        if self.resilience is None:
+            return await attempt()
+        server = str(self.config.canvus_server_url).rstrip("/")
+        endpoint = f"canvus:{server}/{path.lstrip('/').split('/', 1)[0]}"
+        return await self.resilience.call(
+            endpoint,
+            attempt,
+            retry=method in IDEMPOTENT_METHODS,
+            hedge_delay=self.hedge_delay if method == "GET" else None,
+        )
+
+    async def close(self) -> None:
+        """Close the underlying connection pool."""
+        await self.http.aclose()
+
+    @staticmethod
+    def _check(response: httpx.Response, decode: bool = True) -> Any:
+        """Raise CanvusAPIError for non-success responses."""
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("msg", response.text)
+            except ValueError:
+                message = response.text
+            raise CanvusAPIError(
+                f"Canvus API error: {message}",
+                {"status": response.status_code, "url": str(response.url)},
+            )
+        if not decode:
+            return None
+        return response.json() if response.content else None
@@ -7,7 +7,7 @@ Ollama model settings, and application preferences.
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
@@ -39,16 +39,44 @@ class Config(BaseSettings):
         default="http://localhost:11434",
         description="Ollama server URL"
     )
+    ollama_server_urls: List[str] = Field(
+        default_factory=list,
+        description="Additional Ollama server URLs; requests are balanced across all hosts"
+    )
     ollama_model: str = Field(
         default="gemma3",
         description="Ollama model to use for AI processing"
     )
+    ollama_preload_models: List[str] = Field(
+        default_factory=list,
+        description="Additional models to load into memory at startup"
+    )
+    ollama_keep_alive_min: int = Field(
+        default=300,
+        description="Minimum seconds a model is kept loaded after a request"
+    )
+    ollama_keep_alive_max: int = Field(
+        default=3600,
+        description="Maximum seconds a model is kept loaded after a request"
+    )
+    ollama_num_parallel: int = Field(
+        default=1,
+        description="Requests each Ollama host processes at once (OLLAMA_NUM_PARALLEL)"
+    )
     
     # Application Configuration
     log_level: str = Field(
         default="INFO",
         description="Logging level"
     )
+    log_json: bool = Field(
+        default=False,
+        description="Write the log file as structured JSON lines"
+    )
+    log_sample_every: int = Field(
+        default=100,
+        description="Keep one in this many high-frequency debug messages"
+    )
     max_retries: int = Field(
         default=3,
         description="Maximum number of retry attempts"
@@ -57,7 +85,149 @@ class Config(BaseSettings):
         default=10,
         description="Delay between retry attempts in seconds"
     )
+    hedge_delay_ms: Optional[int] = Field(
+        default=None,
+        description="Send a duplicate Canvus GET if no response after this many milliseconds"
+    )
     
+    # Subscription Configuration
+    max_canvas_streams: int = Field(
+        default=500,
+        description="Maximum number of concurrently open canvas subscription streams"
+    )
+    canvas_queue_size: int = Field(
+        default=1000,
+        description="Maximum buffered widget events per canvas before backpressure"
+    )
+    discovery_debounce_ms: int = Field(
+        default=2000,
+        description="Wait this long after a workspace changes canvas before starting or stopping streams"
+    )
+
+    # Processing Configuration
+    processing_workers: int = Field(
+        default=2,
+        description="Number of concurrent processing workers"
+    )
+    processing_queue_size: int = Field(
+        default=200,
+        description="Maximum number of queued processing jobs before load-shedding"
+    )
+    job_timeout_ms: int = Field(
+        default=600000,
+        description="Time budget of one triggered job, which its Ollama and Canvus calls are clipped to (0 disables it)"
+    )
+    batch_window_ms: int = Field(
+        default=0,
+        description="Gather short prompts for this many milliseconds before dispatch (0 disables batching)"
+    )
+    batch_max_size: int = Field(
+        default=8,
+        description="Maximum number of prompts per batch"
+    )
+    batch_max_prompt_tokens: int = Field(
+        default=256,
+        description="Prompts longer than this many estimated tokens are not batched"
+    )
+    duplicate_window: int = Field(
+        default=60,
+        description="Seconds during which an identical widget trigger is ignored"
+    )
+
+    # PDF Workflow Configuration
+    pdf_parallelism: int = Field(
+        default=4,
+        description="Maximum concurrent LLM requests while summarising a PDF"
+    )
+    pdf_chunk_tokens: int = Field(
+        default=2000,
+        description="Approximate token budget per PDF chunk"
+    )
+
+    # Write-back Configuration
+    write_back_window_ms: int = Field(
+        default=100,
+        description="Coalesce PATCHes to the same widget within this many milliseconds"
+    )
+    canvus_write_rate: int = Field(
+        default=20,
+        description="Maximum sustained Canvus write requests per second"
+    )
+    canvus_write_burst: int = Field(
+        default=40,
+        description="Maximum burst of Canvus write requests above the sustained rate"
+    )
+    canvus_write_concurrency: int = Field(
+        default=8,
+        description="Maximum concurrent Canvus write requests"
+    )
+
+    # Streaming Configuration
+    stream_write_interval_ms: int = Field(
+        default=500,
+        description="Minimum milliseconds between streamed note updates"
+    )
+    stream_write_tokens: int = Field(
+        default=20,
+        description="Number of new tokens that forces a streamed note update"
+    )
+
+    # Vision Configuration
+    vision_input_size: int = Field(
+        default=896,
+        description="Long-side input resolution of the vision model in pixels"
+    )
+    vision_workers: int = Field(
+        default=2,
+        description="Worker processes for image preprocessing"
+    )
+    vision_max_tiles: int = Field(
+        default=16,
+        description="Maximum number of model-sized crops a large image is split into"
+    )
+
+    # Cache Configuration
+    cache_dir: Optional[str] = Field(
+        default=None,
+        description="Response cache directory (defaults to 'cache' next to config.json)"
+    )
+    cache_max_mb: int = Field(
+        default=512,
+        description="Maximum size of the response cache in megabytes"
+    )
+    text_cache_hours: int = Field(
+        default=24,
+        description="How long a cached answer to a text prompt is reused in hours (0 disables it)"
+    )
+    journal_retention_hours: int = Field(
+        default=168,
+        description="How long finished jobs stay in the job journal in hours"
+    )
+
+    # Metrics Configuration
+    metrics_port: int = Field(
+        default=9464,
+        description="Port of the local metrics endpoint on 127.0.0.1 (0 disables it)"
+    )
+    settings_token: Optional[str] = Field(
+        default=None,
+        description="Bearer token for PUT /settings; a random one is written to settings.token when unset"
+    )
+
+    # Service Configuration
+    headless: bool = Field(
+        default=False,
+        description="Run without the system tray, reporting status to the log and local HTTP API"
+    )
+    config_watch_interval_ms: int = Field(
+        default=1000,
+        description="How often to check the configuration files for changes (0 disables reloading)"
+    )
+    shutdown_timeout_ms: int = Field(
+        default=10000,
+        description="How long shutdown waits for queued and running jobs before cancelling them"
+    )
+
     # Development Configuration
     debug: bool = Field(
         default=False,
@@ -98,7 +268,70 @@ class Config(BaseSettings):
         if v < 1 or v > 300:
             raise ValueError("Retry delay must be between 1 and 300 seconds")
         return v
-    
+
+    @field_validator("batch_window_ms")
+    @classmethod
+    def validate_batch_window(cls, v: int) -> int:
+        """Validate the batch window is within reasonable bounds."""
+        if v < 0 or v > 1000:
+            raise ValueError("Batch window must be between 0 and 1000 milliseconds")
+        return v
+
+    @field_validator(
+        "discovery_debounce_ms",
+        "config_watch_interval_ms",
+        "shutdown_timeout_ms",
+        "job_timeout_ms",
+        "text_cache_hours",
+    )
+    @classmethod
+    def validate_non_negative(cls, v: int) -> int:
+        """Validate intervals that may be disabled with 0 are not negative."""
+        if v < 0:
+            raise ValueError("Value must not be negative")
+        return v
+
+    @field_validator("metrics_port")
+    @classmethod
+    def validate_metrics_port(cls, v: int) -> int:
+        """Validate the metrics port is a valid TCP port or 0."""
+        if v < 0 or v > 65535:
+            raise ValueError("Metrics port must be between 0 and 65535")
+        return v
+
+    @field_validator(
+        "log_sample_every",
+        "max_canvas_streams",
+        "canvas_queue_size",
+        "processing_workers",
+        "processing_queue_size",
+        "batch_max_size",
+        "batch_max_prompt_tokens",
+        "ollama_num_parallel",
+        "duplicate_window",
+        "cache_max_mb",
+        "journal_retention_hours",
+        "pdf_parallelism",
+        "pdf_chunk_tokens",
+        "vision_input_size",
+        "vision_workers",
+        "vision_max_tiles",
+        "ollama_keep_alive_min",
+        "ollama_keep_alive_max",
+        "stream_write_interval_ms",
+        "write_back_window_ms",
+        "canvus_write_rate",
+        "canvus_write_burst",
+        "canvus_write_concurrency",
+        "stream_write_tokens",
+    )
+    @classmethod
+    def validate_positive(cls, v: int) -> int:
+        """Validate stream and queue limits are positive."""
+        if v < 1:
+            raise ValueError("Value must be at least 1")
+        return v
+
     def get_config_file_path(self) -> Path:
         """Get the configuration file path."""
         app_data = Path(os.getenv("APPDATA", ""))
@@ -126,6 +359,11 @@ class Config(BaseSettings):
         """Check if authentication credentials are available."""
         return bool(self.canvus_api_key or (self.canvus_username and self.canvus_password))
     
+    def ollama_endpoints(self) -> List[str]:
+        """Get every configured Ollama server URL, without duplicates."""
+        urls = [self.ollama_server_url, *self.ollama_server_urls]
+        return list(dict.fromkeys(url.rstrip("/") for url in urls))
+
     def get_auth_method(self) -> str:
         """Get the authentication method being used."""
         if self.canvus_api_key:
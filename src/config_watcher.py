@@ -0,0 +1,129 @@
+"""
+Configuration hot reload for the Canvus-Local-LLM application.
+
+``ConfigWatcher`` polls the modification time and size of the configuration
+files (``config.json`` and ``.env``). When either changes, it reloads the
+configuration in a worker thread, so the pydantic validators run exactly as
+they do at startup. It then hands the new configuration and the names of
+the changed fields to ``on_change``, which applies only what changed. An
+invalid file is logged and ignored, and the running configuration stays in
+effect. The time from detecting a change to having applied it is recorded
+in the ``canvus_llm_config_reload_seconds`` histogram.
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+
+from .config import Config
+from .metrics import REGISTRY
+
+ApplyFunc = Callable[[Config, Set[str]], Awaitable[None]]
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+RELOAD_SECONDS = REGISTRY.histogram(
+    "canvus_llm_config_reload_seconds",
+    "Time from detecting a configuration change to having applied it",
+)
+
+
+def changed_fields(old: Config, new: Config) -> Set[str]:
+    """Return the names of the fields whose values differ."""
+    return {name for name in type(old).model_fields if getattr(old, name) != getattr(new, name)}
+
+
+class ConfigWatcher:
+    """Reload the configuration when its files change and apply the difference."""
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        current: Config,
+        on_change: ApplyFunc,
+        load: Callable[[], Config] = Config.load_config,
+        interval: float = 1.0,
+    ):
+        """Initialize the watcher with the configuration currently in effect."""
+        self.paths: List[Path] = [Path(p) for p in paths]
+        # Copies, so in-place edits to the live config still show up as changes
+        self.current = current.model_copy(deep=True)
+        self.on_change = on_change
+        self.load = load
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_apply_seconds: Optional[float] = None
+        self._signature = self._stat()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start polling the configuration files."""
+        self._task = asyncio.create_task(self._run(), name="config-watcher")
+
+    async def close(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def check(self) -> bool:
+        """Reload and apply the configuration if a file changed; return True if applied."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            config = await loop.run_in_executor(None, self.load)
+        except (ValidationError, ValueError, OSError) as e:
+            self.failures += 1
+            logger.error(f"Ignoring invalid configuration change: {e}")
+            return False
+        changed = changed_fields(self.current, config)
+        if not changed:
+            return False
+        try:
+            await self.on_change(config, changed)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to apply configuration change to {sorted(changed)}: {e}")
+            return False
+        self.current = config.model_copy(deep=True)
+        self.reloads += 1
+        self.last_apply_seconds = time.monotonic() - started
+        RELOAD_SECONDS.observe(self.last_apply_seconds)
+        logger.info(
+            f"Applied configuration change to {', '.join(sorted(changed))} "
+            f"in {self.last_apply_seconds * 1000:.0f} ms"
+        )
+        return True
+
+    async def _run(self) -> None:
+        """Poll until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Configuration watcher error: {e}")
+
+    def _stat(self) -> Signature:
+        """Return the modification time and size of each watched file."""
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
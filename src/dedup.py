@@ -0,0 +1,153 @@
+"""
+Duplicate prevention for the Canvus-Local-LLM application.
+
+This module provides a single-flight layer that attaches concurrent identical
+LLM requests to one in-flight generation, and a time-windowed tracker of
+recently processed widgets so a trigger is not handled twice while its first
+request is still running or has just completed.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+
+def request_key(
+    model: str,
+    prompt: str,
+    system: str = "",
+    images: Iterable[Union[bytes, str]] = (),
+) -> str:
+    """
+    Return a stable key for an LLM request.
+
+    Images may be given as raw bytes or as precomputed hashes (e.g. Canvus
+    asset hashes); raw bytes are hashed first.
+    """
+    digest = hashlib.sha256()
+    for part in (model, system, prompt):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    for image in images:
+        if isinstance(image, bytes):
+            image = hashlib.sha256(image).hexdigest()
+        digest.update(b"img:" + image.encode("ascii"))
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    The first caller for a key starts the work; later callers with the same
+    key await the same task until it finishes. Cancelling one waiter does not
+    cancel the shared work while other waiters remain.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the single-flight group."""
+        self._inflight: Dict[str, Tuple[asyncio.Task, int]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func`` once for all concurrent callers of ``key``."""
+        self.calls += 1
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._inflight[key] = (task, 1)
+        else:
+            task, waiters = entry
+            self._inflight[key] = (task, waiters + 1)
+            self.coalesced += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            entry = self._inflight.get(key)
+            # The key may already belong to a newer flight
+            if entry is not None and entry[0] is task:
+                waiters = entry[1]
+                if waiters <= 1:
+                    task.cancel()
+                    self._forget(key, task)
+                else:
+                    self._inflight[key] = (task, waiters - 1)
+            raise
+
+    def _forget(self, key: str, task: "asyncio.Future[Any]") -> None:
+        """Remove the flight for ``key`` if it is still ``task``."""
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call and coalescing counters."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+
+class RecentWidgets:
+    """
+    Track recently processed widgets with timestamp validation.
+
+    A widget is considered a duplicate if it was marked with the same content
+    fingerprint within ``ttl`` seconds. The tracker is bounded to
+    ``max_entries``; the oldest entries are evicted first.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        """Initialize the tracker."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def check_and_mark(
+        self,
+        canvas_id: str,
+        widget_id: str,
+        fingerprint: str = "",
+        now: Optional[float] = None,
+    ) -> bool:
+        """
+        Mark a widget as processed.
+
+        Returns True if it is new (the caller should process it) or False if
+        the same widget and fingerprint were marked within the TTL.
+        """
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        key = (canvas_id, widget_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] == fingerprint and now - entry[0] < self.ttl:
+            return False
+        self._entries[key] = (now, fingerprint)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def forget(self, canvas_id: str, widget_id: str) -> None:
+        """Remove a widget so it may be processed again immediately."""
+        self._entries.pop((canvas_id, widget_id), None)
+
+    def _expire(self, now: float) -> None:
+        """Drop entries older than the TTL (oldest are at the front)."""
+        while self._entries:
+            key, (marked_at, _) = next(iter(self._entries.items()))
+            if now - marked_at < self.ttl:
+                break
+            del self._entries[key]
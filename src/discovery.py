@@ -0,0 +1,226 @@
+"""
+Canvas discovery for the Canvus-Local-LLM application.
+
+Canvases to monitor are discovered in stages: the ``/clients`` stream
+reports clients connecting and disconnecting, each client's workspaces say
+which canvas it shows, and every canvas shown anywhere is subscribed through
+the ``SubscriptionManager``.
+
+The reconciler keeps the desired canvases as a reference-counted set (one
+reference per workspace showing the canvas) and applies changes
+incrementally: a client or workspace change only touches the canvases it
+adds or removes. Changes are debounced per canvas, so a user paging
+through canvases, or a client reconnecting, does not start and stop
+streams for every intermediate state.
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from loguru import logger
+
+from .canvus_client import CanvusClient
+from .config import Config
+from .exceptions import CanvusLLMException, ResourceError
+from .subscription import CollectionSubscription
+from .subscription_manager import SubscriptionManager
+
+
+class DiscoveryReconciler:
+    """
+    Keep canvas subscriptions in line with what connected clients display.
+
+    ``refs`` maps each desired canvas to the number of workspaces showing
+    it. When a count goes from zero to one or back, the canvas is scheduled
+    to be reconciled ``debounce`` seconds later; any further change to it
+    in the meantime restarts the timer. Reconciling compares the desired
+    state with the running streams and starts or stops only that canvas.
+    Canvases found when a client first connects are started immediately.
+    """
+
+    def __init__(
+        self,
+        client: CanvusClient,
+        manager: SubscriptionManager,
+        debounce: float = 2.0,
+    ):
+        """Initialize the reconciler."""
+        self.client = client
+        self.manager = manager
+        self.debounce = debounce
+        self.refs: Dict[str, int] = {}
+        self.workspaces: Dict[str, Dict[int, str]] = {}
+        self._watchers: Dict[str, asyncio.Task] = {}
+        self._clients_task: Optional[asyncio.Task] = None
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.started = 0
+        self.stopped = 0
+        self.debounced = 0
+
+    @classmethod
+    def from_config(
+        cls, config: Config, client: CanvusClient, manager: SubscriptionManager
+    ) -> "DiscoveryReconciler":
+        """Create a reconciler using the application configuration."""
+        return cls(client, manager, debounce=config.discovery_debounce_ms / 1000)
+
+    def start(self) -> None:
+        """Start following the ``/clients`` stream."""
+        subscription = CollectionSubscription(
+            self.client.http, "/clients", self._on_client, on_snapshot=self._on_clients_snapshot
+        )
+        self._clients_task = asyncio.create_task(subscription.run(), name="discover-clients")
+
+    async def close(self) -> None:
+        """Stop every discovery stream and pending change; canvas streams are left running."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        tasks = list(self._watchers.values())
+        if self._clients_task is not None:
+            tasks.append(self._clients_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._tasks, return_exceptions=True)
+        self._watchers.clear()
+
+    async def add_client(self, client_id: str) -> None:
+        """Discover a newly connected client's canvases and watch its workspaces."""
+        if client_id in self.workspaces:
+            return
+        self.workspaces[client_id] = {}
+        try:
+            workspaces = await self.client.get_json(f"/clients/{client_id}/workspaces")
+        except CanvusLLMException as e:
+            # The workspace stream replays the current state once connected
+            logger.warning(f"Could not list workspaces of client {client_id}: {e}")
+            workspaces = []
+        if client_id not in self.workspaces:
+            return  # Disconnected while we were listing
+        for workspace in workspaces:
+            self.update_workspace(client_id, workspace, immediate=True)
+
+        async def on_workspace(_: str, workspace: Dict[str, Any]) -> None:
+            self.update_workspace(client_id, workspace)
+
+        subscription = CollectionSubscription(
+            self.client.http, f"/clients/{client_id}/workspaces", on_workspace
+        )
+        self._watchers[client_id] = asyncio.create_task(
+            subscription.run(), name=f"discover-workspaces-{client_id}"
+        )
+        logger.info(
+            f"Client {client_id} connected showing {len(self.workspaces[client_id])} canvases"
+        )
+
+    def remove_client(self, client_id: str) -> None:
+        """Release every canvas shown by a disconnected client."""
+        shown = self.workspaces.pop(client_id, None)
+        if shown is None:
+            return
+        watcher = self._watchers.pop(client_id, None)
+        if watcher is not None:
+            watcher.cancel()
+        for canvas_id in shown.values():
+            self._release(canvas_id)
+        logger.info(f"Client {client_id} disconnected")
+
+    def update_workspace(
+        self, client_id: str, workspace: Dict[str, Any], immediate: bool = False
+    ) -> None:
+        """Record which canvas a workspace shows and adjust references."""
+        shown = self.workspaces.get(client_id)
+        index = workspace.get("index")
+        if shown is None or index is None:
+            return
+        canvas_id = None if workspace.get("state") == "deleted" else workspace.get("canvas_id")
+        previous = shown.get(index)
+        if (canvas_id or None) == previous:
+            return
+        if canvas_id:
+            shown[index] = canvas_id
+            self._acquire(canvas_id, immediate)
+        else:
+            del shown[index]
+        if previous:
+            self._release(previous)
+
+    def desired(self) -> Set[str]:
+        """Return the canvases that should currently be subscribed."""
+        return set(self.refs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return discovery counters."""
+        return {
+            "clients": len(self.workspaces),
+            "desired": len(self.refs),
+            "pending": len(self._timers),
+            "started": self.started,
+            "stopped": self.stopped,
+            "debounced": self.debounced,
+        }
+
+    async def _on_client(self, _: str, info: Dict[str, Any]) -> None:
+        """Handle an update from the ``/clients`` stream."""
+        client_id = info.get("id")
+        if not client_id:
+            return
+        if info.get("state") == "deleted":
+            self.remove_client(client_id)
+        elif client_id not in self.workspaces:
+            task = asyncio.ensure_future(self.add_client(client_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _on_clients_snapshot(self, _: str, client_ids: Set[str]) -> None:
+        """Release the clients that disconnected while the ``/clients`` stream was down."""
+        for client_id in [c for c in self.workspaces if c not in client_ids]:
+            self.remove_client(client_id)
+
+    def _acquire(self, canvas_id: str, immediate: bool = False) -> None:
+        """Add a reference to a canvas."""
+        self.refs[canvas_id] = self.refs.get(canvas_id, 0) + 1
+        if self.refs[canvas_id] == 1:
+            self._schedule(canvas_id, 0 if immediate else self.debounce)
+
+    def _release(self, canvas_id: str) -> None:
+        """Drop a reference to a canvas."""
+        count = self.refs.get(canvas_id, 0) - 1
+        if count > 0:
+            self.refs[canvas_id] = count
+            return
+        self.refs.pop(canvas_id, None)
+        self._schedule(canvas_id, self.debounce)
+
+    def _schedule(self, canvas_id: str, delay: float) -> None:
+        """Reconcile a canvas after ``delay`` seconds, replacing any pending change."""
+        timer = self._timers.pop(canvas_id, None)
+        if timer is not None:
+            timer.cancel()
+            self.debounced += 1
+        if delay <= 0:
+            self._reconcile(canvas_id)
+        else:
+            self._timers[canvas_id] = asyncio.get_running_loop().call_later(
+                delay, self._reconcile, canvas_id
+            )
+
+    def _reconcile(self, canvas_id: str) -> None:
+        """Start or stop the stream of one canvas to match the desired state."""
+        self._timers.pop(canvas_id, None)
+        wanted = canvas_id in self.refs
+        running = canvas_id in self.manager
+        if wanted and not running:
+            try:
+                self.manager.subscribe(canvas_id)
+            except ResourceError as e:
+                logger.warning(f"Not subscribing to canvas {canvas_id}: {e}")
+                return
+            self.started += 1
+        elif running and not wanted:
+            task = asyncio.ensure_future(self.manager.unsubscribe(canvas_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            self.stopped += 1
+
@@ -84,4 +84,9 @@ class TimeoutError(CanvusLLMException):
 
 class ResourceError(CanvusLLMException):
     """Raised when resource limits are exceeded."""
-    pass 
\ No newline at end of file
+    pass
+
+
+class CircuitOpenError(ResourceError):
+    """Raised when a circuit breaker rejects a call to a failing endpoint."""
+    pass
@@ -0,0 +1,199 @@
+"""
+Mipmap-aware image acquisition for the Canvus-Local-LLM application.
+
+Vision models downsample their input to a fixed resolution, so downloading a
+full-resolution snapshot is wasted bandwidth and decode time. This module asks
+the Canvus Mipmaps API for the asset's resolution, fetches the smallest WebP
+mipmap level that still meets the model's input size, decodes it in memory,
+and keeps decoded images in a size-bounded LRU keyed by asset hash.
+"""
+
+import asyncio
+import io
+import math
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from .canvus_client import CanvusClient
+from .exceptions import CanvusAPIError, FileError
+from .metrics import TRACER
+
+CacheKey = Tuple[str, int, int]
+
+
+def select_mipmap_level(width: int, height: int, max_level: int, target: int) -> int:
+    """
+    Return the highest mipmap level whose long side is still >= ``target``.
+
+    Level 0 is the original size and each level halves both dimensions. If the
+    original is already smaller than ``target``, level 0 is returned.
+    """
+    long_side = max(width, height)
+    if long_side <= target or target <= 0:
+        return 0
+    level = int(math.floor(math.log2(long_side / target)))
+    return max(0, min(level, max_level))
+
+
+def decode_image(data: bytes) -> "numpy.ndarray":  # noqa: F821
+    """Decode encoded image bytes into an RGB ``uint8`` array without temp files."""
+    import numpy
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return numpy.asarray(image.convert("RGB"))
+    except (OSError, ValueError) as e:
+        raise FileError(f"Unable to decode image: {e}")
+
+
+class ImageFetcher:
+    """
+    Fetch widget images at the resolution a vision model needs.
+
+    Decoding runs in the default executor so the event loop is never blocked.
+    Assets the mipmap service cannot handle (HTTP 501) fall back to the
+    original asset, which is downscaled after decoding.
+    """
+
+    def __init__(
+        self,
+        client: CanvusClient,
+        max_cache_bytes: int = 256 * 1024 * 1024,
+        max_info_entries: int = 4096,
+    ):
+        """Initialize the fetcher."""
+        self.client = client
+        self.max_cache_bytes = max_cache_bytes
+        self.max_info_entries = max_info_entries
+        self._info: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+        self._decoded: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._cache_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+
+    async def fetch(
+        self, asset_hash: str, canvas_id: str, target: int, page: int = 0
+    ) -> "numpy.ndarray":  # noqa: F821
+        """Return the decoded image for an asset, sized for a ``target`` long side."""
+        headers = {"canvas-id": canvas_id}
+        try:
+            info = await self._mipmap_info(asset_hash, page, headers)
+        except CanvusAPIError as e:
+            if e.details.get("status") != 501:
+                raise
+            return await self._fetch_original(asset_hash, target, headers)
+
+        resolution = info["resolution"]
+        level = select_mipmap_level(
+            resolution["width"], resolution["height"], info.get("max_level", 0), target
+        )
+        key = (asset_hash, page, level)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        with TRACER.span("fetch"):
+            data = await self.client.get_bytes(
+                f"/mipmaps/{asset_hash}/{level}", headers=headers, page=page
+            )
+        self.bytes_downloaded += len(data)
+        with TRACER.span("preprocess"):
+            image = await asyncio.get_running_loop().run_in_executor(
+                None, decode_image, data
+            )
+        logger.debug(
+            f"Fetched mipmap level {level} of {asset_hash} "
+            f"({image.shape[1]}x{image.shape[0]}, {len(data)} bytes)"
+        )
+        self._cache_put(key, image)
+        return image
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache and bandwidth counters."""
+        return {
+            "entries": len(self._decoded),
+            "info_entries": len(self._info),
+            "cache_bytes": self._cache_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+    async def _mipmap_info(
+        self, asset_hash: str, page: int, headers: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """Return (cached) mipmap info; assets are immutable so it never expires."""
+        key = (asset_hash, page)
+        info = self._info.get(key)
+        if info is not None:
+            self._info.move_to_end(key)
+            return info
+        info = await self.client.get_json(
+            f"/mipmaps/{asset_hash}", headers=headers, page=page
+        )
+        self._info[key] = info
+        while len(self._info) > self.max_info_entries:
+            self._info.popitem(last=False)
+        return info
+
+    async def _fetch_original(
+        self, asset_hash: str, target: int, headers: Dict[str, str]
+    ) -> "numpy.ndarray":  # noqa: F821
+        """Download the original asset and downscale it to ``target``."""
+        # Page -1 marks the original; it is cached per target size
+        key = (asset_hash, -1, target)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        with TRACER.span("fetch"):
+            data = await self.client.get_bytes(f"/assets/{asset_hash}", headers=headers)
+        self.bytes_downloaded += len(data)
+        with TRACER.span("preprocess"):
+            image = await asyncio.get_running_loop().run_in_executor(
+                None, _decode_and_fit, data, target
+            )
+        self._cache_put(key, image)
+        return image
+
+    def _cache_get(self, key: CacheKey) -> Optional[Any]:
+        """Look up a decoded image and mark it most recently used."""
+        image = self._decoded.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._decoded.move_to_end(key)
+        return image
+
+    def _cache_put(self, key: CacheKey, image: Any) -> None:
+        """Store a decoded image, evicting the least recently used ones."""
+        if image.nbytes > self.max_cache_bytes:
+            return
+        # Concurrent misses for one key each store their image; count it once
+        replaced = self._decoded.pop(key, None)
+        if replaced is not None:
+            self._cache_bytes -= replaced.nbytes
+        self._decoded[key] = image
+        self._cache_bytes += image.nbytes
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._decoded.popitem(last=False)
+            self._cache_bytes -= evicted.nbytes
+
+
+def _decode_and_fit(data: bytes, target: int) -> "numpy.ndarray":  # noqa: F821
+    """Decode image bytes and shrink so the long side is at most ``target``."""
+    import numpy
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            if target > 0 and max(image.size) > target:
+                image.thumbnail((target, target))
+            return numpy.asarray(image)
+    except (OSError, ValueError) as e:
+        raise FileError(f"Unable to decode image: {e}")
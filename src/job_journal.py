@@ -0,0 +1,283 @@
+"""
+Durable job journal for the Canvus-Local-LLM application.
+
+Every accepted trigger is journalled as a job together with the results of
+its completed stages (for example the summary of each PDF chunk), so work
+interrupted by a crash, ``restart()`` or a forced exit resumes from the last
+completed stage instead of starting over, and triggers that were already
+answered are not processed again when their canvas is rediscovered.
+
+The journal is an append-only SQLite table in WAL mode next to the response
+cache. Appends are queued without blocking and committed in batches by a
+writer thread, so journalling never waits for the disk on the event loop.
+Lookups are answered from memory: the state of unfinished jobs and the IDs
+of completed ones are loaded when the journal is opened. Entries of jobs
+that finished more than ``retention`` seconds ago are removed at that point.
+"""
+
+import asyncio
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from .config import Config
+from .response_cache import default_cache_dir
+
+# Entry kinds
+BEGIN = "begin"
+STAGE = "stage"
+COMPLETE = "complete"
+FAIL = "fail"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_job ON entries (job_id);
+"""
+
+Entry = Tuple[str, str, str, str, float]
+
+
+def job_key(canvas_id: str, widget_id: str, fingerprint: str) -> str:
+    """Return the job ID for a trigger widget's canvas, ID and content."""
+    digest = hashlib.sha256()
+    for part in (canvas_id, widget_id, fingerprint):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class JobState:
+    """Journalled state of an unfinished job."""
+
+    __slots__ = ("job_id", "kind", "trigger", "stages", "started")
+
+    def __init__(
+        self,
+        job_id: str,
+        kind: str,
+        trigger: Dict[str, Any],
+        started: float,
+        stages: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize the job state."""
+        self.job_id = job_id
+        self.kind = kind
+        self.trigger = trigger
+        self.started = started
+        self.stages: Dict[str, Any] = stages if stages is not None else {}
+
+    def __repr__(self) -> str:
+        return f"JobState({self.kind!r}, {self.job_id[:12]}, stages={sorted(self.stages)})"
+
+
+class JobCheckpoint:
+    """Completed stages of one job and a way to record more."""
+
+    def __init__(self, journal: "JobJournal", state: JobState):
+        """Initialize the checkpoint for a journalled job."""
+        self.journal = journal
+        self.state = state
+
+    @property
+    def job_id(self) -> str:
+        """ID of the job."""
+        return self.state.job_id
+
+    def get(self, stage: str) -> Optional[Any]:
+        """Return the recorded result of a stage, or None if it has not completed."""
+        return self.state.stages.get(stage)
+
+    def record(self, stage: str, result: Any) -> None:
+        """Record the result of a completed stage."""
+        self.journal.record_stage(self.job_id, stage, result)
+
+    def complete(self, result: Any = None) -> None:
+        """Mark the job as completed."""
+        self.journal.complete(self.job_id, result)
+
+    def fail(self, error: str) -> None:
+        """Mark the job as failed."""
+        self.journal.fail(self.job_id, error)
+
+
+class JobJournal:
+    """
+    Append-only journal of jobs and their stage results backed by SQLite.
+
+    ``begin``, ``record_stage``, ``complete`` and ``fail`` only queue an
+    entry and may be called from the event loop. ``flush`` waits until
+    everything queued has been committed.
+    """
+
+    def __init__(self, directory: Path, retention: float = 7 * 86400):
+        """Open the journal, dropping expired jobs and loading unfinished ones."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "journal.sqlite3"
+        self.retention = retention
+        self.written = 0
+        self.errors = 0
+        self._jobs: Dict[str, JobState] = {}
+        self._completed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.expired = self._compact()
+        self._load()
+        self._queue: "queue.Queue[Optional[Entry]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="job-journal", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config: Config) -> "JobJournal":
+        """Create a journal next to the response cache."""
+        return cls(default_cache_dir(config), config.journal_retention_hours * 3600)
+
+    def begin(self, job_id: str, kind: str, trigger: Dict[str, Any]) -> JobCheckpoint:
+        """
+        Start a job, or resume it if the journal holds an unfinished one.
+
+        The returned checkpoint holds the stage results recorded before a
+        restart, so only the stages missing from it need to run.
+        """
+        state = self._jobs.get(job_id)
+        if state is None:
+            state = self._jobs[job_id] = JobState(job_id, kind, trigger, time.time())
+            self._completed.discard(job_id)
+            self._append(job_id, BEGIN, "", {"kind": kind, "trigger": trigger})
+        elif state.stages:
+            logger.info(f"Resuming {kind} job {job_id[:12]} after {len(state.stages)} stages")
+        return JobCheckpoint(self, state)
+
+    def record_stage(self, job_id: str, stage: str, result: Any) -> None:
+        """Record the result of a completed stage of a running job."""
+        state = self._jobs.get(job_id)
+        if state is None:
+            return
+        state.stages[stage] = result
+        self._append(job_id, STAGE, stage, result)
+
+    def complete(self, job_id: str, result: Any = None) -> None:
+        """Mark a job as completed so it is skipped from now on."""
+        self._jobs.pop(job_id, None)
+        self._completed.add(job_id)
+        self._append(job_id, COMPLETE, "", result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed; it is neither resumed nor skipped later."""
+        self._jobs.pop(job_id, None)
+        self._append(job_id, FAIL, "", error)
+
+    def is_complete(self, job_id: str) -> bool:
+        """Return whether a job has completed."""
+        return job_id in self._completed
+
+    def incomplete(self) -> List[JobState]:
+        """Return the unfinished jobs, oldest first."""
+        return sorted(self._jobs.values(), key=lambda state: state.started)
+
+    async def flush(self) -> None:
+        """Wait until every queued entry has been committed."""
+        await asyncio.get_running_loop().run_in_executor(None, self._queue.join)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts and writer counters."""
+        return {
+            "path": str(self.path),
+            "open": len(self._jobs),
+            "completed": len(self._completed),
+            "written": self.written,
+            "pending": self._queue.qsize(),
+            "errors": self.errors,
+            "expired": self.expired,
+        }
+
+    def close(self) -> None:
+        """Commit what is queued, stop the writer thread and close the database."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        with self._lock:
+            self._db.close()
+
+    def _append(self, job_id: str, kind: str, stage: str, payload: Any) -> None:
+        """Queue an entry for the writer thread."""
+        self._queue.put_nowait((job_id, kind, stage, json.dumps(payload), time.time()))
+
+    def _run(self) -> None:
+        """Commit queued entries, one transaction per batch."""
+        while True:
+            entry = self._queue.get()
+            batch = []
+            while entry is not None:
+                batch.append(entry)
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                with self._lock:
+                    self._db.executemany(
+                        "INSERT INTO entries (job_id, kind, stage, payload, created) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                    self._db.commit()
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.error(f"Job journal write of {len(batch)} entries failed: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if entry is None:
+                self._queue.task_done()
+                return
+
+    def _compact(self) -> int:
+        """Delete the entries of jobs that finished before the retention period."""
+        cutoff = time.time() - self.retention
+        cursor = self._db.execute(
+            "DELETE FROM entries WHERE job_id IN ("
+            "SELECT job_id FROM entries WHERE kind IN (?, ?) GROUP BY job_id "
+            "HAVING MAX(created) < ?)",
+            (COMPLETE, FAIL, cutoff),
+        )
+        self._db.commit()
+        return cursor.rowcount
+
+    def _load(self) -> None:
+        """Replay the journal into the in-memory job state."""
+        rows = self._db.execute(
+            "SELECT job_id, kind, stage, payload, created FROM entries ORDER BY seq"
+        )
+        for job_id, kind, stage, payload, created in rows:
+            value = json.loads(payload)
+            if kind == BEGIN:
+                self._completed.discard(job_id)
+                self._jobs[job_id] = JobState(job_id, value["kind"], value["trigger"], created)
+            elif kind == STAGE and job_id in self._jobs:
+                self._jobs[job_id].stages[stage] = value
+            elif kind == COMPLETE:
+                self._jobs.pop(job_id, None)
+                self._completed.add(job_id)
+            elif kind == FAIL:
+                self._jobs.pop(job_id, None)
+        if self._jobs:
+            logger.info(f"Job journal holds {len(self._jobs)} unfinished jobs")
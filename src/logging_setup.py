@@ -0,0 +1,307 @@
+"""
+Logging configuration for the Canvus-Local-LLM application.
+
+Log calls on the event loop must stay cheap. This module writes the
+console and the log file from background threads, so the event loop only
+formats the record and appends it to an in-process queue, and a slow
+terminal, rotation or disk stalls never block it. High-frequency debug
+messages (per-widget diffs, stream keep-alives) are sampled through
+``sampled()`` before loguru builds a record. The file sink stays at DEBUG.
+Structured JSON lines are optional.
+
+Loguru's own ``enqueue=True`` pickles every record onto a multiprocessing
+pipe and measured slower per call than a synchronous file sink, so it is
+not used; see ``benchmarks/bench_logging.py``.
+"""
+
+import asyncio
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, TextIO
+
+from loguru import logger
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+
+_sample_every = 100
+
+
+class SampledLogger:
+    """
+    Logger facade that forwards one in N messages per key.
+
+    Dropped calls cost a counter increment; no loguru record is built.
+    Forwarded records carry ``sample`` and ``sampled`` extras, the latter
+    being the number of occurrences the message stands for.
+    """
+
+    __slots__ = ("key", "count", "_bound")
+
+    def __init__(self, key: str):
+        """Initialize the facade."""
+        self.key = key
+        self.count = 0
+        self._bound = logger.bind(sample=key)
+
+    def log(self, level: str, message: str, *args: Any, **kwargs: Any) -> None:
+        """Log ``message`` if this call is selected by the sampling rate."""
+        count = self.count
+        self.count = count + 1
+        if count % _sample_every == 0:
+            self._bound.bind(sampled=_sample_every if count else 1).opt(depth=2).log(
+                level, message, *args, **kwargs
+            )
+
+    def trace(self, message: str, *args: Any, **kwargs: Any) -> None:
+        """Log a sampled TRACE message."""
+        self.log("TRACE", message, *args, **kwargs)
+
+    def debug(self, message: str, *args: Any, **kwargs: Any) -> None:
+        """Log a sampled DEBUG message."""
+        self.log("DEBUG", message, *args, **kwargs)
+
+
+def sampled(key: str) -> SampledLogger:
+    """
+    Return a sampled logger for ``key``.
+
+    Use it at module level for messages that may be emitted for every widget
+    event; warnings and errors should go through ``logger`` directly.
+    """
+    return SampledLogger(key)
+
+
+class BackgroundSink:
+    """
+    Loguru sink handing formatted messages to a worker thread.
+
+    The queue is bounded; when the output cannot keep up, messages are
+    dropped and counted instead of blocking the caller. Subclasses write
+    each batch in ``_write``.
+    """
+
+    name = "log-writer"
+
+    def __init__(self, max_queue: int = 10000):
+        """Initialize the sink and start its writer thread."""
+        self.dropped = 0
+        # When false, stop() only signals the thread; join() it later off the event loop
+        self.join_on_stop = True
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(max_queue)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        """Queue a formatted message without blocking."""
+        try:
+            self._queue.put_nowait(str(message))
+        except queue.Full:
+            self.dropped += 1
+
+    async def complete(self) -> None:
+        """Wait until every queued message has been written."""
+        await asyncio.get_running_loop().run_in_executor(None, self._queue.join)
+
+    def stop(self) -> None:
+        """Write what is queued and stop the writer thread."""
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # The thread exits once it has emptied the queue
+        if self.join_on_stop:
+            self.join()
+
+    def join(self, timeout: float = 5) -> None:
+        """Wait for a stopped writer thread to finish."""
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Write queued messages in batches."""
+        while True:
+            try:
+                message = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    self._close()
+                    return
+                continue
+            batch = []
+            while message is not None:
+                batch.append(message)
+                try:
+                    message = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write(batch)
+            except (OSError, ValueError) as e:
+                # A failed write may leave the output closed; it is reopened next batch
+                print(f"Log writer error: {e}", file=sys.stderr)
+                self._discard()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if message is None:
+                self._close()
+                self._queue.task_done()
+                return
+
+    def _write(self, batch: List[str]) -> None:
+        """Write one batch of messages."""
+        raise NotImplementedError
+
+    def _discard(self) -> None:
+        """Drop the output after a failed write."""
+
+    def _close(self) -> None:
+        """Release the output when the thread stops."""
+
+
+class BackgroundStreamSink(BackgroundSink):
+    """Background sink writing to a stream such as ``sys.stderr``."""
+
+    name = "log-console"
+
+    def __init__(self, stream: TextIO, max_queue: int = 10000):
+        """Initialize the sink for ``stream``."""
+        self.stream = stream
+        super().__init__(max_queue)
+
+    def isatty(self) -> bool:
+        """Report whether the stream is a terminal, so loguru colorizes as it would."""
+        try:
+            return self.stream.isatty()
+        except (AttributeError, ValueError):
+            return False
+
+    def _write(self, batch: List[str]) -> None:
+        """Write and flush one batch."""
+        self.stream.write("".join(batch))
+        self.stream.flush()
+
+
+class BackgroundFileSink(BackgroundSink):
+    """
+    Background sink appending formatted messages to a file.
+
+    The file is rotated when it exceeds ``max_bytes`` and rotated files
+    older than ``retention_days`` are deleted, like the previous loguru file
+    sink settings.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        retention_days: float = 7,
+        max_queue: int = 10000,
+    ):
+        """Initialize the sink and start its writer thread."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.retention = retention_days * 86400
+        self._stream: Optional[TextIO] = None
+        super().__init__(max_queue)
+
+    def _write(self, batch: List[str]) -> None:
+        """Append one batch, flush it and rotate the file when it is full."""
+        if self._stream is None:
+            self._stream = self._open()
+        self._stream.writelines(batch)
+        self._stream.flush()
+        if self._stream.tell() >= self.max_bytes:
+            self._close()
+            self._rotate()
+
+    def _discard(self) -> None:
+        """Close the file after a failed write or rotation."""
+        try:
+            self._close()
+        except (OSError, ValueError):
+            self._stream = None
+
+    def _close(self) -> None:
+        """Close the file if it is open."""
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            stream.close()
+
+    def _open(self) -> TextIO:
+        """Open the log file for appending."""
+        return open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        """Rename the full log file and delete expired rotated files."""
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        self.path.rename(self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}"))
+        cutoff = time.time() - self.retention
+        for old in self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"):
+            if old.stat().st_mtime < cutoff:
+                old.unlink()
+
+
+_sinks: List[BackgroundSink] = []
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_file: Optional[str] = "logs/canvus_llm.log",
+    file_level: str = "DEBUG",
+    json_logs: bool = False,
+    sample_every: int = 100,
+) -> List[int]:
+    """
+    Replace all loguru sinks with background console and file sinks.
+
+    Returns the handler IDs. ``await logger.complete()`` waits for queued
+    output; removing the handlers writes it and stops the threads.
+    """
+    global _sample_every
+    _sample_every = max(1, sample_every)
+    logger.remove()
+    console = BackgroundStreamSink(sys.stderr)
+    _sinks[:] = [console]
+    handlers = [logger.add(console, level=level, format=CONSOLE_FORMAT)]
+    if log_file:
+        sink = BackgroundFileSink(log_file)
+        _sinks.append(sink)
+        handlers.append(
+            logger.add(
+                sink,
+                level=file_level,
+                format=FILE_FORMAT,
+                serialize=json_logs,
+                colorize=False,
+            )
+        )
+    return handlers
+
+
+async def reconfigure_logging(**settings: Any) -> List[int]:
+    """
+    Replace the sinks like ``configure_logging`` from a running event loop.
+
+    The old writer threads are only signalled on removal and are joined in
+    the default executor, so a reload never waits on their output.
+    """
+    old = list(_sinks)
+    for sink in old:
+        sink.join_on_stop = False
+    handlers = configure_logging(**settings)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(None, sink.join) for sink in old))
+    return handlers
@@ -2,18 +2,106 @@
 Main application module for the Canvus-Local-LLM interface.
 
 This module contains the main application class that orchestrates all components
-including the system tray interface, configuration management, and processing workflows.
+including the system tray interface (or headless status reporting), configuration
+management, and processing workflows.
 """
 
+import argparse
 import asyncio
-import sys
-from typing import Optional
+import os
+import secrets
+import signal
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from loguru import logger
 
+from .batching import PromptBatcher
+from .canvus_client import CanvusClient
 from .config import Config
+from .config_watcher import ConfigWatcher
+from .dedup import RecentWidgets, SingleFlight
+from .discovery import DiscoveryReconciler
 from .exceptions import CanvusLLMException, ConfigurationError
-from .tray import CanvusTray
+from .image_fetch import ImageFetcher
+from .job_journal import JobJournal, job_key
+from .logging_setup import configure_logging, reconfigure_logging, sampled
+from .metrics import REGISTRY
+from .metrics_server import MetricsServer, create_app
+from .ollama_client import OllamaClient
+from .ollama_pool import OllamaPool
+from .processing_queue import ProcessingScheduler
+from .resilience import Resilience
+from .response_cache import ResponseCache
+from .status_sink import SETTING_FIELDS, LogStatusSink, StatusSink, TrayStatusSink
+from .subscription_manager import SubscriptionManager
+from .vision_preprocess import VisionPreprocessor
+from .widget_store import DELETED, WidgetStore
+from .workflows import WorkflowRunner, detect_trigger
+from .write_back import WriteBack
+
+_diff_log = sampled("widget_diff")
+
+SHUTDOWN_SECONDS = REGISTRY.histogram(
+    "canvus_llm_shutdown_seconds",
+    "Time from a shutdown request to every component being closed",
+)
+RESTART_SECONDS = REGISTRY.histogram(
+    "canvus_llm_restart_seconds",
+    "Time from a restart request to the application running again",
+)
+
+# Configuration fields a running application can apply, grouped by what they recycle
+_LOGGING_FIELDS = {"log_level", "log_json", "log_sample_every"}
+_CANVUS_FIELDS = {
+    "canvus_server_url",
+    "canvus_api_key",
+    "canvus_username",
+    "canvus_password",
+    "hedge_delay_ms",
+}
+_OLLAMA_FIELDS = {
+    "ollama_server_url",
+    "ollama_server_urls",
+    "ollama_keep_alive_min",
+    "ollama_keep_alive_max",
+}
+_MODEL_FIELDS = {"ollama_model", "ollama_preload_models"}
+# Fields copied into running components by _retune_components
+_TUNED_FIELDS = {
+    "max_retries",
+    "retry_delay",
+    "discovery_debounce_ms",
+    "batch_window_ms",
+    "batch_max_size",
+    "batch_max_prompt_tokens",
+    "duplicate_window",
+    "write_back_window_ms",
+    "canvus_write_rate",
+    "canvus_write_burst",
+    "vision_input_size",
+    "vision_max_tiles",
+    "cache_max_mb",
+}
+# Fields read from the configuration each time they are used
+_LIVE_FIELDS = {
+    "job_timeout_ms",
+    "text_cache_hours",
+    "pdf_parallelism",
+    "pdf_chunk_tokens",
+    "stream_write_interval_ms",
+    "stream_write_tokens",
+    "shutdown_timeout_ms",
+}
+_HOT_FIELDS = (
+    _LOGGING_FIELDS
+    | _CANVUS_FIELDS
+    | _OLLAMA_FIELDS
+    | _MODEL_FIELDS
+    | _TUNED_FIELDS
+    | _LIVE_FIELDS
+)
 
 
 class CanvusLLMInterface:
@@ -24,47 +112,65 @@ class CanvusLLMInterface:
     and all processing workflows.
     """
     
-    def __init__(self):
-        """Initialize the application."""
+    def __init__(self, headless: Optional[bool] = None):
+        """Initialize the application; ``headless`` overrides the configured mode."""
         self.config: Optional[Config] = None
-        self.tray: Optional[CanvusTray] = None
-        self.canvus_client = None
-        self.ollama_client = None
-        self.processing_queue = asyncio.Queue()
+        self.tray: Optional[Any] = None
+        self.status_sink: StatusSink = StatusSink()
+        self.resilience: Optional[Resilience] = None
+        self.canvus_client: Optional[CanvusClient] = None
+        self.image_fetcher: Optional[ImageFetcher] = None
+        self.vision_preprocessor: Optional[VisionPreprocessor] = None
+        self.ollama_client: Optional[Union[OllamaClient, OllamaPool]] = None
+        self._preload_task: Optional[asyncio.Task] = None
+        self.processing_queue: Optional[ProcessingScheduler] = None
+        self.subscription_manager: Optional[SubscriptionManager] = None
+        self.discovery: Optional[DiscoveryReconciler] = None
         self.active_subscriptions = {}
+        self.widget_stores: Dict[str, WidgetStore] = {}
+        self.inflight_requests = SingleFlight()
+        self.prompt_batcher: Optional[PromptBatcher] = None
+        self.write_back: Optional[WriteBack] = None
+        self.recent_widgets: Optional[RecentWidgets] = None
+        self.response_cache: Optional[ResponseCache] = None
+        self.job_journal: Optional[JobJournal] = None
+        self.workflows: Optional[WorkflowRunner] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        self.config_watcher: Optional[ConfigWatcher] = None
         self.is_running = False
+        self.accepting = False
+        self.restart_requested = False
+        self.stop_requested_at: Optional[float] = None
+        self.shutdown_seconds: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
         self.status = "Idle"
         
-        # Initialize logging
-        self._setup_logging()
-        
         # Load configuration
         self._load_configuration()
+        self.headless = self.config.headless if headless is None else headless
+
+        # Initialize logging
+        self._setup_logging()
     
     def _setup_logging(self) -> None:
-        """Set up logging configuration."""
-        logger.remove()  # Remove default handler
-        
-        # Add console handler
-        logger.add(
-            sys.stderr,
-            level=self.config.log_level if self.config else "INFO",
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-                   "<level>{level: <8}</level> | "
-                   "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-                   "<level>{message}</level>"
-        )
-        
-        # Add file handler
-        logger.add(
-            "logs/canvus_llm.log",
-            rotation="10 MB",
-            retention="7 days",
-            level="DEBUG",
-            format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
-        )
-        
+        """Set up non-blocking console and file logging."""
+        configure_logging(**self._logging_settings())
         logger.info("Logging initialized")
+
+    async def _reload_logging(self) -> None:
+        """Replace the log sinks without joining the old writer threads on the event loop."""
+        await reconfigure_logging(**self._logging_settings())
+        logger.info("Logging reconfigured")
+
+    def _logging_settings(self) -> Dict[str, Any]:
+        """Return the ``configure_logging`` arguments for the current configuration."""
+        config = self.config
+        return {
+            "level": config.log_level,
+            "json_logs": config.log_json,
+            "sample_every": config.log_sample_every,
+        }
     
     def _load_configuration(self) -> None:
         """Load application configuration."""
@@ -83,14 +189,20 @@ class CanvusLLMInterface:
             # Validate configuration
             self._validate_configuration()
             
-            # Initialize system tray
-            await self._initialize_system_tray()
+            # Initialize system tray or headless status reporting
+            await self._initialize_status_sink()
             
             # Initialize API clients
             await self._initialize_clients()
             
             # Initialize processing components
             await self._initialize_processing()
+
+            # Expose metrics
+            await self._initialize_metrics()
+
+            # Apply configuration file changes without restarting
+            self._initialize_config_watcher()
             
             self.is_running = True
             logger.info("Application initialized successfully")
@@ -113,32 +225,34 @@ class CanvusLLMInterface:
         """Return a summary status for the tray."""
         return self.status
 
-    async def _initialize_system_tray(self) -> None:
-        """Initialize the system tray interface."""
-        self.tray = CanvusTray(
-            on_restart=self.restart,
-            on_settings_change=self._handle_settings_change,
-            get_status=self.get_status
-        )
-        self.tray.start_tray()
-        logger.info("System tray initialized")
+    async def _initialize_status_sink(self) -> None:
+        """Initialize the system tray, or log-based status reporting when headless."""
+        if self.headless:
+            self.status_sink = LogStatusSink()
+        else:
+            self.status_sink = TrayStatusSink(
+                on_restart=self.restart,
+                on_settings_change=self._handle_settings_change,
+                get_status=self.get_status,
+                on_exit=self.request_stop,
+            )
+            self.tray = self.status_sink.tray
+        self.status_sink.start()
+        logger.info(f"Status reporting initialized ({'headless' if self.headless else 'tray'})")
 
     def set_tray_icon_state(self, state: str) -> None:
-        if self.tray:
-            self.tray.set_icon_state(state)
-
-    def set_tray_tooltip(self, text: str) -> None:
-        if self.tray:
-            self.tray.set_tooltip(text)
+        """Report the icon state (default, connected, processing, error)."""
+        self.status_sink.set_icon_state(state)
 
     def update_status(self, status: str) -> None:
+        """Report a new status text."""
         self.status = status
-        self.set_tray_tooltip(f"Canvus-Local-LLM: {status}")
+        self.status_sink.set_status(status)
     
     def _handle_settings_change(self, key: str, value: str) -> None:
-        """Handle settings changes from tray."""
-        if self.config:
-            setattr(self.config, f'canvus_{key}', value) if key in ['api_key', 'username', 'password'] else setattr(self.config, key, value)
+        """Handle settings changes from the tray or the local HTTP API."""
+        if self.config and key in SETTING_FIELDS:
+            setattr(self.config, SETTING_FIELDS[key], value)
             self.config.save_config()
             logger.info(f"Updated {key} in configuration")
     
@@ -150,30 +264,390 @@ class CanvusLLMInterface:
     async def _initialize_clients(self) -> None:
         """Initialize API clients."""
         self.update_status("Connecting to servers...")
-        # TODO: Initialize Canvus client
-        # TODO: Initialize Ollama client
+        self.resilience = Resilience.from_config(self.config)
+        self.canvus_client = await self._create_canvus_client()
+        self.image_fetcher = ImageFetcher(self.canvus_client)
+        self.ollama_client = self._create_ollama_client()
+        self._preload_models()
         self.set_tray_icon_state("connected")
         self.update_status("Connected")
-        logger.info("API clients initialization placeholder")
+        logger.info(
+            f"Created Canvus client for {self.config.canvus_server_url} and Ollama "
+            f"{'pool' if isinstance(self.ollama_client, OllamaPool) else 'client'} for "
+            f"{', '.join(self.config.ollama_endpoints())}"
+        )
     
+    async def _create_canvus_client(self) -> CanvusClient:
+        """Create and log in a Canvus client for the current configuration."""
+        hedge_ms = self.config.hedge_delay_ms
+        client = CanvusClient(
+            self.config,
+            max_connections=self.config.max_canvas_streams + 20,
+            resilience=self.resilience,
+            hedge_delay=hedge_ms / 1000 if hedge_ms else None,
+        )
+        try:
+            await client.login()
+        except Exception:
+            await client.close()
+            raise
+        return client
+
+    def _create_ollama_client(self) -> Union[OllamaClient, OllamaPool]:
+        """Create an Ollama client, or a pool when several servers are configured."""
+        if len(self.config.ollama_endpoints()) > 1:
+            pool = OllamaPool.from_config(
+                self.config, single_flight=self.inflight_requests, resilience=self.resilience
+            )
+            pool.start()
+            return pool
+        return OllamaClient.from_config(
+            self.config,
+            single_flight=self.inflight_requests,
+            resilience=self.resilience,
+        )
+
+    def _preload_models(self) -> None:
+        """Load the configured models in the background."""
+        if self._preload_task:
+            self._preload_task.cancel()
+        self._preload_task = asyncio.create_task(
+            self.ollama_client.preload(
+                [self.config.ollama_model, *self.config.ollama_preload_models]
+            )
+        )
+
     async def _initialize_processing(self) -> None:
         """Initialize processing components."""
         self.update_status("Ready")
-        # TODO: Initialize processing queue
-        # TODO: Initialize subscription managers
-        logger.info("Processing components initialization placeholder")
+        self.processing_queue = ProcessingScheduler(
+            max_size=self.config.processing_queue_size,
+            workers=self.config.processing_workers,
+        )
+        self.processing_queue.start()
+        if self.config.batch_window_ms:
+            self.prompt_batcher = PromptBatcher.from_config(self.config, self.ollama_client)
+        self.recent_widgets = RecentWidgets(ttl=self.config.duplicate_window)
+        self.response_cache = ResponseCache.from_config(self.config)
+        self.job_journal = JobJournal.from_config(self.config)
+        self.write_back = WriteBack.from_config(self.config, self.canvus_client)
+        self.vision_preprocessor = VisionPreprocessor.from_config(self.config)
+        self.workflows = WorkflowRunner(
+            self.config,
+            self.canvus_client,
+            self.ollama_client,
+            self.processing_queue,
+            self.job_journal,
+            self.response_cache,
+            self.write_back,
+            self.image_fetcher,
+            self.vision_preprocessor,
+            batcher=self.prompt_batcher,
+        )
+        # Jobs interrupted by a crash or restart continue from their last stage
+        resumed = self.workflows.resume()
+        if resumed:
+            logger.info(f"Resuming {resumed} unfinished jobs from the job journal")
+        self.subscription_manager = SubscriptionManager(
+            self.canvus_client,
+            self._handle_widget_event,
+            max_streams=self.config.max_canvas_streams,
+            queue_size=self.config.canvas_queue_size,
+            snapshot_handler=self._handle_canvas_snapshot,
+        )
+        self.active_subscriptions = self.subscription_manager.subscriptions
+        self.discovery = DiscoveryReconciler.from_config(
+            self.config, self.canvus_client, self.subscription_manager
+        )
+        self.discovery.start()
+        logger.info("Processing components initialized")
+
+    async def _initialize_metrics(self) -> None:
+        """Register scrape-time collectors and start the local metrics endpoint."""
+        REGISTRY.register_collector(
+            "canvus_llm_queue_depth",
+            "Jobs waiting in the processing queue",
+            lambda: [
+                ({"priority": name}, depth)
+                for name, depth in self.processing_queue.depth().items()
+            ],
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_processing_active",
+            "Jobs currently running",
+            lambda: [({}, self.processing_queue.active)],
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_journal_jobs",
+            "Jobs in the job journal by state",
+            lambda: [
+                ({"state": state}, count)
+                for state, count in self.job_journal.stats().items()
+                if state in ("open", "completed", "pending")
+            ],
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_subscriptions",
+            "Canvas subscriptions by connection state",
+            self._subscription_samples,
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_cache_lookups",
+            "Response and image cache lookups",
+            self._cache_samples,
+            kind="counter",
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_ollama_tokens_per_second",
+            "Mean Ollama generation speed per model",
+            lambda: [
+                ({"model": model}, stats["tokens_per_second"])
+                for model, stats in self.ollama_client.stats().items()
+            ],
+        )
+        REGISTRY.register_collector(
+            "canvus_llm_circuit_open",
+            "Whether an endpoint's circuit breaker is open (1) or not (0)",
+            lambda: [
+                ({"endpoint": name}, float(breaker["state"] != "closed"))
+                for name, breaker in self.resilience.stats()["breakers"].items()
+            ],
+        )
+        if isinstance(self.ollama_client, OllamaPool):
+            REGISTRY.register_collector(
+                "canvus_llm_ollama_outstanding",
+                "Requests in flight per Ollama host",
+                lambda: [
+                    ({"host": url}, backend["outstanding"])
+                    for url, backend in self.ollama_client.backend_stats().items()
+                ],
+            )
+            REGISTRY.register_collector(
+                "canvus_llm_ollama_healthy",
+                "Whether an Ollama host passed its last health check",
+                lambda: [
+                    ({"host": url}, float(backend["healthy"]))
+                    for url, backend in self.ollama_client.backend_stats().items()
+                ],
+            )
+        if self.config.metrics_port:
+            self.metrics_server = MetricsServer(
+                create_app(
+                    get_status=self.get_status,
+                    on_settings_change=self._handle_settings_change if self.headless else None,
+                    settings_token=self._settings_token() if self.headless else None,
+                ),
+                self.config.metrics_port,
+            )
+            await self.metrics_server.start()
+
+    def _settings_token(self) -> str:
+        """Return the settings API token, generating one readable only by this user."""
+        if self.config.settings_token:
+            return self.config.settings_token
+        path = self.config.get_config_file_path().parent / "settings.token"
+        token = secrets.token_urlsafe(32)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(token)
+        logger.info(f"Settings API token written to {path}")
+        return token
+
+    def _subscription_samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """Return subscription counts and queued events for the metrics endpoint."""
+        stats = self.subscription_manager.stats()
+        queued = sum(c["queue_depth"] for c in stats["canvases"].values())
+        return [
+            ({"state": "connected"}, stats["connected"]),
+            ({"state": "waiting"}, stats["subscribed"] - stats["connected"]),
+            ({"state": "queued_events"}, queued),
+        ]
+
+    def _cache_samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """Return cache hit and miss counts for the metrics endpoint."""
+        samples = []
+        if self.response_cache:
+            samples += [
+                ({"cache": "response", "result": "hit"}, self.response_cache.hits),
+                ({"cache": "response", "result": "miss"}, self.response_cache.misses),
+            ]
+        if self.image_fetcher:
+            samples += [
+                ({"cache": "image", "result": "hit"}, self.image_fetcher.hits),
+                ({"cache": "image", "result": "miss"}, self.image_fetcher.misses),
+            ]
+        flights = self.inflight_requests.stats()
+        samples.append(({"cache": "inflight", "result": "hit"}, flights["coalesced"]))
+        samples.append(
+            ({"cache": "inflight", "result": "miss"}, flights["calls"] - flights["coalesced"])
+        )
+        return samples
+
+    def _initialize_config_watcher(self) -> None:
+        """Watch the configuration files and apply changes to the running application."""
+        interval_ms = self.config.config_watch_interval_ms
+        if not interval_ms:
+            return
+        self.config_watcher = ConfigWatcher(
+            [self.config.get_config_file_path(), Path(".env")],
+            self.config,
+            self.apply_config,
+            interval=interval_ms / 1000,
+        )
+        self.config_watcher.start()
+
+    async def apply_config(self, config: Config, changed: Set[str]) -> None:
+        """Apply a reloaded configuration, recycling only the affected components."""
+        previous = self.config
+        self.config = config
+        try:
+            self._retune_components(config)
+            if changed & _LOGGING_FIELDS:
+                await self._reload_logging()
+            if changed & _CANVUS_FIELDS:
+                await self._recycle_canvus_client(
+                    server_changed="canvus_server_url" in changed
+                )
+            if changed & _OLLAMA_FIELDS:
+                await self._recycle_ollama_client()
+            elif changed & _MODEL_FIELDS:
+                self.ollama_client.model = config.ollama_model
+                self._preload_models()
+        except Exception:
+            self.config = previous
+            self._retune_components(previous)
+            raise
+        pending = changed - _HOT_FIELDS
+        if bool(config.batch_window_ms) != bool(previous.batch_window_ms):
+            # Batching can only be switched on or off at startup
+            pending.add("batch_window_ms")
+        if pending:
+            logger.warning(f"Restart to apply changes to {', '.join(sorted(pending))}")
+
+    def _retune_components(self, config: Config) -> None:
+        """Point running components at ``config`` and update the settings they copied."""
+        for component in (self.canvus_client, self.workflows):
+            if component is not None:
+                component.config = config
+        if self.resilience is not None:
+            self.resilience.retry = Resilience.from_config(config).retry
+        if self.discovery is not None:
+            self.discovery.debounce = config.discovery_debounce_ms / 1000
+        if self.prompt_batcher is not None and config.batch_window_ms:
+            self.prompt_batcher.window = config.batch_window_ms / 1000
+            self.prompt_batcher.max_batch = config.batch_max_size
+            self.prompt_batcher.max_prompt_tokens = config.batch_max_prompt_tokens
+        if self.recent_widgets is not None:
+            self.recent_widgets.ttl = config.duplicate_window
+        if self.write_back is not None:
+            self.write_back.window = config.write_back_window_ms / 1000
+            self.write_back.bucket.rate = config.canvus_write_rate
+            self.write_back.bucket.burst = config.canvus_write_burst
+        if self.vision_preprocessor is not None:
+            self.vision_preprocessor.target = config.vision_input_size
+            self.vision_preprocessor.max_tiles = config.vision_max_tiles
+        if self.response_cache is not None:
+            self.response_cache.max_bytes = config.cache_max_mb * 1024 * 1024
+
+    async def _recycle_canvus_client(self, server_changed: bool) -> None:
+        """Replace the Canvus connection pool and re-open canvas streams on it."""
+        client = await self._create_canvus_client()
+        old = self.canvus_client
+        canvases = list(self.subscription_manager.subscriptions)
+        await self.write_back.flush()
+        await self.discovery.close()
+        await self.subscription_manager.close()
+        self.canvus_client = client
+        for component in (
+            self.image_fetcher, self.write_back, self.subscription_manager, self.workflows
+        ):
+            component.client = client
+        self.discovery = DiscoveryReconciler.from_config(
+            self.config, client, self.subscription_manager
+        )
+        self.discovery.start()
+        if not server_changed:
+            for canvas_id in canvases:
+                self.subscription_manager.subscribe(canvas_id)
+        await old.close()
+        logger.info(f"Recycled Canvus connection pool for {self.config.canvus_server_url}")
+
+    async def _recycle_ollama_client(self) -> None:
+        """Replace the Ollama client; Canvus streams are left untouched."""
+        old = self.ollama_client
+        self.ollama_client = self._create_ollama_client()
+        if self.prompt_batcher:
+            self.prompt_batcher.client = self.ollama_client
+        if self.workflows:
+            self.workflows.llm = self.ollama_client
+        self._preload_models()
+        await old.close()
+        logger.info(f"Recycled Ollama client for {', '.join(self.config.ollama_endpoints())}")
+
+    async def generate_text(self, prompt: str, system: str = "") -> str:
+        """Generate a text completion, batched with other short prompts if enabled."""
+        llm = self.prompt_batcher or self.ollama_client
+        return await llm.generate(prompt, system)
+
+    def subscribe_canvas(self, canvas_id: str) -> None:
+        """Start monitoring a canvas."""
+        if self.subscription_manager:
+            self.subscription_manager.subscribe(canvas_id)
+
+    async def _handle_widget_event(self, canvas_id: str, widget: Dict[str, Any]) -> None:
+        """Handle a widget update received from a canvas subscription."""
+        if not self.accepting:
+            return
+        store = self.widget_stores.get(canvas_id)
+        if store is None:
+            store = self.widget_stores[canvas_id] = WidgetStore(canvas_id)
+        event = store.apply(widget)
+        if event is None or event.kind == DELETED:
+            return
+        _diff_log.debug("Canvas {} widget change: {!r}", canvas_id, event)
+        record = event.record
+        kind = detect_trigger(record, store)
+        if kind is None:
+            return
+        fingerprint = f"{record.title}\x00{record.text}\x00{record.parent_id}"
+        if not self.recent_widgets.check_and_mark(canvas_id, record.id, fingerprint):
+            return
+        job_id = job_key(canvas_id, record.id, fingerprint)
+        if self.job_journal.is_complete(job_id):
+            return
+        logger.info(f"Accepted {kind} trigger {record.id} on canvas {canvas_id}")
+        self.workflows.dispatch(canvas_id, record, kind, job_id)
     
-    async def start(self) -> None:
-        """Start the application."""
+    async def _handle_canvas_snapshot(self, canvas_id: str, widget_ids: Set[str]) -> None:
+        """Forget widgets missing from a canvas state replayed after a reconnect."""
+        store = self.widget_stores.get(canvas_id)
+        if store is None:
+            return
+        dropped = store.retain(widget_ids)
+        if dropped:
+            logger.debug(f"Dropped {dropped} widgets deleted from canvas {canvas_id}")
+
+    async def start(self, restarting_since: Optional[float] = None) -> None:
+        """Start the application and run until a stop is requested."""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        if self.stop_requested_at is not None:
+            self._stop_event.set()
         try:
             await self.initialize()
+            self._install_signal_handlers()
+            self.accepting = True
             logger.info("Application started successfully")
             self.update_status("Running")
-            
-            # Keep the application running
-            while self.is_running:
-                await asyncio.sleep(1)
-                
+            if restarting_since is not None:
+                seconds = time.monotonic() - restarting_since
+                RESTART_SECONDS.observe(seconds)
+                logger.info(f"Application restarted in {seconds * 1000:.0f} ms")
+
+            # Wake as soon as the tray, a signal or restart() asks to stop
+            await self._stop_event.wait()
+
         except KeyboardInterrupt:
             logger.info("Application interrupted by user")
         except Exception as e:
@@ -181,13 +655,49 @@ class CanvusLLMInterface:
             raise
         finally:
             await self.shutdown()
-    
+
+    def request_stop(self, restart: bool = False) -> None:
+        """Ask the running application to shut down; safe to call from any thread."""
+        if restart:
+            self.restart_requested = True
+        if self.stop_requested_at is None:
+            self.stop_requested_at = time.monotonic()
+        if self._loop is not None and self._stop_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # The loop has already closed
+
+    def _install_signal_handlers(self) -> None:
+        """Shut down gracefully on SIGINT and SIGTERM where the loop supports it."""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # Windows event loops and non-main threads
+
     async def shutdown(self) -> None:
-        """Shutdown the application gracefully."""
+        """
+        Shut down in phases within ``shutdown_timeout_ms``.
+
+        New triggers are refused first, then queued and running jobs get until
+        the deadline to finish. Jobs still unfinished are cancelled; streaming
+        generations mark their notes as interrupted and the job journal keeps
+        their completed stages for the next start. Finally the write-back
+        queue is flushed and pooled connections are closed.
+        """
+        started = self.stop_requested_at or time.monotonic()
         try:
             logger.info("Shutting down application")
             
             self.is_running = False
+            self.update_status("Shutting down")
+
+            # Stop accepting new triggers
+            await self._stop_intake()
+
+            # Drain the processing queue, cancelling what misses the deadline
+            await self._drain_processing()
             
             # Shutdown processing components
             await self._shutdown_processing()
@@ -195,41 +705,98 @@ class CanvusLLMInterface:
             # Shutdown API clients
             await self._shutdown_clients()
             
-            # Shutdown system tray
-            await self._shutdown_system_tray()
+            # Shutdown system tray or headless status reporting
+            await self._shutdown_status_sink()
             
-            logger.info("Application shutdown complete")
+            self.shutdown_seconds = time.monotonic() - started
+            SHUTDOWN_SECONDS.observe(self.shutdown_seconds)
+            logger.info(f"Application shutdown complete in {self.shutdown_seconds * 1000:.0f} ms")
+            await logger.complete()
             
         except Exception as e:
             logger.error(f"Error during shutdown: {e}")
-    
+
+    async def _stop_intake(self) -> None:
+        """Refuse new triggers and close the sources of new work."""
+        self.accepting = False
+        if self.config_watcher:
+            await self.config_watcher.close()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if self.discovery:
+            await self.discovery.close()
+        if self.subscription_manager:
+            await self.subscription_manager.close()
+        logger.info("Stopped accepting new triggers")
+
+    async def _drain_processing(self) -> None:
+        """Wait for queued and running jobs until the deadline, then cancel the rest."""
+        if not self.processing_queue:
+            return
+        queue = self.processing_queue
+        timeout = self.config.shutdown_timeout_ms / 1000
+        pending = len(queue) + queue.active
+        if await queue.drain(timeout):
+            if pending:
+                logger.info(f"Drained {pending} jobs")
+        else:
+            logger.warning(
+                f"Cancelling {len(queue) + queue.active} of {pending} jobs after "
+                f"{timeout:.1f}s; journalled jobs resume on the next start"
+            )
+        await queue.stop()
+
     async def _shutdown_processing(self) -> None:
         """Shutdown processing components."""
-        # TODO: Implement processing shutdown
-        logger.info("Processing components shutdown placeholder")
+        if self.prompt_batcher:
+            await self.prompt_batcher.close()
+        if self.write_back:
+            await self.write_back.close()
+        if self.vision_preprocessor:
+            await self.vision_preprocessor.close()
+        if self.response_cache:
+            self.response_cache.close()
+        if self.job_journal:
+            self.job_journal.close()
+        logger.info("Processing components shutdown")
     
     async def _shutdown_clients(self) -> None:
         """Shutdown API clients."""
-        # TODO: Implement client shutdown
-        logger.info("API clients shutdown placeholder")
+        if self.canvus_client:
+            await self.canvus_client.close()
+        if self._preload_task:
+            self._preload_task.cancel()
+        if self.ollama_client:
+            await self.ollama_client.close()
+        logger.info("API clients shutdown")
     
-    async def _shutdown_system_tray(self) -> None:
-        """Shutdown system tray interface."""
-        if self.tray:
-            self.tray.shutdown()
-        logger.info("System tray shutdown")
+    async def _shutdown_status_sink(self) -> None:
+        """Shutdown the system tray or headless status reporting."""
+        self.status_sink.shutdown()
+        logger.info("Status reporting shutdown")
     
     def restart(self) -> None:
-        """Restart the application."""
+        """Shut down gracefully and start again with a freshly loaded configuration."""
         logger.info("Restarting application")
-        # TODO: Implement proper restart logic
-        sys.exit(0)
+        self.request_stop(restart=True)
 
 
-async def main():
+async def main(argv: Optional[List[str]] = None):
     """Main entry point for the application."""
-    app = CanvusLLMInterface()
+    parser = argparse.ArgumentParser(description="Canvus-Local-LLM")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        default=None,
+        help="run without the system tray; status goes to the log and local HTTP API",
+    )
+    args = parser.parse_args(argv)
+    app = CanvusLLMInterface(headless=args.headless)
     await app.start()
+    while app.restart_requested:
+        restarting_since = app.stop_requested_at
+        app = CanvusLLMInterface(headless=args.headless)
+        await app.start(restarting_since)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,450 @@
+"""
+Metrics and tracing for the Canvus-Local-LLM application.
+
+This module keeps in-process counters, gauges and histograms in a registry
+that renders to the Prometheus text format or JSON, and a lightweight tracer
+that records one trace per trigger with a span for each stage (fetch,
+preprocess, inference, write-back). Span durations also feed the
+``canvus_llm_stage_seconds`` histogram so latency can be broken down per
+workflow and stage. Values owned by other components (queue depth, cache
+hits) are read at scrape time through registered collectors.
+"""
+
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from loguru import logger
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+CollectorFunc = Callable[[], Iterable[Sample]]
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+
+class _Metric:
+    """Base class for a metric family with optional labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        """Return the label values in label-name order."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Return ``(suffix, labels, value)`` samples for exposition."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [
+                ("_total", dict(zip(self.labelnames, key)), value)
+                for key, value in self._values.items()
+            ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        """Return the current value."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [
+                ("", dict(zip(self.labelnames, key)), value)
+                for key, value in self._values.items()
+            ]
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of a block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels: str) -> Dict[str, float]:
+        """Return count, sum and mean for one label set."""
+        key = self._key(labels)
+        count = sum(self._counts.get(key, ()))
+        total = self._sums.get(key, 0.0)
+        return {"count": count, "sum": total, "mean": total / count if count else 0.0}
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        result = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                labels = dict(zip(self.labelnames, key))
+                bounds = [*(repr(float(b)) for b in self.buckets), "+Inf"]
+                for bound, cumulative in zip(bounds, itertools.accumulate(counts)):
+                    result.append(("_bucket", dict(labels, le=bound), float(cumulative)))
+                result.append(("_sum", labels, self._sums[key]))
+                result.append(("_count", labels, float(sum(counts))))
+        return result
+
+
+class _Collector:
+    """Metric family whose samples are produced at scrape time."""
+
+    __slots__ = ("name", "help", "kind", "func")
+
+    def __init__(self, name: str, help: str, kind: str, func: CollectorFunc):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.func = func
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        suffix = "_total" if self.kind == "counter" else ""
+        return [(suffix, labels, float(value)) for labels, value in self.func()]
+
+
+class MetricsRegistry:
+    """Named metric families and scrape-time collectors."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter ``name``, creating it on first use."""
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Return the gauge ``name``, creating it on first use."""
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram ``name``, creating it on first use."""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def register_collector(
+        self, name: str, help: str, func: CollectorFunc, kind: str = "gauge"
+    ) -> None:
+        """
+        Register a function returning ``(labels, value)`` samples at scrape time.
+
+        Registering the same name again replaces the previous collector.
+        """
+        with self._lock:
+            self._metrics[name] = _Collector(name, help, kind, func)
+
+    def unregister(self, name: str) -> None:
+        """Remove a metric family or collector."""
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def collect(self) -> List[Tuple[Any, List[Tuple[str, Dict[str, str], float]]]]:
+        """Return every family with its current samples."""
+        with self._lock:
+            families = list(self._metrics.values())
+        result = []
+        for family in families:
+            try:
+                result.append((family, family.samples()))
+            except Exception as e:
+                logger.warning(f"Metrics collector {family.name} failed: {e}")
+        return result
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for family, samples in self.collect():
+            lines.append(f"# HELP {family.name} {_escape(family.help)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return all metrics as JSON-serialisable data."""
+        result: Dict[str, Any] = {}
+        for family, samples in self.collect():
+            result[family.name] = {
+                "type": family.kind,
+                "help": family.help,
+                "samples": [
+                    {"name": family.name + suffix, "labels": labels, "value": value}
+                    for suffix, labels, value in samples
+                ],
+            }
+        return result
+
+    def _get_or_create(self, cls: type, name: str, help: str, *args: Any) -> Any:
+        """Return an existing family of the right type or register a new one."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+
+class Span:
+    """One timed stage of a trace; ``started`` is the offset from the trace start."""
+
+    __slots__ = ("name", "started", "duration", "error")
+
+    def __init__(self, name: str, started: float):
+        self.name = name
+        self.started = started
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class Trace:
+    """The stages of handling one trigger."""
+
+    __slots__ = (
+        "trace_id",
+        "workflow",
+        "attributes",
+        "started",
+        "duration",
+        "spans",
+        "error",
+        "_origin",
+    )
+
+    def __init__(self, trace_id: int, workflow: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.workflow = workflow
+        self.attributes = attributes
+        self.started = time.time()
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+        self.error: Optional[str] = None
+        self._origin = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the trace with span offsets and durations in milliseconds."""
+        return {
+            "trace_id": self.trace_id,
+            "workflow": self.workflow,
+            "attributes": self.attributes,
+            "started": self.started,
+            "duration_ms": _ms(self.duration),
+            "error": self.error,
+            "spans": [
+                {
+                    "name": span.name,
+                    "offset_ms": _ms(span.started),
+                    "duration_ms": _ms(span.duration),
+                    "error": span.error,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+class Tracer:
+    """
+    Per-trigger tracing with stage spans.
+
+    ``trace()`` starts a trace for a trigger; ``span()`` times a stage and
+    attaches it to the trace active in the current task, if any. Both are
+    recorded into histograms so the most recent ``keep`` traces are only a
+    debugging aid, not the source of the latency figures.
+    """
+
+    def __init__(self, registry: MetricsRegistry, keep: int = 200):
+        """Initialize the tracer."""
+        self.recent: Deque[Trace] = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+        self.trigger_seconds = registry.histogram(
+            "canvus_llm_trigger_seconds",
+            "End-to-end time to handle a trigger",
+            ("workflow", "outcome"),
+        )
+        self.stage_seconds = registry.histogram(
+            "canvus_llm_stage_seconds",
+            "Time spent in each stage of a workflow",
+            ("workflow", "stage"),
+        )
+
+    @contextmanager
+    def trace(self, workflow: str, **attributes: Any) -> Iterator[Trace]:
+        """Trace the handling of one trigger."""
+        current = Trace(next(self._ids), workflow, attributes)
+        token = _current_trace.set(current)
+        outcome = "ok"
+        try:
+            yield current
+        except BaseException as e:
+            outcome = "error"
+            current.error = repr(e)
+            raise
+        finally:
+            _current_trace.reset(token)
+            current.duration = time.perf_counter() - current._origin
+            self.trigger_seconds.observe(current.duration, workflow=workflow, outcome=outcome)
+            self.recent.append(current)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[Optional[Span]]:
+        """Time a stage of the current trace."""
+        current = _current_trace.get()
+        started = time.perf_counter()
+        span = None
+        if current is not None:
+            span = Span(stage, started - current._origin)
+            current.spans.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            if span is not None and not isinstance(e, GeneratorExit):
+                span.error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            if span is not None:
+                span.duration = duration
+            workflow = current.workflow if current is not None else "none"
+            self.stage_seconds.observe(duration, workflow=workflow, stage=stage)
+
+    def traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent traces, newest first."""
+        return [t.as_dict() for t in list(self.recent)[-limit:][::-1]]
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace active in the current task, if any."""
+    return _current_trace.get()
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Format a label set as ``{a="1",b="2"}``."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(str(v), quotes=True)}"' for k, v in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape(text: str, quotes: bool = False) -> str:
+    """Escape text for the Prometheus exposition format."""
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quotes else text
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    """Convert seconds to rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+REGISTRY = MetricsRegistry()
+TRACER = Tracer(REGISTRY)
@@ -0,0 +1,144 @@
+"""
+Local metrics endpoint for the Canvus-Local-LLM application.
+
+This module serves the metrics registry and recent traces over HTTP on the
+loopback interface only:
+
+- ``GET /metrics``: Prometheus text exposition format
+- ``GET /metrics.json``: the same metrics as JSON
+- ``GET /traces?limit=N``: the most recent per-trigger traces
+- ``GET /status``: the application status string
+- ``PUT /settings/{key}``: change a setting, when a settings handler is given;
+  requires ``Authorization: Bearer <token>`` and a loopback ``Host`` header,
+  so neither other local users nor web pages (through DNS rebinding) can
+  change the running application
+
+The app is built with FastAPI and run in the application's event loop by
+uvicorn. Both are imported only when the app is created or the server
+starts, so they cost nothing at startup when the endpoint is disabled.
+"""
+
+import asyncio
+import secrets
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from .metrics import REGISTRY, TRACER, MetricsRegistry, Tracer
+from .status_sink import SETTING_FIELDS
+
+if TYPE_CHECKING:
+    from fastapi import FastAPI
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LOCAL_HOST = "127.0.0.1"
+LOCAL_HOST_NAMES = (LOCAL_HOST, "localhost")
+
+
+def is_local_host(host: str) -> bool:
+    """Return True if a ``Host`` header names the loopback interface."""
+    name = host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+    return name.lower() in LOCAL_HOST_NAMES
+
+
+def create_app(
+    registry: MetricsRegistry = REGISTRY,
+    tracer: Tracer = TRACER,
+    get_status: Optional[Callable[[], str]] = None,
+    on_settings_change: Optional[Callable[[str, str], None]] = None,
+    settings_token: Optional[str] = None,
+) -> "FastAPI":
+    """
+    Create the FastAPI application exposing metrics and traces.
+
+    ``settings_token`` is required together with ``on_settings_change``.
+    """
+    from fastapi import Body, FastAPI, Header, HTTPException, Query
+    from fastapi.responses import PlainTextResponse
+
+    if on_settings_change is not None and not settings_token:
+        raise ValueError("A settings token is required to enable PUT /settings")
+
+    app = FastAPI(title="Canvus-Local-LLM metrics", docs_url=None, redoc_url=None)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def prometheus() -> PlainTextResponse:
+        return PlainTextResponse(
+            registry.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE
+        )
+
+    @app.get("/metrics.json")
+    def metrics_json() -> Dict[str, Any]:
+        return registry.as_dict()
+
+    @app.get("/traces")
+    def traces(limit: int = Query(50, ge=1, le=1000)) -> Dict[str, Any]:
+        return {"traces": tracer.traces(limit)}
+
+    @app.get("/status")
+    def status() -> Dict[str, Any]:
+        return {"status": get_status() if get_status else "unknown"}
+
+    if on_settings_change is not None:
+
+        @app.put("/settings/{key}")
+        def settings(
+            key: str,
+            value: str = Body(..., embed=True),
+            host: str = Header(""),
+            authorization: str = Header(""),
+        ) -> Dict[str, Any]:
+            if not is_local_host(host):
+                raise HTTPException(403, "Settings can only be changed through localhost")
+            scheme, _, token = authorization.partition(" ")
+            if scheme.lower() != "bearer" or not secrets.compare_digest(
+                token.encode(), settings_token.encode()
+            ):
+                raise HTTPException(401, "Invalid settings token")
+            if key not in SETTING_FIELDS:
+                raise HTTPException(404, f"Unknown setting {key}")
+            on_settings_change(key, value)
+            return {"key": key, "updated": True}
+
+    return app
+
+
+class MetricsServer:
+    """Run the metrics app with uvicorn inside the current event loop."""
+
+    def __init__(self, app: "FastAPI", port: int, host: str = LOCAL_HOST):
+        """Initialize the server."""
+        self.app = app
+        self.host = host
+        self.port = port
+        self._server: Any = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> bool:
+        """Start serving; returns False if uvicorn is not installed."""
+        try:
+            import uvicorn
+        except ImportError:
+            logger.warning("uvicorn is not installed; metrics endpoint disabled")
+            return False
+        config = uvicorn.Config(
+            self.app, host=self.host, port=self.port, log_level="warning", access_log=False
+        )
+        self._server = uvicorn.Server(config)
+        self._server.install_signal_handlers = lambda: None
+        self._task = asyncio.create_task(self._server.serve(), name="metrics-server")
+        logger.info(f"Metrics endpoint at http://{self.host}:{self.port}/metrics")
+        return True
+
+    async def stop(self) -> None:
+        """Stop serving and wait for the server to exit."""
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            except Exception as e:
+                logger.warning(f"Metrics server stopped with error: {e}")
+            self._task = None
@@ -0,0 +1,461 @@
+"""
+Ollama client for the Canvus-Local-LLM application.
+
+This module talks to the Ollama HTTP API over a single pooled keep-alive
+connection. Models are preloaded at startup, and each request carries a
+``keep_alive`` chosen from the observed request rate so models stay resident
+between bursts instead of paying a 10-40 s cold load after the default five
+minute expiry. Per-model metrics separate load time from generation time.
+"""
+
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+from loguru import logger
+
+from .config import Config
+from .dedup import SingleFlight, request_key
+from .exceptions import OllamaError, SubscriptionError, TimeoutError
+from .metrics import REGISTRY, TRACER
+from .resilience import Resilience, clip_timeout, remaining_time
+from .subscription import NDJSONParser
+
+# A load_duration above this is counted as a cold model load
+COLD_LOAD_THRESHOLD = 1.0
+
+EVAL_TOKENS = REGISTRY.counter(
+    "canvus_llm_ollama_eval_tokens", "Tokens generated by Ollama", ("model",)
+)
+EVAL_SECONDS = REGISTRY.counter(
+    "canvus_llm_ollama_eval_seconds", "Seconds Ollama spent generating tokens", ("model",)
+)
+LOAD_SECONDS = REGISTRY.counter(
+    "canvus_llm_ollama_load_seconds", "Seconds Ollama spent loading models", ("model",)
+)
+
+
+def generate_key(
+    model: str,
+    prompt: str,
+    system: str = "",
+    images: Optional[List[str]] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Return the single-flight key of a generate request."""
+    return request_key(
+        model,
+        prompt,
+        system + (json.dumps(options, sort_keys=True) if options else ""),
+        (hashlib.sha256(image.encode("ascii")).hexdigest() for image in images or ()),
+    )
+
+
+class KeepAlivePolicy:
+    """
+    Choose ``keep_alive`` from the observed gap between requests.
+
+    The gap is tracked as an exponentially weighted moving average per model.
+    The model is kept loaded for ``factor`` times that gap, clamped between
+    ``minimum`` and ``maximum`` seconds, so sporadically used models survive
+    the quiet periods between bursts without pinning GPU memory indefinitely.
+    """
+
+    def __init__(
+        self,
+        minimum: float = 300.0,
+        maximum: float = 3600.0,
+        factor: float = 3.0,
+        alpha: float = 0.3,
+    ):
+        """Initialize the policy."""
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.alpha = alpha
+        self._last: Dict[str, float] = {}
+        self._gap: Dict[str, float] = {}
+
+    def observe(self, model: str, now: Optional[float] = None) -> None:
+        """Record a request for ``model``."""
+        now = time.monotonic() if now is None else now
+        last = self._last.get(model)
+        if last is not None:
+            gap = now - last
+            previous = self._gap.get(model)
+            self._gap[model] = (
+                gap if previous is None else self.alpha * gap + (1 - self.alpha) * previous
+            )
+        self._last[model] = now
+
+    def keep_alive(self, model: str) -> str:
+        """Return the ``keep_alive`` value to send for ``model``."""
+        gap = self._gap.get(model)
+        seconds = self.minimum if gap is None else self.factor * gap
+        seconds = max(self.minimum, min(self.maximum, seconds))
+        return f"{int(seconds)}s"
+
+
+class ModelMetrics:
+    """Load versus generation timing for one model."""
+
+    __slots__ = (
+        "requests",
+        "cold_loads",
+        "load_seconds",
+        "prompt_seconds",
+        "eval_seconds",
+        "eval_tokens",
+        "wall_seconds",
+    )
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.cold_loads = 0
+        self.load_seconds = 0.0
+        self.prompt_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.eval_tokens = 0
+        self.wall_seconds = 0.0
+
+    def record(self, response: Dict[str, Any], wall: float) -> None:
+        """Record the timing fields (nanoseconds) of a final Ollama response."""
+        load = response.get("load_duration", 0) / 1e9
+        self.requests += 1
+        self.load_seconds += load
+        if load >= COLD_LOAD_THRESHOLD:
+            self.cold_loads += 1
+        self.prompt_seconds += response.get("prompt_eval_duration", 0) / 1e9
+        self.eval_seconds += response.get("eval_duration", 0) / 1e9
+        self.eval_tokens += response.get("eval_count", 0)
+        self.wall_seconds += wall
+
+    def merge(self, other: "ModelMetrics") -> None:
+        """Add the totals of another instance to this one."""
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the metrics as a plain dictionary."""
+        return {
+            "requests": self.requests,
+            "cold_loads": self.cold_loads,
+            "load_seconds": round(self.load_seconds, 3),
+            "prompt_seconds": round(self.prompt_seconds, 3),
+            "eval_seconds": round(self.eval_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "tokens_per_second": round(
+                self.eval_tokens / self.eval_seconds if self.eval_seconds else 0.0, 2
+            ),
+        }
+
+
+class OllamaClient:
+    """Pooled asynchronous client for the Ollama API."""
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        keep_alive: Optional[KeepAlivePolicy] = None,
+        single_flight: Optional[SingleFlight] = None,
+        max_connections: int = 8,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        resilience: Optional[Resilience] = None,
+        retry: bool = True,
+    ):
+        """
+        Initialize the client.
+
+        ``retry`` disables retries of idempotent requests, for callers such
+        as ``OllamaPool`` that fail over to another host instead.
+        """
+        self.base_url = base_url
+        self.resilience = resilience
+        self.retry = retry
+        self.model = model
+        self.keep_alive = keep_alive or KeepAlivePolicy()
+        self.single_flight = single_flight
+        self.metrics: Dict[str, ModelMetrics] = {}
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=300.0,
+            ),
+            timeout=httpx.Timeout(10.0, read=600.0),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Config,
+        single_flight: Optional[SingleFlight] = None,
+        resilience: Optional[Resilience] = None,
+    ) -> "OllamaClient":
+        """Create a client using the application configuration."""
+        return cls(
+            config.ollama_server_url,
+            config.ollama_model,
+            keep_alive=KeepAlivePolicy(
+                minimum=config.ollama_keep_alive_min, maximum=config.ollama_keep_alive_max
+            ),
+            single_flight=single_flight,
+            resilience=resilience,
+        )
+
+    async def preload(self, models: Optional[Iterable[str]] = None) -> None:
+        """Load models into memory ahead of the first request."""
+        for model in models or [self.model]:
+            started = time.monotonic()
+            try:
+                await self._post(
+                    "/api/generate",
+                    {"model": model, "keep_alive": self.keep_alive.keep_alive(model)},
+                    retry=True,
+                )
+            except OllamaError as e:
+                logger.warning(f"Failed to preload model {model}: {e}")
+                continue
+            logger.info(f"Preloaded model {model} in {time.monotonic() - started:.1f}s")
+
+    async def generate(
+        self,
+        prompt: str,
+        system: str = "",
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Generate a completion; identical concurrent requests are coalesced."""
+        model = model or self.model
+        payload = self._generate_payload(model, prompt, system, images, options, False)
+
+        async def run() -> str:
+            response = await self._timed(model, "/api/generate", payload)
+            return response.get("response", "")
+
+        if self.single_flight is None:
+            return await run()
+        return await self.single_flight.do(
+            generate_key(model, prompt, system, images, options), run
+        )
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system: str = "",
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Generate a completion, yielding response fragments as they arrive."""
+        model = model or self.model
+        payload = self._generate_payload(model, prompt, system, images, options, True)
+        stream = self._stream(model, "/api/generate", payload)
+        try:
+            async for message in stream:
+                if message.get("response"):
+                    yield message["response"]
+        finally:
+            # Close the request now rather than when the generator is collected
+            await stream.aclose()
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Send a chat request, yielding assistant content fragments as they arrive."""
+        model = model or self.model
+        payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": True}
+        if options:
+            payload["options"] = options
+        stream = self._stream(model, "/api/chat", payload)
+        try:
+            async for message in stream:
+                content = message.get("message", {}).get("content")
+                if content:
+                    yield content
+        finally:
+            await stream.aclose()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send a chat request and return the assistant message."""
+        model = model or self.model
+        payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": False}
+        if options:
+            payload["options"] = options
+        response = await self._timed(model, "/api/chat", payload)
+        return response.get("message", {})
+
+    async def loaded_models(self) -> List[str]:
+        """Return the names of models currently loaded in memory (``/api/ps``)."""
+        data = await self._get("/api/ps")
+        return [entry["name"] for entry in data.get("models", [])]
+
+    async def list_models(self) -> List[str]:
+        """Return the names of locally available models (``/api/tags``)."""
+        data = await self._get("/api/tags")
+        return [entry["name"] for entry in data.get("models", [])]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-model load and generation metrics."""
+        return {model: metrics.as_dict() for model, metrics in self.metrics.items()}
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.http.aclose()
+
+    @staticmethod
+    def _generate_payload(
+        model: str,
+        prompt: str,
+        system: str,
+        images: Optional[List[str]],
+        options: Optional[Dict[str, Any]],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        """Build an ``/api/generate`` request body."""
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": stream}
+        if system:
+            payload["system"] = system
+        if images:
+            payload["images"] = images
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _record(self, model: str, response: Dict[str, Any], wall: float) -> None:
+        """Record the metrics of a final response."""
+        metrics = self.metrics.get(model)
+        if metrics is None:
+            metrics = self.metrics[model] = ModelMetrics()
+        metrics.record(response, wall)
+        EVAL_TOKENS.inc(response.get("eval_count", 0), model=model)
+        EVAL_SECONDS.inc(response.get("eval_duration", 0) / 1e9, model=model)
+        LOAD_SECONDS.inc(response.get("load_duration", 0) / 1e9, model=model)
+
+    async def _timed(self, model: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request with adaptive keep_alive and record its metrics."""
+        self.keep_alive.observe(model)
+        payload["keep_alive"] = self.keep_alive.keep_alive(model)
+        started = time.monotonic()
+        with TRACER.span("inference"):
+            response = await self._post(path, payload)
+        self._record(model, response, time.monotonic() - started)
+        return response
+
+    async def _stream(
+        self, model: str, path: str, payload: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming request and yield each NDJSON message."""
+        self.keep_alive.observe(model)
+        payload["keep_alive"] = self.keep_alive.keep_alive(model)
+        parser = NDJSONParser()
+        breaker = self.resilience.breaker(self._endpoint(path)) if self.resilience else None
+        if breaker is not None:
+            breaker.allow()
+        started = time.monotonic()
+        with TRACER.span("inference"):
+            try:
+                async with self.http.stream(
+                    "POST", path, json=payload, timeout=clip_timeout(self.http.timeout)
+                ) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        self._check(response, path)
+                    async for chunk in response.aiter_bytes():
+                        left = remaining_time()
+                        if left is not None and left <= 0:
+                            raise TimeoutError(
+                                f"Deadline exceeded streaming {path}", {"path": path}
+                            )
+                        for message in parser.feed(chunk):
+                            if "error" in message:
+                                raise OllamaError(
+                                    f"Ollama error: {message['error']}", {"path": path}
+                                )
+                            if message.get("done"):
+                                self._record(model, message, time.monotonic() - started)
+                            yield message
+            except httpx.HTTPError as e:
+                if breaker is not None:
+                    breaker.record_failure()
+                raise OllamaError(f"Ollama request failed: {e}", {"path": path})
+            except SubscriptionError as e:
+                raise OllamaError(f"Invalid Ollama stream: {e}", {"path": path})
+            except OllamaError as e:
+                if breaker is not None and e.details.get("status", 500) >= 500:
+                    breaker.record_failure()
+                raise
+            else:
+                if breaker is not None:
+                    breaker.record_success()
+            finally:
+                # The consumer may close the stream early or be cancelled
+                if breaker is not None:
+                    breaker.release()
+
+    async def _get(self, path: str) -> Dict[str, Any]:
+        """GET an API path."""
+        return await self._send("GET", path)
+
+    async def _post(
+        self, path: str, payload: Dict[str, Any], retry: bool = False
+    ) -> Dict[str, Any]:
+        """
+        POST a JSON payload to an API path.
+
+        Generations are not idempotent and a retry would queue a duplicate
+        behind the one still running on the server, so POSTs fail fast
+        unless ``retry`` is set.
+        """
+        return await self._send("POST", path, retry=retry, json=payload)
+
+    async def _send(
+        self, method: str, path: str, retry: bool = True, **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Send a request through the resilience layer when configured."""
+
+        async def attempt() -> Dict[str, Any]:
+            try:
+                response = await self.http.request(
+                    method, path, timeout=clip_timeout(self.http.timeout), **kwargs
+                )
+            except httpx.HTTPError as e:
+                raise OllamaError(f"Ollama request failed: {e}", {"path": path})
+            return self._check(response, path)
+
+        if self.resilience is None:
+            return await attempt()
+        return await self.resilience.call(
+            self._endpoint(path), attempt, retry=retry and self.retry
+        )
+
+    def _endpoint(self, path: str) -> str:
+        """Circuit breaker name for an API path on this host."""
+        return f"ollama:{self.base_url.rstrip('/')}{path}"
+
+    @staticmethod
+    def _check(response: httpx.Response, path: str) -> Dict[str, Any]:
+        """Raise OllamaError for error responses."""
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise OllamaError(
+                f"Ollama error: {message}", {"status": response.status_code, "path": path}
+            )
+        return response.json()
@@ -0,0 +1,339 @@
+"""
+Multi-host Ollama routing for the Canvus-Local-LLM application.
+
+When several Ollama hosts are configured, ``OllamaPool`` keeps one pooled
+``OllamaClient`` per host and routes each request to the healthy host with
+the fewest outstanding requests. Hosts that already have the requested model
+loaded (as reported by ``/api/ps``) are preferred: a host without it is only
+chosen when it is at least ``cold_penalty`` requests less busy, so bursts
+spill onto idle hosts while steady traffic avoids cold loads. A background
+task refreshes health and loaded models; a host that fails a request is
+taken out of rotation until its next successful health check.
+"""
+
+import asyncio
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+from loguru import logger
+
+from .config import Config
+from .dedup import SingleFlight
+from .exceptions import (
+    CanvusLLMException,
+    CircuitOpenError,
+    OllamaError,
+    ResourceError,
+    RetryExhaustedError,
+)
+from .ollama_client import KeepAlivePolicy, ModelMetrics, OllamaClient, generate_key
+from .resilience import Resilience
+
+# Errors that may be the host's fault and justify trying another one
+_BACKEND_ERRORS = (OllamaError, CircuitOpenError, RetryExhaustedError)
+
+
+def model_name(name: str) -> str:
+    """Normalise a model name the way ``/api/ps`` reports it (``name:tag``)."""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaBackend:
+    """One Ollama host with its routing state."""
+
+    __slots__ = ("url", "client", "outstanding", "healthy", "loaded", "served", "failures")
+
+    def __init__(self, url: str, client: OllamaClient):
+        """Initialize the backend."""
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.healthy = True
+        self.loaded: Set[str] = set()
+        self.served = 0
+        self.failures = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the routing state as a plain dictionary."""
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "served": self.served,
+            "failures": self.failures,
+            "loaded": sorted(self.loaded),
+        }
+
+
+class OllamaPool:
+    """
+    Least-outstanding-requests router over several Ollama hosts.
+
+    Offers the request methods of ``OllamaClient`` so it can be used in its
+    place. A request that fails with a connection error or a 5xx response is
+    retried once on another host. Host clients never retry themselves, so
+    failover is immediate. Identical concurrent ``generate`` requests are
+    coalesced by one ``SingleFlight`` for the whole pool, around routing and
+    failover, since routing would otherwise send them to different hosts.
+    """
+
+    def __init__(
+        self,
+        clients: Dict[str, OllamaClient],
+        model: str,
+        cold_penalty: int = 2,
+        health_interval: float = 15.0,
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        """Initialize the pool."""
+        if not clients:
+            raise ValueError("OllamaPool needs at least one backend")
+        self.backends = [OllamaBackend(url, client) for url, client in clients.items()]
+        self.model = model
+        self.cold_penalty = cold_penalty
+        self.health_interval = health_interval
+        self.single_flight = single_flight
+        self._health_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Config,
+        single_flight: Optional[SingleFlight] = None,
+        resilience: Optional[Resilience] = None,
+    ) -> "OllamaPool":
+        """Create a pool with one client per configured Ollama host."""
+        clients = {
+            url: OllamaClient(
+                url,
+                config.ollama_model,
+                keep_alive=KeepAlivePolicy(
+                    minimum=config.ollama_keep_alive_min,
+                    maximum=config.ollama_keep_alive_max,
+                ),
+                resilience=resilience,
+                retry=False,
+            )
+            for url in config.ollama_endpoints()
+        }
+        return cls(clients, config.ollama_model, single_flight=single_flight)
+
+    def start(self) -> None:
+        """Start the background health checks."""
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(), name="ollama-health")
+
+    async def close(self) -> None:
+        """Stop health checks and close every client."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await asyncio.gather(*(b.client.close() for b in self.backends))
+
+    def choose(self, model: str, exclude: Iterable[OllamaBackend] = ()) -> OllamaBackend:
+        """Return the backend a request for ``model`` should go to."""
+        name = model_name(model)
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if b.healthy and id(b) not in excluded]
+        if not candidates:
+            # Every host failed recently; try the least busy one anyway
+            candidates = [b for b in self.backends if id(b) not in excluded]
+        if not candidates:
+            raise ResourceError("No Ollama backend available", {"model": model})
+        return min(
+            candidates,
+            key=lambda b: b.outstanding + (0 if name in b.loaded else self.cold_penalty),
+        )
+
+    async def check_health(self) -> None:
+        """Refresh health and loaded models of every backend."""
+        await asyncio.gather(*(self._check_backend(b) for b in self.backends))
+
+    async def preload(self, models: Optional[Iterable[str]] = None) -> None:
+        """Load models on every host ahead of the first request."""
+        models = list(models or [self.model])
+        await asyncio.gather(*(b.client.preload(models) for b in self.backends))
+        await self.check_health()
+
+    async def generate(
+        self,
+        prompt: str,
+        system: str = "",
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Generate a completion on the least busy suitable host."""
+        model = model or self.model
+
+        async def run() -> str:
+            return await self._route(
+                model, lambda c: c.generate(prompt, system, images, model, options)
+            )
+
+        if self.single_flight is None:
+            return await run()
+        return await self.single_flight.do(
+            generate_key(model, prompt, system, images, options), run
+        )
+
+    async def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send a chat request to the least busy suitable host."""
+        model = model or self.model
+        return await self._route(model, lambda c: c.chat(messages, model, options))
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        system: str = "",
+        images: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a completion from the least busy suitable host."""
+        model = model or self.model
+        async for fragment in self._route_stream(
+            model, lambda c: c.generate_stream(prompt, system, images, model, options)
+        ):
+            yield fragment
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat response from the least busy suitable host."""
+        model = model or self.model
+        async for fragment in self._route_stream(
+            model, lambda c: c.chat_stream(messages, model, options)
+        ):
+            yield fragment
+
+    async def loaded_models(self) -> List[str]:
+        """Return the models loaded on any host."""
+        await self.check_health()
+        return sorted(set().union(*(b.loaded for b in self.backends)))
+
+    async def list_models(self) -> List[str]:
+        """Return the models available on any healthy host."""
+        results = await asyncio.gather(
+            *(b.client.list_models() for b in self.backends if b.healthy),
+            return_exceptions=True,
+        )
+        names: Set[str] = set()
+        for result in results:
+            if not isinstance(result, BaseException):
+                names.update(result)
+        return sorted(names)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-model metrics aggregated over all hosts."""
+        merged: Dict[str, ModelMetrics] = {}
+        for backend in self.backends:
+            for model, metrics in backend.client.metrics.items():
+                merged.setdefault(model, ModelMetrics()).merge(metrics)
+        return {model: metrics.as_dict() for model, metrics in merged.items()}
+
+    def backend_stats(self) -> Dict[str, Any]:
+        """Return the routing state of every host."""
+        return {b.url: b.as_dict() for b in self.backends}
+
+    async def _route(self, model: str, call: Callable[[OllamaClient], Awaitable[Any]]) -> Any:
+        """Run a request on a chosen backend, failing over once."""
+        tried: List[OllamaBackend] = []
+        while True:
+            backend = self.choose(model, tried)
+            tried.append(backend)
+            backend.outstanding += 1
+            try:
+                result = await call(backend.client)
+            except _BACKEND_ERRORS as e:
+                if not self._failed(backend, e) or len(tried) >= min(2, len(self.backends)):
+                    raise
+                logger.warning(f"Ollama host {backend.url} failed, retrying elsewhere: {e}")
+                continue
+            finally:
+                backend.outstanding -= 1
+            self._succeeded(backend, model)
+            return result
+
+    async def _route_stream(
+        self, model: str, call: Callable[[OllamaClient], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Stream from a chosen backend, failing over if nothing was received yet."""
+        tried: List[OllamaBackend] = []
+        while True:
+            backend = self.choose(model, tried)
+            tried.append(backend)
+            backend.outstanding += 1
+            received = False
+            try:
+                async for fragment in call(backend.client):
+                    received = True
+                    yield fragment
+            except _BACKEND_ERRORS as e:
+                if (
+                    received
+                    or not self._failed(backend, e)
+                    or len(tried) >= min(2, len(self.backends))
+                ):
+                    raise
+                logger.warning(f"Ollama host {backend.url} failed, retrying elsewhere: {e}")
+                continue
+            finally:
+                backend.outstanding -= 1
+            self._succeeded(backend, model)
+            return
+
+    def _succeeded(self, backend: OllamaBackend, model: str) -> None:
+        """Record a completed request; the model is now loaded on the host."""
+        backend.served += 1
+        backend.loaded.add(model_name(model))
+
+    def _failed(self, backend: OllamaBackend, error: CanvusLLMException) -> bool:
+        """Record a failure; return True if it was the host's fault."""
+        status = error.details.get("status")
+        if status is not None and status < 500:
+            return False
+        backend.failures += 1
+        if backend.healthy:
+            logger.warning(f"Marking Ollama host {backend.url} unhealthy")
+        backend.healthy = False
+        return True
+
+    async def _check_backend(self, backend: OllamaBackend) -> None:
+        """Probe one backend with ``/api/ps``."""
+        try:
+            loaded = await asyncio.wait_for(backend.client.loaded_models(), timeout=5)
+        except (CanvusLLMException, asyncio.TimeoutError) as e:
+            if backend.healthy:
+                logger.warning(f"Ollama host {backend.url} failed health check: {e}")
+            backend.healthy = False
+            return
+        if not backend.healthy:
+            logger.info(f"Ollama host {backend.url} is healthy again")
+        backend.healthy = True
+        backend.loaded = set(loaded)
+
+    async def _health_loop(self) -> None:
+        """Check every backend periodically."""
+        while True:
+            started = time.monotonic()
+            await self.check_health()
+            await asyncio.sleep(max(0.0, self.health_interval - (time.monotonic() - started)))
@@ -0,0 +1,272 @@
+"""
+PDF summarisation pipeline for the Canvus-Local-LLM application.
+
+This module implements the PDF precis workflow as a streaming map-reduce:
+page text is extracted lazily with PyPDF2, packed into chunks that fit a token
+budget, and each chunk is summarised concurrently against the LLM up to a
+configurable parallelism. Chunk summaries are merged hierarchically in groups
+as soon as they are available, so only a bounded window of raw text and
+partial summaries is held in memory regardless of the document's length.
+With a job journal checkpoint, each chunk summary is recorded as it
+completes, and a resumed run reuses the recorded summaries instead of
+summarising those chunks again.
+"""
+
+import asyncio
+import re
+from pathlib import Path
+from typing import (
+    IO,
+    Awaitable,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+
+from .config import Config
+from .exceptions import ProcessingError
+from .job_journal import JobCheckpoint
+
+SummarizeFunc = Callable[[str, str], Awaitable[str]]
+ProgressFunc = Callable[[str], Awaitable[None]]
+
+MAP_INSTRUCTION = (
+    "Summarise the following section of a document. Keep key facts, figures, "
+    "names and conclusions. Respond with the summary only."
+)
+REDUCE_INSTRUCTION = (
+    "The following are consecutive partial summaries of one document. Combine "
+    "them into a single coherent summary without repeating points. Respond "
+    "with the summary only."
+)
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of English text (about 4 chars/token)."""
+    return (len(text) + 3) // 4
+
+
+def iter_page_text(reader: "PyPDF2.PdfReader") -> Iterator[str]:  # noqa: F821
+    """Yield the text of each page, parsing pages only as they are requested."""
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def iter_chunks(pages: Iterator[str], max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """
+    Pack page text into chunks of at most ``max_tokens``.
+
+    Paragraph boundaries are preferred; oversized paragraphs are split on
+    whitespace. Yields ``(chunk_text, pages_consumed)`` tuples.
+    """
+    max_chars = max_tokens * 4
+    parts: List[str] = []
+    size = 0
+    page_count = 0
+    for page_count, text in enumerate(pages, 1):
+        for paragraph in _PARAGRAPH_BREAK.split(text):
+            paragraph = " ".join(paragraph.split())
+            while paragraph:
+                room = max_chars - size
+                if len(paragraph) <= room:
+                    parts.append(paragraph)
+                    size += len(paragraph) + 1
+                    break
+                if parts and (len(paragraph) <= max_chars or room < max_chars // 4):
+                    yield "\n".join(parts), page_count
+                    parts, size = [], 0
+                    continue
+                cut = paragraph.rfind(" ", 0, room)
+                if cut <= 0:
+                    cut = room
+                parts.append(paragraph[:cut])
+                yield "\n".join(parts), page_count
+                parts, size = [], 0
+                paragraph = paragraph[cut:].lstrip()
+    if parts:
+        yield "\n".join(parts), page_count
+
+
+class PdfSummarizer:
+    """
+    Streaming map-reduce summariser.
+
+    ``summarize(instruction, text)`` is called for every chunk (map) and for
+    every group of ``reduce_fanin`` consecutive summaries (reduce). All LLM
+    calls share one concurrency limit of ``parallelism``. With a
+    ``checkpoint``, chunk summaries (stages ``map:<n>``) and the final
+    summary (stage ``summary``) are journalled and reused when resuming.
+    """
+
+    def __init__(
+        self,
+        summarize: SummarizeFunc,
+        parallelism: int = 4,
+        chunk_tokens: int = 2000,
+        reduce_fanin: int = 4,
+        progress: Optional[ProgressFunc] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+    ):
+        """Initialize the summariser."""
+        if reduce_fanin < 2:
+            raise ValueError("reduce_fanin must be at least 2")
+        self.summarize = summarize
+        self.parallelism = parallelism
+        self.chunk_tokens = chunk_tokens
+        self.reduce_fanin = reduce_fanin
+        self.progress = progress
+        self.checkpoint = checkpoint
+        self._llm_slots = asyncio.Semaphore(parallelism)
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.chunks_resumed = 0
+        self.pages_total = 0
+        self.pages_read = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Config,
+        summarize: SummarizeFunc,
+        progress: Optional[ProgressFunc] = None,
+        checkpoint: Optional[JobCheckpoint] = None,
+    ) -> "PdfSummarizer":
+        """Create a summariser using the application configuration."""
+        return cls(
+            summarize,
+            parallelism=config.pdf_parallelism,
+            chunk_tokens=config.pdf_chunk_tokens,
+            progress=progress,
+            checkpoint=checkpoint,
+        )
+
+    async def run(self, source: Union[str, Path, IO[bytes]]) -> str:
+        """Summarise a PDF given as a path or binary file object."""
+        if self.checkpoint is not None:
+            summary = self.checkpoint.get("summary")
+            if summary is not None:
+                return summary
+        import PyPDF2
+
+        loop = asyncio.get_running_loop()
+        handle = None
+        if isinstance(source, (str, Path)):
+            handle = source = await loop.run_in_executor(None, open, source, "rb")
+        try:
+            reader = await loop.run_in_executor(None, PyPDF2.PdfReader, source)
+            self.pages_total = len(reader.pages)
+            chunks = iter_chunks(iter_page_text(reader), self.chunk_tokens)
+            summary = await self._map_reduce(chunks)
+            if self.checkpoint is not None:
+                self.checkpoint.record("summary", summary)
+            return summary
+        except PyPDF2.errors.PdfReadError as e:
+            raise ProcessingError(f"Unable to read PDF: {e}")
+        finally:
+            if handle is not None:
+                handle.close()
+
+    async def _map_reduce(self, chunks: Iterator[Tuple[str, int]]) -> str:
+        """Run the map and streaming hierarchical reduce over chunks."""
+        loop = asyncio.get_running_loop()
+        # Bounds how many extracted chunks exist at once (queued or in flight)
+        window = asyncio.Semaphore(self.parallelism * 2)
+        levels: List[List["asyncio.Future[str]"]] = [[]]
+        try:
+            while True:
+                await window.acquire()
+                # Stop extracting and dispatching as soon as any summary failed
+                self._raise_failure(levels)
+                item = await loop.run_in_executor(None, next, chunks, None)
+                if item is None:
+                    window.release()
+                    break
+                text, self.pages_read = item
+                index = self.chunks_total
+                self.chunks_total += 1
+                levels[0].append(asyncio.ensure_future(self._map(index, text, window)))
+                self._cascade(levels, final=False)
+
+            if not any(levels):
+                raise ProcessingError("PDF contains no extractable text")
+            self._cascade(levels, final=True)
+            return await levels[-1][0]
+        except BaseException:
+            for level in levels:
+                for task in level:
+                    task.cancel()
+            raise
+
+    @staticmethod
+    def _raise_failure(levels: List[List["asyncio.Future[str]"]]) -> None:
+        """Re-raise the error of the first failed map or reduce task, if any."""
+        for level in levels:
+            for task in level:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+
+    def _cascade(self, levels: List[List["asyncio.Future[str]"]], final: bool) -> None:
+        """Schedule reduce tasks for every full group (or all leftovers if final)."""
+        depth = 0
+        while depth < len(levels):
+            level = levels[depth]
+            is_top = depth == len(levels) - 1
+            if len(level) >= self.reduce_fanin or (final and len(level) > 1):
+                group, levels[depth] = level, []
+                if is_top:
+                    levels.append([])
+                levels[depth + 1].append(asyncio.ensure_future(self._reduce(group)))
+            elif final and len(level) == 1 and not is_top:
+                levels[depth + 1].append(levels[depth].pop())
+            depth += 1
+        if final and len(levels[-1]) > 1:
+            self._cascade(levels, final=True)
+
+    async def _map(self, index: int, text: str, window: asyncio.Semaphore) -> str:
+        """Summarise one chunk, or reuse its journalled summary."""
+        stage = f"map:{index}"
+        try:
+            summary = self.checkpoint.get(stage) if self.checkpoint is not None else None
+            if summary is not None:
+                self.chunks_resumed += 1
+            else:
+                async with self._llm_slots:
+                    summary = await self.summarize(MAP_INSTRUCTION, text)
+                if self.checkpoint is not None:
+                    self.checkpoint.record(stage, summary)
+        finally:
+            window.release()
+        self.chunks_done += 1
+        await self._report()
+        return summary
+
+    async def _reduce(self, group: List["asyncio.Future[str]"]) -> str:
+        """Combine consecutive summaries into one."""
+        try:
+            summaries = await asyncio.gather(*group)
+        except BaseException:
+            for task in group:
+                task.cancel()
+            raise
+        async with self._llm_slots:
+            return await self.summarize(REDUCE_INSTRUCTION, "\n\n".join(summaries))
+
+    async def _report(self) -> None:
+        """Send a progress message, ignoring reporting failures."""
+        if self.progress is None:
+            return
+        message = (
+            f"Summarised {self.chunks_done}/{self.chunks_total} sections "
+            f"(read {self.pages_read}/{self.pages_total} pages)"
+        )
+        try:
+            await self.progress(message)
+        except Exception as e:
+            logger.warning(f"Progress update failed: {e}")
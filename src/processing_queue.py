@@ -0,0 +1,267 @@
+"""
+Processing queue for the Canvus-Local-LLM application.
+
+This module schedules AI processing jobs onto a fixed pool of worker tasks.
+The queue is bounded and sheds load with ``ResourceError`` when full, cheap
+text prompts are served before long-running PDF and canvas jobs, and within a
+priority level canvases are served round-robin so one busy canvas cannot
+starve the others.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from .exceptions import ProcessingError, ResourceError
+
+JobFunc = Callable[[], Awaitable[Any]]
+
+
+class JobPriority(IntEnum):
+    """Scheduling priority; lower values are served first."""
+
+    TEXT = 0
+    IMAGE = 1
+    DOCUMENT = 2
+
+
+class Job:
+    """A unit of work queued for a canvas."""
+
+    __slots__ = ("canvas_id", "priority", "func", "name", "enqueued_at", "future")
+
+    def __init__(
+        self,
+        canvas_id: str,
+        priority: JobPriority,
+        func: JobFunc,
+        name: str,
+        future: "asyncio.Future[Any]",
+    ):
+        """Initialize the job."""
+        self.canvas_id = canvas_id
+        self.priority = priority
+        self.func = func
+        self.name = name
+        self.enqueued_at = time.monotonic()
+        self.future = future
+
+
+class TimingStats:
+    """Count, mean and maximum of a duration in seconds."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record one observation."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the statistics in milliseconds."""
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": round(mean * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class ProcessingScheduler:
+    """
+    Bounded, priority-aware job scheduler with a worker pool.
+
+    Jobs are held per priority level in an ordered map of canvas ID to FIFO.
+    A worker takes the highest priority level that has work, pops one job from
+    the canvas at the head of that level and rotates the canvas to the back.
+    """
+
+    def __init__(self, max_size: int = 200, workers: int = 2):
+        """Initialize the scheduler."""
+        self.max_size = max_size
+        self.worker_count = workers
+        self._levels: List["OrderedDict[str, Deque[Job]]"] = [
+            OrderedDict() for _ in JobPriority
+        ]
+        self._size = 0
+        self._available = asyncio.Semaphore(0)
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.accepting = True
+        self.active = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = TimingStats()
+        self.service_time = TimingStats()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def submit(
+        self,
+        canvas_id: str,
+        func: JobFunc,
+        priority: JobPriority = JobPriority.TEXT,
+        name: str = "job",
+    ) -> "asyncio.Future[Any]":
+        """Queue a job and return a future for its result."""
+        if not self.accepting:
+            self.rejected += 1
+            raise ResourceError(
+                "Processing queue is draining",
+                {"canvas_id": canvas_id, "job": name},
+            )
+        if self._size >= self.max_size:
+            self.rejected += 1
+            raise ResourceError(
+                "Processing queue is full",
+                {"canvas_id": canvas_id, "job": name, "max_size": self.max_size},
+            )
+        future = asyncio.get_running_loop().create_future()
+        job = Job(canvas_id, priority, func, name, future)
+        level = self._levels[priority]
+        queue = level.get(canvas_id)
+        if queue is None:
+            queue = level[canvas_id] = deque()
+        queue.append(job)
+        self._size += 1
+        self._idle.clear()
+        self._available.release()
+        return future
+
+    def start(self) -> None:
+        """Start the worker tasks."""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"processing-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Processing scheduler started with {self.worker_count} workers")
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Stop accepting jobs and wait up to ``timeout`` seconds for the queue to empty.
+
+        Returns True if every queued and running job finished in time.
+        """
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """Cancel the workers and fail any jobs still queued."""
+        self._stopping = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._stopping = False
+        for level in self._levels:
+            for queue in level.values():
+                for job in queue:
+                    if not job.future.done():
+                        job.future.cancel()
+            level.clear()
+        self._size = 0
+        self._idle.set()
+
+    def depth(self) -> Dict[str, int]:
+        """Return the number of queued jobs per priority level."""
+        return {
+            priority.name.lower(): sum(len(q) for q in self._levels[priority].values())
+            for priority in JobPriority
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, wait time and service time metrics."""
+        return {
+            "depth": self._size,
+            "depth_by_priority": self.depth(),
+            "active": self.active,
+            "workers": self.worker_count,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_time": self.wait_time.as_dict(),
+            "service_time": self.service_time.as_dict(),
+        }
+
+    def _next_job(self) -> Optional[Job]:
+        """Pop the next job by priority, round-robin across canvases."""
+        for level in self._levels:
+            while level:
+                canvas_id, queue = next(iter(level.items()))
+                job = queue.popleft()
+                if queue:
+                    level.move_to_end(canvas_id)
+                else:
+                    del level[canvas_id]
+                self._size -= 1
+                if job.future.cancelled():
+                    continue
+                return job
+        return None
+
+    async def _worker(self) -> None:
+        """Run jobs until cancelled."""
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            if job is None:
+                self._check_idle()
+                continue
+            started = time.monotonic()
+            self.wait_time.record(started - job.enqueued_at)
+            self.active += 1
+            try:
+                result = await job.func()
+            except asyncio.CancelledError:
+                if self._stopping:
+                    job.future.cancel()
+                    raise
+                # The job cancelled itself; only that job fails
+                self.failed += 1
+                logger.error(f"Job {job.name} for canvas {job.canvas_id} was cancelled")
+                if not job.future.done():
+                    job.future.set_exception(
+                        ProcessingError(
+                            f"Job {job.name} was cancelled",
+                            {"canvas_id": job.canvas_id, "job": job.name},
+                        )
+                    )
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Job {job.name} for canvas {job.canvas_id} failed: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.active -= 1
+                self.service_time.record(time.monotonic() - started)
+                self._check_idle()
+
+    def _check_idle(self) -> None:
+        """Signal ``drain`` once nothing is queued or running."""
+        if self._size == 0 and self.active == 0:
+            self._idle.set()
@@ -0,0 +1,319 @@
+"""
+Resilience layer shared by the Canvus and Ollama clients.
+
+This module provides exponential backoff with full jitter driven by
+``Config.max_retries`` and ``Config.retry_delay``, per-endpoint circuit
+breakers that fail fast while a service is unhealthy, deadline propagation so
+retries never outlive the caller's time budget, and optional request hedging
+for idempotent reads.
+"""
+
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import httpx
+from loguru import logger
+
+from .config import Config
+from .exceptions import (
+    CanvusLLMException,
+    CircuitOpenError,
+    RetryExhaustedError,
+    TimeoutError,
+)
+
+T = TypeVar("T")
+AsyncFunc = Callable[[], Awaitable[T]]
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Bound all resilient calls made inside the block to ``seconds``.
+
+    Nested deadlines can only shorten the budget, never extend it.
+    """
+    limit = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(limit if outer is None else min(outer, limit))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None if unbounded."""
+    limit = _deadline.get()
+    return None if limit is None else limit - time.monotonic()
+
+
+def clip_timeout(timeout: httpx.Timeout) -> httpx.Timeout:
+    """Shorten every phase of an HTTP timeout to the time left before the deadline."""
+    left = remaining_time()
+    if left is None:
+        return timeout
+    left = max(0.0, left)
+    return httpx.Timeout(
+        **{
+            phase: left if value is None else min(value, left)
+            for phase, value in timeout.as_dict().items()
+        }
+    )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Return True for transient failures.
+
+    Connection failures (no HTTP status), 408, 429 and 5xx responses are
+    retried; other client errors are not.
+    """
+    if isinstance(error, (CircuitOpenError, RetryExhaustedError)):
+        return False
+    if isinstance(error, CanvusLLMException):
+        status = error.details.get("status")
+        return status is None or status in (408, 429) or status >= 500
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one endpoint.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single trial call
+    is let through; success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the breaker."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trial_inflight = False
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError if the call must not proceed."""
+        if self.state == self.CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_inflight = False
+        if self.state == self.HALF_OPEN and not self._trial_inflight:
+            self._trial_inflight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(
+            f"Circuit for {self.name} is open",
+            {
+                "endpoint": self.name,
+                "retry_in": max(0.0, self.reset_timeout - (now - self._opened_at)),
+            },
+        )
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_inflight = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_inflight = False
+
+    def release(self) -> None:
+        """
+        End a call that recorded no outcome, such as a cancelled one.
+
+        Frees the half-open trial slot so the next call can probe the
+        endpoint instead of being rejected until the process restarts.
+        """
+        self._trial_inflight = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by the current deadline."""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        """Initialize the policy."""
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Return the sleep before retry number ``attempt`` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+async def hedged(func: AsyncFunc, hedge_delay: float, max_hedges: int = 1) -> Any:
+    """
+    Run ``func``; if it has not finished after ``hedge_delay``, start another copy.
+
+    The first successful result wins and the remaining attempts are cancelled.
+    Only use this for idempotent requests.
+    """
+    tasks = [asyncio.ensure_future(func())]
+    launched = 1
+    try:
+        while True:
+            timeout = hedge_delay if launched <= max_hedges else None
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                tasks.append(asyncio.ensure_future(func()))
+                launched += 1
+                continue
+            error: Optional[BaseException] = None
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if not tasks and error is not None:
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class Resilience:
+    """Retry, circuit breaking, deadlines and hedging for outbound calls."""
+
+    def __init__(
+        self,
+        retry: Optional[RetryPolicy] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        """Initialize the layer."""
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+        self.hedges = 0
+
+    @classmethod
+    def from_config(cls, config: Config) -> "Resilience":
+        """Create the layer from ``max_retries`` and ``retry_delay``."""
+        return cls(
+            RetryPolicy(
+                max_retries=config.max_retries,
+                base_delay=config.retry_delay / 10,
+                max_delay=float(config.retry_delay),
+            )
+        )
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        """Return the breaker for an endpoint, creating it on first use."""
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                endpoint, self.failure_threshold, self.reset_timeout
+            )
+        return breaker
+
+    async def call(
+        self,
+        endpoint: str,
+        func: AsyncFunc,
+        retry: bool = True,
+        hedge_delay: Optional[float] = None,
+    ) -> Any:
+        """
+        Call ``func`` through the endpoint's breaker with retries.
+
+        ``hedge_delay`` enables hedging and must only be set for idempotent
+        requests. Raises CircuitOpenError without calling ``func`` when the
+        circuit is open, TimeoutError when the deadline is exhausted, and
+        RetryExhaustedError when every attempt failed.
+        """
+        breaker = self.breaker(endpoint)
+        attempts = (self.retry.max_retries if retry else 0) + 1
+        last_error: Optional[BaseException] = None
+        for attempt in range(1, attempts + 1):
+            breaker.allow()
+            left = remaining_time()
+            if left is not None and left <= 0:
+                raise TimeoutError(f"Deadline exceeded calling {endpoint}", {"endpoint": endpoint})
+            try:
+                if hedge_delay is not None:
+                    self.hedges += 1
+                    call = hedged(func, hedge_delay)
+                else:
+                    call = func()
+                result = await (call if left is None else asyncio.wait_for(call, left))
+            except asyncio.TimeoutError:
+                breaker.record_failure()
+                raise TimeoutError(f"Deadline exceeded calling {endpoint}", {"endpoint": endpoint})
+            except Exception as e:
+                if not is_retryable(e):
+                    # A rejected request says nothing about the endpoint's health
+                    raise
+                breaker.record_failure()
+                last_error = e
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                # Cancellation and other BaseExceptions record no outcome
+                breaker.release()
+
+            if attempt == attempts:
+                break
+            sleep = self.retry.delay(attempt)
+            left = remaining_time()
+            if left is not None and sleep >= left:
+                raise TimeoutError(
+                    f"Deadline exceeded retrying {endpoint}",
+                    {"endpoint": endpoint, "error": str(last_error)},
+                )
+            self.retries += 1
+            logger.debug(f"Retrying {endpoint} in {sleep:.2f}s after: {last_error}")
+            await asyncio.sleep(sleep)
+
+        if attempts == 1 and last_error is not None:
+            raise last_error
+        raise RetryExhaustedError(
+            f"{endpoint} failed after {attempts} attempts: {last_error}",
+            {"endpoint": endpoint, "attempts": attempts},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return retry counters and breaker states."""
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "breakers": {
+                name: {"state": b.state, "failures": b.failures, "rejected": b.rejected}
+                for name, b in self.breakers.items()
+            },
+        }
@@ -0,0 +1,236 @@
+"""
+Persistent LLM response cache for the Canvus-Local-LLM application.
+
+Results are stored on disk in a SQLite database keyed by a content hash (for
+example a Canvus asset hash), the model name and the prompt template version,
+so re-summarising the same PDF or re-OCRing the same snapshot is answered
+without running inference again. The cache is bounded by total size and
+evicts least recently used entries first; callers may also ignore entries
+older than a maximum age.
+
+Command line usage:
+    python -m src.response_cache stats
+    python -m src.response_cache purge [--model NAME]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from .config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    template_version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def cache_key(
+    content_hash: str, model: str, template_version: str, prompt: str = ""
+) -> str:
+    """Return the cache key for a content hash, model, template and prompt."""
+    digest = hashlib.sha256()
+    for part in (content_hash, model, template_version, prompt):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def default_cache_dir(config: Config) -> Path:
+    """Return the configured cache directory, next to config.json by default."""
+    if config.cache_dir:
+        return Path(config.cache_dir)
+    return config.get_config_file_path().parent / "cache"
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of LLM responses backed by SQLite.
+
+    The synchronous methods are safe to call from any thread; the ``a``-prefixed
+    coroutines run them in the default executor so disk I/O stays off the event
+    loop.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024):
+        """Initialize the cache, creating the database if needed."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "responses.sqlite3"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @classmethod
+    def from_config(cls, config: Config) -> "ResponseCache":
+        """Create a cache using the application configuration."""
+        return cls(default_cache_dir(config), config.cache_max_mb * 1024 * 1024)
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        Return a cached response and refresh its recency, or None.
+
+        Entries stored more than ``max_age`` seconds ago count as misses.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (max_age is not None and now - row[1] > max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str, model: str, template_version: str) -> None:
+        """Store a response, evicting least recently used entries if needed."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"Response of {size} bytes exceeds cache size; not cached")
+            return
+        now = time.time()
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, template_version, value, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def purge(self, model: Optional[str] = None) -> int:
+        """Delete all entries, or only those for one model; return the count."""
+        with self._lock:
+            if model is None:
+                cursor = self._db.execute("DELETE FROM responses")
+            else:
+                cursor = self._db.execute("DELETE FROM responses WHERE model = ?", (model,))
+            self._db.commit()
+            self._size = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            self._db.execute("VACUUM")
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry counts, size and hit/miss counters."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            models = dict(
+                self._db.execute(
+                    "SELECT model, COUNT(*) FROM responses GROUP BY model"
+                ).fetchall()
+            )
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "models": models,
+        }
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    async def aget(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Asynchronous ``get``."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get, key, max_age
+        )
+
+    async def aput(self, key: str, value: str, model: str, template_version: str) -> None:
+        """Asynchronous ``put``."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.put, key, value, model, template_version)
+        )
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[str]],
+        model: str,
+        template_version: str,
+        max_age: Optional[float] = None,
+    ) -> str:
+        """Return the cached response for ``key`` or compute and store it."""
+        cached = await self.aget(key, max_age)
+        if cached is not None:
+            return cached
+        value = await compute()
+        await self.aput(key, value, model, template_version)
+        return value
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until under the size bound."""
+        while self._size > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    break
+
+
+def main() -> None:
+    """Inspect or purge the response cache."""
+    parser = argparse.ArgumentParser(description="Canvus-Local-LLM response cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show cache location, size and entries")
+    purge = commands.add_parser("purge", help="Delete cached responses")
+    purge.add_argument("--model", help="Only delete entries for this model")
+    args = parser.parse_args()
+
+    cache = ResponseCache.from_config(Config.load_config())
+    if args.command == "stats":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    else:
+        removed = cache.purge(args.model)
+        print(f"Removed {removed} entries")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
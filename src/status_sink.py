@@ -0,0 +1,113 @@
+"""
+Status sinks for the Canvus-Local-LLM application.
+
+The application reports its status text and icon state, and receives
+settings changes, through a ``StatusSink``. On a desktop the sink is the
+Windows system tray; in headless mode (Linux servers, CI, load tests) the
+sink logs changes and keeps the latest state for the local HTTP API, which
+also accepts settings changes.
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+RestartFunc = Callable[[], None]
+ExitFunc = Callable[[], None]
+SettingsFunc = Callable[[str, str], None]
+StatusFunc = Callable[[], str]
+
+ICON_STATES = ("default", "connected", "processing", "error")
+
+# Settings that can be changed from the tray menu or the local HTTP API
+SETTING_FIELDS = {
+    "server": "canvus_server_url",
+    "api_key": "canvus_api_key",
+    "username": "canvus_username",
+    "password": "canvus_password",
+    "model": "ollama_model",
+}
+
+
+class StatusSink:
+    """Receives status and icon-state updates; the base class only records them."""
+
+    def __init__(self) -> None:
+        """Initialize the sink."""
+        self.status = "Idle"
+        self.icon_state = "default"
+
+    def start(self) -> None:
+        """Start presenting status."""
+
+    def set_status(self, status: str) -> None:
+        """Show a new status text."""
+        self.status = status
+
+    def set_icon_state(self, state: str) -> None:
+        """Show a new icon state (default, connected, processing, error)."""
+        if state in ICON_STATES:
+            self.icon_state = state
+
+    def shutdown(self) -> None:
+        """Stop presenting status."""
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the current status and icon state."""
+        return {"status": self.status, "state": self.icon_state}
+
+
+class TrayStatusSink(StatusSink):
+    """Presents status through the Windows system tray icon."""
+
+    def __init__(
+        self,
+        on_restart: RestartFunc,
+        on_settings_change: SettingsFunc,
+        get_status: Optional[StatusFunc] = None,
+        on_exit: Optional[ExitFunc] = None,
+    ):
+        """Initialize the sink; the tray module is imported here, not at startup."""
+        super().__init__()
+        from .tray import CanvusTray
+
+        self.tray = CanvusTray(
+            on_restart=on_restart,
+            on_settings_change=on_settings_change,
+            get_status=get_status,
+            on_exit=on_exit,
+        )
+
+    def start(self) -> None:
+        """Show the tray icon."""
+        self.tray.start_tray()
+
+    def set_status(self, status: str) -> None:
+        """Show the status in the tray tooltip."""
+        super().set_status(status)
+        self.tray.set_tooltip(f"Canvus-Local-LLM: {status}")
+
+    def set_icon_state(self, state: str) -> None:
+        """Switch the tray icon."""
+        super().set_icon_state(state)
+        self.tray.set_icon_state(state)
+
+    def shutdown(self) -> None:
+        """Remove the tray icon."""
+        self.tray.shutdown()
+
+
+class LogStatusSink(StatusSink):
+    """Logs status and icon-state changes for headless operation."""
+
+    def set_status(self, status: str) -> None:
+        """Log the status if it changed."""
+        if status != self.status:
+            logger.info(f"Status: {status}")
+        super().set_status(status)
+
+    def set_icon_state(self, state: str) -> None:
+        """Log the state if it changed."""
+        if state != self.icon_state:
+            logger.info(f"State: {state}")
+        super().set_icon_state(state)
@@ -0,0 +1,178 @@
+"""
+Streaming output sinks for the Canvus-Local-LLM application.
+
+Workflows that stream tokens from Ollama push fragments into a sink, which
+periodically writes the accumulated text to a Canvus note. Writes are
+throttled by token count and elapsed time, run in the background so a slow
+PATCH never stalls generation, and always carry the latest text so skipped
+intermediate states cost nothing. A generation cancelled part-way (for
+example at shutdown) leaves the partial text on the note, marked as
+interrupted, instead of a trailing "..." that never completes.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Union
+
+from loguru import logger
+
+from .canvus_client import CanvusClient
+from .config import Config
+from .metrics import TRACER
+from .write_back import WriteBack
+
+WriteFunc = Callable[[str], Awaitable[None]]
+
+INTERRUPTED_SUFFIX = "\n\n[Interrupted]"
+# Upper bound on the final write of a cancelled generation
+CANCEL_WRITE_TIMEOUT = 2.0
+
+
+def note_writer(
+    client: Union[CanvusClient, WriteBack], canvas_id: str, note_id: str
+) -> WriteFunc:
+    """Return a write function that replaces the text of a Canvus note."""
+    path = f"/canvases/{canvas_id}/notes/{note_id}"
+
+    async def write(text: str) -> None:
+        if isinstance(client, WriteBack):
+            await client.patch(path, {"text": text})
+        else:
+            await client.request_json("PATCH", path, json={"text": text})
+
+    return write
+
+
+class StreamingSink:
+    """
+    Throttled writer for incrementally generated text.
+
+    A write is started when at least ``min_tokens`` fragments have arrived
+    since the last one or ``min_interval`` seconds have passed, and never
+    while a previous write is still in flight. ``close()`` always writes the
+    final text. Time-to-first-visible-token is measured from ``started_at``
+    (defaults to sink creation) to the completion of the first write.
+    """
+
+    def __init__(
+        self,
+        write: WriteFunc,
+        min_interval: float = 0.5,
+        min_tokens: int = 20,
+        started_at: Optional[float] = None,
+        suffix: str = " ...",
+    ):
+        """Initialize the sink."""
+        self.write = write
+        self.min_interval = min_interval
+        self.min_tokens = min_tokens
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.suffix = suffix
+        self.parts: List[str] = []
+        self.tokens = 0
+        self.writes = 0
+        self.first_visible: Optional[float] = None
+        self._pending_tokens = 0
+        self._last_write = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(
+        cls, config: Config, write: WriteFunc, started_at: Optional[float] = None
+    ) -> "StreamingSink":
+        """Create a sink using the application configuration."""
+        return cls(
+            write,
+            min_interval=config.stream_write_interval_ms / 1000,
+            min_tokens=config.stream_write_tokens,
+            started_at=started_at,
+        )
+
+    @property
+    def text(self) -> str:
+        """Text received so far."""
+        return "".join(self.parts)
+
+    async def feed(self, fragment: str) -> None:
+        """Add a generated fragment, writing to the note if the throttle allows."""
+        self.parts.append(fragment)
+        self.tokens += 1
+        self._pending_tokens += 1
+        if self._inflight is not None and not self._inflight.done():
+            return
+        if self._inflight is not None:
+            self._log_write_error(self._inflight)
+            self._inflight = None
+        now = time.monotonic()
+        due = (
+            self.first_visible is None
+            or self._pending_tokens >= self.min_tokens
+            or now - self._last_write >= self.min_interval
+        )
+        if due:
+            self._pending_tokens = 0
+            self._last_write = now
+            self._inflight = asyncio.ensure_future(self._write(self.text + self.suffix))
+
+    async def close(self) -> str:
+        """Wait for any write in flight, then write and return the final text."""
+        if self._inflight is not None:
+            try:
+                await self._inflight
+            except Exception as e:
+                logger.warning(f"Intermediate streaming write failed: {e}")
+        text = self.text
+        await self._write(text)
+        logger.info(
+            f"Streamed {self.tokens} tokens in {self.writes} writes; "
+            f"first visible after {self.time_to_first_visible or 0:.2f}s"
+        )
+        return text
+
+    async def consume(self, fragments: AsyncIterator[str]) -> str:
+        """Feed every fragment from an async iterator and return the final text."""
+        try:
+            async for fragment in fragments:
+                await self.feed(fragment)
+        except asyncio.CancelledError:
+            if self._inflight is not None:
+                self._inflight.cancel()
+            await self._write_interrupted()
+            raise
+        except BaseException:
+            if self._inflight is not None:
+                self._inflight.cancel()
+            raise
+        return await self.close()
+
+    @property
+    def time_to_first_visible(self) -> Optional[float]:
+        """Seconds from the start until text first appeared on the canvas."""
+        if self.first_visible is None:
+            return None
+        return self.first_visible - self.started_at
+
+    async def _write(self, text: str) -> None:
+        """Perform one write and record the first visible time."""
+        with TRACER.span("write_back"):
+            await self.write(text)
+        self.writes += 1
+        if self.first_visible is None:
+            self.first_visible = time.monotonic()
+
+    async def _write_interrupted(self) -> None:
+        """Mark the note as interrupted, giving up after ``CANCEL_WRITE_TIMEOUT``."""
+        if not self.parts:
+            return
+        try:
+            await asyncio.wait_for(
+                self.write(self.text + INTERRUPTED_SUFFIX), CANCEL_WRITE_TIMEOUT
+            )
+        except (Exception, asyncio.CancelledError) as e:
+            logger.warning(f"Could not mark cancelled generation as interrupted: {e!r}")
+
+    @staticmethod
+    def _log_write_error(task: asyncio.Task) -> None:
+        """Log the failure of a completed intermediate write."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Intermediate streaming write failed: {task.exception()}")
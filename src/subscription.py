@@ -0,0 +1,335 @@
+"""
+Canvas subscription streaming for the Canvus-Local-LLM application.
+
+This module consumes the Canvus API ``?subscribe`` streams, which deliver
+newline-separated JSON objects over a long-lived HTTP response. Parsing is
+incremental and bounded in memory, blank keep-alive lines are ignored,
+malformed lines are logged and skipped, and dropped connections are
+re-established with exponential backoff.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import httpx
+from loguru import logger
+
+from .exceptions import SubscriptionError
+from .logging_setup import sampled
+
+EventHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+SnapshotHandler = Callable[[str, Set[str]], Awaitable[None]]
+
+_keepalive_log = sampled("keepalive")
+
+
+class NDJSONParser:
+    """
+    Incremental parser for newline-delimited JSON streams.
+
+    Bytes are fed in arbitrary chunks as they arrive from the network. Only the
+    trailing partial line is buffered, so memory stays bounded by
+    ``max_line_bytes`` regardless of how long the stream runs.
+    """
+
+    def __init__(self, max_line_bytes: int = 8 * 1024 * 1024):
+        """Initialize the parser."""
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self.keepalives = 0
+        self.malformed = 0
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Feed a chunk of bytes and return every complete JSON value in it."""
+        self._buffer.extend(chunk)
+        values: List[Any] = []
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(self._buffer[start:end]).strip()
+            start = end + 1
+            if not line:
+                self.keepalives += 1
+                continue
+            try:
+                values.append(json.loads(line))
+            except ValueError as e:
+                # One bad line must not cost a reconnect and snapshot replay
+                self.malformed += 1
+                logger.warning(
+                    f"Skipping invalid JSON in subscription stream: {e}: "
+                    f"{line[:200].decode('utf-8', 'replace')!r}"
+                )
+        if start:
+            del self._buffer[:start]
+        if len(self._buffer) > self.max_line_bytes:
+            size = len(self._buffer)
+            self._buffer.clear()
+            raise SubscriptionError(
+                "Subscription line exceeds maximum size",
+                {"size": size, "max_line_bytes": self.max_line_bytes},
+            )
+        return values
+
+    def reset(self) -> None:
+        """Discard any buffered partial line (e.g. after a reconnect)."""
+        self._buffer.clear()
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Number of bytes held for the current partial line."""
+        return len(self._buffer)
+
+
+class SubscriptionStats:
+    """Throughput and parse latency counters for a single subscription."""
+
+    def __init__(self, rate_window: float = 1.0):
+        """Initialize the counters."""
+        self.rate_window = rate_window
+        self.events = 0
+        self.suppressed = 0
+        self.keepalives = 0
+        self.malformed = 0
+        self.bytes_received = 0
+        self.reconnects = 0
+        self.events_per_second = 0.0
+        self.parse_time_total = 0.0
+        self.parse_time_max = 0.0
+        self.last_event_at: Optional[float] = None
+        self._window_start = time.monotonic()
+        self._window_events = 0
+
+    def record_chunk(self, nbytes: int, nevents: int, parse_time: float) -> None:
+        """Record a parsed network chunk."""
+        now = time.monotonic()
+        self.bytes_received += nbytes
+        self.events += nevents
+        self._window_events += nevents
+        self.parse_time_total += parse_time
+        if nevents:
+            self.last_event_at = now
+            per_event = parse_time / nevents
+            if per_event > self.parse_time_max:
+                self.parse_time_max = per_event
+        elapsed = now - self._window_start
+        if elapsed >= self.rate_window:
+            self.events_per_second = self._window_events / elapsed
+            self._window_start = now
+            self._window_events = 0
+
+    @property
+    def parse_latency_avg(self) -> float:
+        """Average parse time per event in seconds."""
+        return self.parse_time_total / self.events if self.events else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a plain dictionary."""
+        return {
+            "events": self.events,
+            "suppressed": self.suppressed,
+            "keepalives": self.keepalives,
+            "malformed": self.malformed,
+            "bytes_received": self.bytes_received,
+            "reconnects": self.reconnects,
+            "events_per_second": round(self.events_per_second, 2),
+            "parse_latency_avg_ms": round(self.parse_latency_avg * 1000, 4),
+            "parse_latency_max_ms": round(self.parse_time_max * 1000, 4),
+        }
+
+
+class CanvasSubscription:
+    """
+    Long-running subscription to a canvas widget stream.
+
+    Every widget object received is passed to ``on_event`` together with the
+    canvas ID. After a reconnect the server replays the full canvas state; the
+    subscription keeps a digest of the last delivered payload per widget and
+    suppresses replayed widgets that have not changed, so downstream consumers
+    only see what actually happened while the connection was down.
+
+    Objects removed while the connection was down are simply absent from
+    the replayed state; ``on_snapshot`` receives the IDs in the state sent
+    after each connect, before its events, so consumers can drop the rest.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        canvas_id: str,
+        on_event: EventHandler,
+        max_line_bytes: int = 8 * 1024 * 1024,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        yield_every: int = 256,
+        on_snapshot: Optional[SnapshotHandler] = None,
+    ):
+        """Initialize the subscription."""
+        self.client = client
+        self.canvas_id = canvas_id
+        self.on_event = on_event
+        self.on_snapshot = on_snapshot
+        self.parser = NDJSONParser(max_line_bytes)
+        self.stats = SubscriptionStats()
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.yield_every = yield_every
+        self.connected = False
+        self._digests: Dict[str, bytes] = {}
+        self._stopping = False
+        self._snapshot_pending = False
+
+    @property
+    def path(self) -> str:
+        """API path of the subscribed widget stream."""
+        return f"/api/v1/canvases/{self.canvas_id}/widgets"
+
+    @property
+    def name(self) -> str:
+        """Description of the subscription used in log messages."""
+        return f"canvas {self.canvas_id}"
+
+    async def run(self) -> None:
+        """Consume the stream until cancelled or stopped, reconnecting on failure."""
+        attempt = 0
+        while not self._stopping:
+            try:
+                await self._consume()
+                attempt = 0
+                logger.info(f"Subscription to {self.name} closed by server")
+            except asyncio.CancelledError:
+                raise
+            except (httpx.HTTPError, SubscriptionError) as e:
+                logger.warning(f"Subscription to {self.name} failed: {e}")
+                attempt += 1
+            finally:
+                self.connected = False
+                self.parser.reset()
+            if self._stopping:
+                break
+            self.stats.reconnects += 1
+            await asyncio.sleep(self._backoff_delay(attempt))
+
+    def stop(self) -> None:
+        """Ask the subscription to stop after the current read."""
+        self._stopping = True
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        if attempt <= 0:
+            return self.backoff_initial
+        ceiling = min(self.backoff_max, self.backoff_initial * (2 ** (attempt - 1)))
+        return random.uniform(self.backoff_initial, max(self.backoff_initial, ceiling))
+
+    async def _consume(self) -> None:
+        """Open the stream and dispatch events until it ends."""
+        async with self.client.stream(
+            "GET", self.path, params={"subscribe": "true"}, timeout=None
+        ) as response:
+            if response.status_code != 200:
+                raise SubscriptionError(
+                    f"Subscription request failed with status {response.status_code}",
+                    {"canvas_id": self.canvas_id, "status": response.status_code},
+                )
+            self.connected = True
+            self._snapshot_pending = True
+            logger.info(f"Subscribed to {self.name}")
+            async for chunk in response.aiter_bytes():
+                await self.process_chunk(chunk)
+                if self._stopping:
+                    return
+
+    async def process_chunk(self, chunk: bytes) -> None:
+        """Parse a network chunk and dispatch the widgets it contains."""
+        keepalives = self.parser.keepalives
+        malformed = self.parser.malformed
+        started = time.perf_counter()
+        values = self.parser.feed(chunk)
+        if self._snapshot_pending and values:
+            self._snapshot_pending = False
+            if isinstance(values[0], list):
+                await self._on_snapshot(values[0])
+        widgets = list(self._flatten(values))
+        self.stats.record_chunk(len(chunk), len(widgets), time.perf_counter() - started)
+        if self.parser.keepalives != keepalives:
+            self.stats.keepalives += self.parser.keepalives - keepalives
+            _keepalive_log.debug("Keep-alive on canvas {}", self.canvas_id)
+        self.stats.malformed += self.parser.malformed - malformed
+        for index, widget in enumerate(widgets, 1):
+            if self._is_replay(widget):
+                self.stats.suppressed += 1
+            else:
+                await self.on_event(self.canvas_id, widget)
+            if index % self.yield_every == 0:
+                # Large snapshots must not monopolise the event loop
+                await asyncio.sleep(0)
+
+    async def _on_snapshot(self, state: List[Any]) -> None:
+        """Forget widgets missing from the replayed state and report the IDs present."""
+        ids = {item["id"] for item in state if isinstance(item, dict) and item.get("id")}
+        for widget_id in [w for w in self._digests if w not in ids]:
+            del self._digests[widget_id]
+        if self.on_snapshot is not None:
+            await self.on_snapshot(self.canvas_id, ids)
+
+    @staticmethod
+    def _flatten(values: Iterable[Any]) -> Iterable[Dict[str, Any]]:
+        """Yield widget objects from parsed lines (objects or arrays of objects)."""
+        for value in values:
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict):
+                        yield item
+            elif isinstance(value, dict):
+                yield value
+
+    def _is_replay(self, widget: Dict[str, Any]) -> bool:
+        """Return True if this exact widget payload was already delivered."""
+        widget_id = widget.get("id")
+        if not widget_id:
+            return False
+        if widget.get("state") == "deleted":
+            return self._digests.pop(widget_id, None) is None
+        digest = hashlib.blake2b(
+            json.dumps(widget, sort_keys=True, separators=(",", ":")).encode(),
+            digest_size=16,
+        ).digest()
+        if self._digests.get(widget_id) == digest:
+            return True
+        self._digests[widget_id] = digest
+        return False
+
+
+class CollectionSubscription(CanvasSubscription):
+    """
+    Subscription to a non-canvas collection such as ``/clients``.
+
+    Reuses the canvas stream handling; ``canvas_id`` holds the collection
+    path, which is also what ``on_event`` receives as its first argument.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        collection: str,
+        on_event: EventHandler,
+        **kwargs: Any,
+    ):
+        """Initialize the subscription."""
+        super().__init__(client, collection, on_event, **kwargs)
+
+    @property
+    def path(self) -> str:
+        """API path of the subscribed collection."""
+        return f"/api/v1{self.canvas_id}"
+
+    @property
+    def name(self) -> str:
+        """Description of the subscription used in log messages."""
+        return self.canvas_id
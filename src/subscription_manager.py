@@ -0,0 +1,179 @@
+"""
+Multiplexed canvas subscription management for the Canvus-Local-LLM application.
+
+Rather than running a separate process per canvas, every canvas stream runs as
+a coroutine inside the application's event loop and shares the pooled
+``CanvusClient`` connection. A ceiling on concurrently open streams and a
+bounded per-canvas event queue keep resource usage predictable.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from .canvus_client import CanvusClient
+from .exceptions import ResourceError
+from .metrics import REGISTRY
+from .subscription import CanvasSubscription, SnapshotHandler
+
+WidgetHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+QueuedWidget = Tuple[float, Dict[str, Any]]
+
+EVENT_LAG = REGISTRY.histogram(
+    "canvus_llm_subscription_lag_seconds",
+    "Time a widget event waits in its canvas queue before it is handled",
+)
+
+
+class _CanvasStream:
+    """Tasks and queue belonging to one subscribed canvas."""
+
+    __slots__ = ("subscription", "queue", "reader", "consumer")
+
+    def __init__(self, subscription: CanvasSubscription, queue_size: int):
+        self.subscription = subscription
+        self.queue: "asyncio.Queue[QueuedWidget]" = asyncio.Queue(queue_size)
+        self.reader: Optional[asyncio.Task] = None
+        self.consumer: Optional[asyncio.Task] = None
+
+
+class SubscriptionManager:
+    """
+    Run all canvas subscriptions in a single event loop.
+
+    Each canvas gets a reader task that parses its stream and a consumer task
+    that hands widgets to ``handler``. The reader pushes into a bounded queue,
+    so a slow consumer stalls only its own canvas' socket (TCP backpressure)
+    instead of buffering without limit. At most ``max_streams`` streams are
+    connected at once; further canvases wait for a free slot.
+
+    ``snapshot_handler`` receives the widget IDs of the full state replayed
+    after each (re)connect, once the events queued before it were handled,
+    so widgets deleted while disconnected can be forgotten.
+    """
+
+    def __init__(
+        self,
+        client: CanvusClient,
+        handler: WidgetHandler,
+        max_streams: int = 500,
+        queue_size: int = 1000,
+        snapshot_handler: Optional[SnapshotHandler] = None,
+    ):
+        """Initialize the manager."""
+        self.client = client
+        self.handler = handler
+        self.snapshot_handler = snapshot_handler
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self.subscriptions: Dict[str, _CanvasStream] = {}
+        self._slots = asyncio.Semaphore(max_streams)
+
+    def __contains__(self, canvas_id: str) -> bool:
+        return canvas_id in self.subscriptions
+
+    def __len__(self) -> int:
+        return len(self.subscriptions)
+
+    def subscribe(self, canvas_id: str) -> None:
+        """Start streaming a canvas; no-op if it is already subscribed."""
+        if canvas_id in self.subscriptions:
+            return
+        if len(self.subscriptions) >= self.max_streams * 4:
+            raise ResourceError(
+                "Too many pending canvas subscriptions",
+                {"canvas_id": canvas_id, "max_streams": self.max_streams},
+            )
+        stream = _CanvasStream(
+            CanvasSubscription(
+                self.client.http,
+                canvas_id,
+                self._enqueue,
+                on_snapshot=self._on_snapshot if self.snapshot_handler else None,
+            ),
+            self.queue_size,
+        )
+        stream.consumer = asyncio.create_task(
+            self._consume(canvas_id, stream.queue), name=f"canvas-consume-{canvas_id}"
+        )
+        stream.reader = asyncio.create_task(
+            self._read(stream.subscription), name=f"canvas-read-{canvas_id}"
+        )
+        self.subscriptions[canvas_id] = stream
+        logger.debug(f"Scheduled subscription for canvas {canvas_id}")
+
+    async def unsubscribe(self, canvas_id: str) -> None:
+        """Stop streaming a canvas and wait for its tasks to finish."""
+        stream = self.subscriptions.pop(canvas_id, None)
+        if stream is None:
+            return
+        stream.subscription.stop()
+        tasks = [t for t in (stream.reader, stream.consumer) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Unsubscribed from canvas {canvas_id}")
+
+    async def close(self) -> None:
+        """Stop every subscription."""
+        await asyncio.gather(
+            *(self.unsubscribe(canvas_id) for canvas_id in list(self.subscriptions))
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return aggregate and per-canvas stream statistics."""
+        canvases = {
+            canvas_id: dict(
+                stream.subscription.stats.as_dict(),
+                connected=stream.subscription.connected,
+                queue_depth=stream.queue.qsize(),
+            )
+            for canvas_id, stream in self.subscriptions.items()
+        }
+        return {
+            "subscribed": len(canvases),
+            "connected": sum(1 for c in canvases.values() if c["connected"]),
+            "events_per_second": sum(c["events_per_second"] for c in canvases.values()),
+            "canvases": canvases,
+        }
+
+    async def _read(self, subscription: CanvasSubscription) -> None:
+        """Hold a stream slot for the lifetime of a subscription."""
+        async with self._slots:
+            await subscription.run()
+
+    async def _enqueue(self, canvas_id: str, widget: Dict[str, Any]) -> None:
+        """Queue a widget for its canvas, blocking the reader when full."""
+        stream = self.subscriptions.get(canvas_id)
+        if stream is not None:
+            await stream.queue.put((time.monotonic(), widget))
+
+    async def _on_snapshot(self, canvas_id: str, widget_ids: Set[str]) -> None:
+        """Pass a replayed state to the snapshot handler after the events before it."""
+        stream = self.subscriptions.get(canvas_id)
+        if stream is None or self.snapshot_handler is None:
+            return
+        await stream.queue.join()
+        try:
+            await self.snapshot_handler(canvas_id, widget_ids)
+        except Exception as e:
+            logger.error(f"Snapshot handler failed for canvas {canvas_id}: {e}")
+
+    async def _consume(
+        self, canvas_id: str, queue: "asyncio.Queue[QueuedWidget]"
+    ) -> None:
+        """Deliver queued widgets to the handler."""
+        while True:
+            enqueued_at, widget = await queue.get()
+            EVENT_LAG.observe(time.monotonic() - enqueued_at)
+            try:
+                await self.handler(canvas_id, widget)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Widget handler failed for canvas {canvas_id}: {e}")
+            finally:
+                queue.task_done()
+
@@ -1,24 +1,27 @@
 """
 System tray interface for Canvus-Local-LLM.
 
-This module handles the Windows system tray icon and menu.
+This module handles the Windows system tray icon and menu. ``infi.systray``
+is imported when the tray starts, so importing this module stays cheap and
+works on systems without it.
 """
 
-from infi.systray import SysTrayIcon
-from typing import Callable, Optional
-import webbrowser
+from typing import TYPE_CHECKING, Callable, Optional
 import os
-from PIL import Image
+
+if TYPE_CHECKING:
+    from infi.systray import SysTrayIcon
 
 class CanvusTray:
     """Manages the system tray icon and menu."""
     
-    def __init__(self, on_restart: Callable, on_settings_change: Callable[[str, str], None], get_status: Optional[Callable[[], str]] = None):
-        """Initialize the tray icon."""
+    def __init__(self, on_restart: Callable, on_settings_change: Callable[[str, str], None], get_status: Optional[Callable[[], str]] = None, on_exit: Optional[Callable[[], None]] = None):
+        """Initialize the tray icon; ``on_exit`` requests a graceful shutdown."""
         self.on_restart = on_restart
+        self.on_exit = on_exit
         self.on_settings_change = on_settings_change
         self.get_status = get_status or (lambda: "Idle")
-        self.tray_icon: Optional[SysTrayIcon] = None
+        self.tray_icon: Optional["SysTrayIcon"] = None
         self.icon_state = "default"  # can be 'default', 'connected', 'processing', 'error'
         self.icon_paths = {
             "default": "assets/icon.ico",
@@ -30,6 +33,8 @@ class CanvusTray:
     
     def start_tray(self) -> None:
         """Start the system tray icon with hierarchical menu."""
+        from infi.systray import SysTrayIcon
+
         settings_menu = (
             ("Set Server Address", None, lambda s: self._handle_setting('server', 'Enter server URL:')),
             ("Set API Key", None, lambda s: self._handle_setting('api_key', 'Enter API Key:')),
@@ -64,7 +69,13 @@ class CanvusTray:
         if self.tray_icon:
             self.tray_icon.hover_text = text
     
-    def _handle_restart(self, systray: SysTrayIcon) -> None:
+    def shutdown(self) -> None:
+        """Remove the tray icon."""
+        if self.tray_icon:
+            self.tray_icon.shutdown()
+            self.tray_icon = None
+
+    def _handle_restart(self, systray: "SysTrayIcon") -> None:
         """Handle restart menu item."""
         self.on_restart()
     
@@ -73,13 +84,16 @@ class CanvusTray:
         value = input(prompt)
         self.on_settings_change(key, value)
     
-    def _show_status(self, systray: SysTrayIcon) -> None:
+    def _show_status(self, systray: "SysTrayIcon") -> None:
         """Show current status in a console dialog (for now)."""
         status = self.get_status()
         print(f"Current Status: {status}")
     
-    def _handle_exit(self, systray: SysTrayIcon) -> None:
+    def _handle_exit(self, systray: "SysTrayIcon") -> None:
         """Handle exit menu item."""
+        if self.on_exit is not None:
+            self.on_exit()
+            return
         if self.tray_icon:
             self.tray_icon.shutdown()
         os._exit(0) 
\ No newline at end of file
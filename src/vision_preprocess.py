@@ -0,0 +1,485 @@
+"""
+Vision preprocessing for the Canvus-Local-LLM application.
+
+This module prepares OCR inputs and canvas snapshots for Ollama vision
+models. The stages are decode, deskew, contrast normalisation, tiling of
+very large images into model-sized crops, and JPEG/base64 encoding. They
+run in a pool of worker processes, so decoding and resizing a 4K snapshot
+never stalls the event loop (or, through the GIL, the threads serving the
+canvas subscriptions).
+
+Pixels cross the process boundary through ``multiprocessing.shared_memory``
+blocks rather than pickled buffers. The parent copies the encoded bytes (or
+a decoded array from ``ImageFetcher``) into a block, the worker returns the
+base64 encoded images in a second block, and the parent unlinks both; a
+result finished after its caller was cancelled is unlinked when it arrives.
+A pool broken by a crashed worker is replaced on the next image. Each
+stage is timed, and the timings are returned with the images and recorded
+in the ``canvus_llm_vision_stage_seconds`` histogram.
+"""
+
+import asyncio
+import base64
+import math
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from .config import Config
+from .exceptions import FileError, ProcessingError
+from .metrics import REGISTRY, TRACER
+from .processing_queue import TimingStats
+
+STAGES = ("share", "decode", "deskew", "normalize", "tile", "encode", "collect")
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "canvus_llm_vision_stage_seconds",
+    "Time spent in each vision preprocessing stage",
+    ("stage",),
+)
+
+# Images up to this multiple of the model input are resized, not tiled
+TILE_THRESHOLD = 1.5
+# Skew beyond this many degrees is treated as intentional and left alone
+MAX_SKEW = 15.0
+MIN_SKEW = 0.3
+
+# (block name, byte length, array shape or None for encoded bytes, dtype)
+SourceSpec = Tuple[str, int, Optional[Tuple[int, ...]], str]
+
+
+class PreprocessedImage:
+    """Base64 encoded model inputs produced from one image."""
+
+    __slots__ = ("images", "size", "angle", "tiles", "timings")
+
+    def __init__(
+        self,
+        images: List[str],
+        size: Tuple[int, int],
+        angle: float,
+        tiles: int,
+        timings: Dict[str, float],
+    ):
+        """Initialize the result."""
+        self.images = images
+        self.size = size
+        self.angle = angle
+        self.tiles = tiles
+        self.timings = timings
+
+    def __repr__(self) -> str:
+        return (
+            f"PreprocessedImage({self.size[0]}x{self.size[1]}, images={len(self.images)}, "
+            f"tiles={self.tiles}, angle={self.angle:.1f})"
+        )
+
+
+def estimate_skew(image: "numpy.ndarray") -> float:  # noqa: F821
+    """
+    Return the skew of text lines in a BGR image in degrees.
+
+    Dark strokes on a downscaled copy are smeared horizontally into line
+    blobs, a line is fitted to each elongated blob and the median of their
+    angles is returned; 0.0 if there are none.
+    """
+    import cv2
+    import numpy
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = min(1.0, 1000 / max(gray.shape))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, gray.shape[1] // 60), 3))
+    blobs = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    angles = []
+    for contour in contours:
+        x, y, width, height = cv2.boundingRect(contour)
+        if width < gray.shape[1] // 10 or width < 4 * height:
+            continue
+        vx, vy = cv2.fitLine(contour, cv2.DIST_L2, 0, 0.01, 0.01).reshape(-1)[:2]
+        angle = math.degrees(math.atan2(vy, vx))
+        if angle > 90:
+            angle -= 180
+        elif angle <= -90:
+            angle += 180
+        if abs(angle) <= MAX_SKEW:
+            angles.append(angle)
+    if not angles:
+        return 0.0
+    return float(numpy.median(angles))
+
+
+def deskew(image: "numpy.ndarray") -> Tuple["numpy.ndarray", float]:  # noqa: F821
+    """Rotate a BGR image so its text lines are horizontal; return it and the angle."""
+    import cv2
+
+    angle = estimate_skew(image)
+    if abs(angle) < MIN_SKEW:
+        return image, 0.0
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    rotated = cv2.warpAffine(
+        image, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+    return rotated, angle
+
+
+def normalize_contrast(image: "numpy.ndarray") -> "numpy.ndarray":  # noqa: F821
+    """Equalise local contrast of a BGR image on its luma channel (CLAHE)."""
+    import cv2
+
+    luma, cr, cb = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb))
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return cv2.cvtColor(cv2.merge((clahe.apply(luma), cr, cb)), cv2.COLOR_YCrCb2BGR)
+
+
+def fit(image: "numpy.ndarray", target: int) -> "numpy.ndarray":  # noqa: F821
+    """Shrink an image so its long side is at most ``target``."""
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = target / max(height, width)
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _offsets(length: int, target: int, overlap: int) -> List[int]:
+    """Return tile start offsets covering ``length`` with at least ``overlap`` pixels shared."""
+    if length <= target:
+        return [0]
+    count = math.ceil((length - overlap) / (target - overlap))
+    step = (length - target) / (count - 1)
+    return [round(i * step) for i in range(count)]
+
+
+def tile(
+    image: "numpy.ndarray", target: int, max_tiles: int = 16, overlap: int = 64  # noqa: F821
+) -> List["numpy.ndarray"]:  # noqa: F821
+    """
+    Split an image into crops of at most ``target`` pixels per side.
+
+    Images up to ``TILE_THRESHOLD`` times the target are only resized.
+    Larger ones are first shrunk until at most ``max_tiles`` crops cover
+    them, and an overview of the whole image comes before the crops.
+    """
+    height, width = image.shape[:2]
+    if max(height, width) <= target * TILE_THRESHOLD or max_tiles <= 1:
+        return [fit(image, target)]
+    overlap = min(overlap, target // 4)
+    while True:
+        rows = _offsets(height, target, overlap)
+        cols = _offsets(width, target, overlap)
+        if len(rows) * len(cols) <= max_tiles:
+            break
+        shrink = math.sqrt(max_tiles / (len(rows) * len(cols)))
+        image = fit(image, int(max(height, width) * min(shrink, 0.95)))
+        height, width = image.shape[:2]
+    if len(rows) * len(cols) == 1:
+        return [image]
+    crops = [fit(image, target)]
+    for y in rows:
+        for x in cols:
+            crops.append(image[y:y + target, x:x + target])
+    return crops
+
+
+def encode_jpeg(image: "numpy.ndarray", quality: int = 90) -> bytes:  # noqa: F821
+    """Encode a BGR image as base64 JPEG bytes."""
+    import cv2
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise FileError("Unable to encode image")
+    return base64.b64encode(encoded.tobytes())
+
+
+def run_stages(
+    source: Union[bytes, "numpy.ndarray"],  # noqa: F821
+    target: int,
+    max_tiles: int = 16,
+    deskew_text: bool = False,
+    normalize: bool = False,
+    quality: int = 90,
+) -> Tuple[List[bytes], Tuple[int, int], float, Dict[str, float]]:
+    """
+    Run every stage in the calling thread.
+
+    ``source`` is encoded image bytes or an RGB array. Returns the base64
+    images, the decoded size, the deskew angle and the stage timings.
+    """
+    import cv2
+    import numpy
+
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    if isinstance(source, numpy.ndarray):
+        image = cv2.cvtColor(source, cv2.COLOR_RGB2BGR)
+    else:
+        image = cv2.imdecode(numpy.frombuffer(source, numpy.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise FileError("Unable to decode image")
+    size = (image.shape[1], image.shape[0])
+    timings["decode"], started = _lap(started)
+
+    angle = 0.0
+    if deskew_text:
+        image, angle = deskew(image)
+        timings["deskew"], started = _lap(started)
+    if normalize:
+        image = normalize_contrast(image)
+        timings["normalize"], started = _lap(started)
+
+    crops = tile(image, target, max_tiles)
+    timings["tile"], started = _lap(started)
+    encoded = [encode_jpeg(crop, quality) for crop in crops]
+    timings["encode"], started = _lap(started)
+    return encoded, size, angle, timings
+
+
+def _lap(started: float) -> Tuple[float, float]:
+    """Return the time since ``started`` and the current time."""
+    now = time.perf_counter()
+    return now - started, now
+
+
+def _share(source: Union[bytes, "numpy.ndarray"]) -> Tuple[SharedMemory, SourceSpec]:  # noqa: F821
+    """Copy encoded bytes or an array into a new shared memory block."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = memoryview(source).cast("B")
+        shape, dtype = None, "uint8"
+    else:
+        import numpy
+
+        data = memoryview(numpy.ascontiguousarray(source).reshape(-1).view("uint8"))
+        shape, dtype = source.shape, str(source.dtype)
+    block = SharedMemory(create=True, size=max(1, data.nbytes))
+    block.buf[:data.nbytes] = data
+    return block, (block.name, data.nbytes, shape, dtype)
+
+
+def _worker(
+    spec: SourceSpec, options: Dict[str, Any]
+) -> Tuple[str, List[int], Tuple[int, int], float, Dict[str, float]]:
+    """Process a shared source in a pool worker; results go into a new block."""
+    import numpy
+
+    name, length, shape, dtype = spec
+    block = SharedMemory(name=name)
+    try:
+        # Copy out, so the parent can release the block while this worker runs
+        if shape is None:
+            source: Any = bytes(block.buf[:length])
+        else:
+            source = numpy.array(numpy.ndarray(shape, dtype=dtype, buffer=block.buf))
+    finally:
+        block.close()
+    encoded, size, angle, timings = run_stages(source, **options)
+    lengths = [len(item) for item in encoded]
+    out = SharedMemory(create=True, size=max(1, sum(lengths)))
+    offset = 0
+    for item in encoded:
+        out.buf[offset:offset + len(item)] = item
+        offset += len(item)
+    name = out.name
+    out.close()
+    return name, lengths, size, angle, timings
+
+
+def _ready() -> None:
+    """Import the image libraries in a pool worker."""
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+
+
+def _collect(name: str, lengths: List[int]) -> List[str]:
+    """Read the base64 images from a result block and unlink it."""
+    block = SharedMemory(name=name)
+    try:
+        images = []
+        offset = 0
+        for length in lengths:
+            images.append(bytes(block.buf[offset:offset + length]).decode("ascii"))
+            offset += length
+        return images
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _release(block: SharedMemory) -> None:
+    """Close and unlink a shared memory block."""
+    block.close()
+    block.unlink()
+
+
+def _discard_result(future: Future) -> None:
+    """Unlink the result block of a worker whose caller has gone away."""
+    if not future.cancelled() and future.exception() is None:
+        _release(SharedMemory(name=future.result()[0]))
+
+
+class VisionPreprocessor:
+    """
+    Process-pool preprocessing of images for vision models.
+
+    Worker processes are started by ``start()`` or on first use. Copies
+    into and out of shared memory run in the default executor, so no stage
+    runs on the event loop.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        target: int = 896,
+        max_tiles: int = 16,
+        quality: int = 90,
+    ):
+        """Initialize the preprocessor."""
+        self.workers = workers
+        self.target = target
+        self.max_tiles = max_tiles
+        self.quality = quality
+        self.processed = 0
+        self.failed = 0
+        self.stage_times: Dict[str, TimingStats] = {stage: TimingStats() for stage in STAGES}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> "VisionPreprocessor":
+        """Create a preprocessor using the application configuration."""
+        return cls(
+            workers=config.vision_workers,
+            target=config.vision_input_size,
+            max_tiles=config.vision_max_tiles,
+        )
+
+    async def start(self) -> None:
+        """Start the worker processes and load the image libraries in them."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ready) for _ in range(self.workers)))
+
+    async def preprocess(
+        self,
+        source: Union[bytes, "numpy.ndarray"],  # noqa: F821
+        deskew_text: bool = False,
+        normalize: bool = False,
+    ) -> PreprocessedImage:
+        """
+        Turn encoded image bytes or an RGB array into base64 model inputs.
+
+        ``deskew_text`` and ``normalize`` enable the deskew and contrast
+        stages, which help OCR but not photos or canvas snapshots.
+        """
+        loop = asyncio.get_running_loop()
+        options = {
+            "target": self.target,
+            "max_tiles": self.max_tiles,
+            "deskew_text": deskew_text,
+            "normalize": normalize,
+            "quality": self.quality,
+        }
+        with TRACER.span("preprocess"):
+            started = time.perf_counter()
+            block, spec = await loop.run_in_executor(None, _share, source)
+            timings = {"share": time.perf_counter() - started}
+            try:
+                name, lengths, size, angle, worker_timings = await self._run_worker(spec, options)
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                # Inline, so a cancellation cannot land between the worker and the unlink
+                _release(block)
+            timings.update(worker_timings)
+            started = time.perf_counter()
+            images = await loop.run_in_executor(None, _collect, name, lengths)
+            timings["collect"] = time.perf_counter() - started
+
+        self.processed += 1
+        for stage, seconds in timings.items():
+            self.stage_times[stage].record(seconds)
+            STAGE_SECONDS.observe(seconds, stage=stage)
+        result = PreprocessedImage(images, size, angle, max(0, len(images) - 1), timings)
+        logger.debug(
+            f"Preprocessed {result!r}: "
+            + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items())
+        )
+        return result
+
+    async def _run_worker(
+        self, spec: SourceSpec, options: Dict[str, Any]
+    ) -> Tuple[str, List[int], Tuple[int, int], float, Dict[str, float]]:
+        """Run ``_worker`` in the pool, retrying once on a new pool if it broke."""
+        try:
+            return await self._submit(spec, options)
+        except BrokenProcessPool:
+            logger.warning("Vision worker process died; retrying on a new pool")
+        try:
+            return await self._submit(spec, options)
+        except BrokenProcessPool as e:
+            raise ProcessingError(f"Vision worker process died: {e}") from e
+
+    async def _submit(
+        self, spec: SourceSpec, options: Dict[str, Any]
+    ) -> Tuple[str, List[int], Tuple[int, int], float, Dict[str, float]]:
+        """
+        Run ``_worker`` once and return its result.
+
+        A broken pool is discarded, so the next call starts a new one. If the
+        caller is cancelled while the worker runs, the result block is
+        unlinked when the worker finishes.
+        """
+        pool = self._executor()
+        try:
+            future = pool.submit(_worker, spec, options)
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(_discard_result)
+                raise
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and per-stage timings."""
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "stages": {
+                stage: stats.as_dict()
+                for stage, stats in self.stage_times.items()
+                if stats.count
+            },
+        }
+
+    async def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        """Forget a broken pool, so the next image starts a new one."""
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        """Return the process pool, starting it on first use."""
+        if self._pool is None:
+            # Spawn, as on Windows: forking a process with running threads is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        return self._pool
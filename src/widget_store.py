@@ -0,0 +1,248 @@
+"""
+Widget state cache for the Canvus-Local-LLM application.
+
+This module keeps the last known state of every widget on a canvas and diffs
+incoming subscription updates against it. Only changes to the fields that can
+trigger processing (Title, Text and ParentID) produce change events; position,
+size and scale updates emitted while a widget is dragged are absorbed in place.
+"""
+
+import sys
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, Optional
+
+# Fields whose changes are semantically relevant to the processing workflows
+TRIGGER_FIELDS = ("title", "text", "parent_id")
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class WidgetRecord:
+    """Compact cached state of a single widget."""
+
+    __slots__ = (
+        "id",
+        "widget_type",
+        "title",
+        "text",
+        "parent_id",
+        "x",
+        "y",
+        "width",
+        "height",
+        "scale",
+        "depth",
+        "background_color",
+        "hash",
+        "moved_at",
+    )
+
+    def __init__(self, widget_id: str, widget_type: str = ""):
+        """Initialize an empty record."""
+        self.id = widget_id
+        self.widget_type = widget_type
+        self.title = ""
+        self.text = ""
+        self.parent_id: Optional[str] = None
+        self.x = 0.0
+        self.y = 0.0
+        self.width = 0.0
+        self.height = 0.0
+        self.scale = 1.0
+        self.depth = 0.0
+        self.background_color: Optional[str] = None
+        self.hash: Optional[str] = None
+        self.moved_at = 0.0
+
+    def update_geometry(self, data: Dict[str, Any]) -> bool:
+        """Apply location/size/scale fields; return True if the widget moved."""
+        moved = False
+        location = data.get("location")
+        if location is not None:
+            x, y = location.get("x", self.x), location.get("y", self.y)
+            if x != self.x or y != self.y:
+                self.x, self.y = x, y
+                moved = True
+        size = data.get("size")
+        if size is not None:
+            self.width = size.get("width", self.width)
+            self.height = size.get("height", self.height)
+        if "scale" in data:
+            self.scale = data["scale"]
+        if "depth" in data:
+            self.depth = data["depth"]
+        return moved
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the record in Canvus API shape."""
+        return {
+            "id": self.id,
+            "widget_type": self.widget_type,
+            "title": self.title,
+            "text": self.text,
+            "parent_id": self.parent_id,
+            "location": {"x": self.x, "y": self.y},
+            "size": {"width": self.width, "height": self.height},
+            "scale": self.scale,
+            "depth": self.depth,
+            "background_color": self.background_color,
+            "hash": self.hash,
+        }
+
+
+class ChangeEvent:
+    """A semantically relevant change to a widget."""
+
+    __slots__ = ("canvas_id", "kind", "fields", "record", "previous")
+
+    def __init__(
+        self,
+        canvas_id: str,
+        kind: str,
+        record: WidgetRecord,
+        fields: FrozenSet[str] = frozenset(),
+        previous: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize the event."""
+        self.canvas_id = canvas_id
+        self.kind = kind
+        self.record = record
+        self.fields = fields
+        self.previous = previous or {}
+
+    def __repr__(self) -> str:
+        return (
+            f"ChangeEvent({self.kind} {self.record.widget_type} {self.record.id} "
+            f"fields={sorted(self.fields)})"
+        )
+
+
+class WidgetStore:
+    """
+    In-memory widget cache for one canvas.
+
+    ``apply()`` is called for every widget object received from the canvas
+    subscription and returns a ``ChangeEvent`` only when the widget was
+    created, deleted, or had one of ``TRIGGER_FIELDS`` change. A widget whose
+    location changed within ``drag_window`` seconds is reported as moving so
+    callers can hold off processing until it settles.
+    """
+
+    def __init__(self, canvas_id: str, drag_window: float = 1.0):
+        """Initialize the store."""
+        self.canvas_id = canvas_id
+        self.drag_window = drag_window
+        self.widgets: Dict[str, WidgetRecord] = {}
+        self.updates = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.widgets)
+
+    def __iter__(self) -> Iterator[WidgetRecord]:
+        return iter(self.widgets.values())
+
+    def get(self, widget_id: str) -> Optional[WidgetRecord]:
+        """Return the cached record for a widget."""
+        return self.widgets.get(widget_id)
+
+    def is_moving(self, widget_id: str, now: Optional[float] = None) -> bool:
+        """Return True if the widget was moved within the drag window."""
+        record = self.widgets.get(widget_id)
+        if record is None or not record.moved_at:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - record.moved_at < self.drag_window
+
+    def apply(self, data: Dict[str, Any]) -> Optional[ChangeEvent]:
+        """Merge a widget update and return a change event if it is relevant."""
+        widget_id = data.get("id")
+        if not widget_id:
+            return None
+        self.updates += 1
+        record = self.widgets.get(widget_id)
+
+        if data.get("state") == "deleted":
+            if record is None:
+                return None
+            del self.widgets[widget_id]
+            return ChangeEvent(self.canvas_id, DELETED, record)
+
+        if record is None:
+            record = WidgetRecord(widget_id, data.get("widget_type", ""))
+            self._assign(record, data)
+            record.update_geometry(data)
+            self.widgets[widget_id] = record
+            return ChangeEvent(self.canvas_id, CREATED, record)
+
+        previous = {}
+        for field in TRIGGER_FIELDS:
+            if field in data:
+                value = data[field]
+                if field != "parent_id" and value is None:
+                    value = ""
+                if value != getattr(record, field):
+                    previous[field] = getattr(record, field)
+        if record.update_geometry(data):
+            record.moved_at = time.monotonic()
+        if "background_color" in data:
+            record.background_color = data["background_color"]
+        if "hash" in data:
+            record.hash = data["hash"]
+
+        if not previous:
+            self.dropped += 1
+            return None
+        self._assign(record, data)
+        return ChangeEvent(self.canvas_id, UPDATED, record, frozenset(previous), previous)
+
+    def remove(self, widget_id: str) -> None:
+        """Forget a widget."""
+        self.widgets.pop(widget_id, None)
+
+    def retain(self, widget_ids: Iterable[str]) -> int:
+        """Forget every widget not in ``widget_ids``; return how many were dropped."""
+        keep = set(widget_ids)
+        stale = [widget_id for widget_id in self.widgets if widget_id not in keep]
+        for widget_id in stale:
+            del self.widgets[widget_id]
+        return len(stale)
+
+    def clear(self) -> None:
+        """Forget every widget."""
+        self.widgets.clear()
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Return approximate memory usage of the cached records."""
+        total = sys.getsizeof(self.widgets)
+        for record in self.widgets.values():
+            total += sys.getsizeof(record)
+            for value in (record.id, record.title, record.text, record.parent_id, record.hash):
+                if value:
+                    total += sys.getsizeof(value)
+        count = len(self.widgets)
+        return {
+            "widgets": count,
+            "bytes_total": total,
+            "bytes_per_widget": total / count if count else 0.0,
+            "updates": self.updates,
+            "dropped": self.dropped,
+        }
+
+    @staticmethod
+    def _assign(record: WidgetRecord, data: Dict[str, Any]) -> None:
+        """Copy trigger and identity fields from an update into the record."""
+        if "title" in data:
+            record.title = data["title"] or ""
+        if "text" in data:
+            record.text = data["text"] or ""
+        if "parent_id" in data:
+            record.parent_id = data["parent_id"]
+        if "background_color" in data:
+            record.background_color = data["background_color"]
+        if "hash" in data:
+            record.hash = data["hash"]
+        if data.get("widget_type"):
+            record.widget_type = data["widget_type"]
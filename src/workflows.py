@@ -0,0 +1,455 @@
+"""
+Trigger workflows for the Canvus-Local-LLM application.
+
+This module recognises the widgets that ask for AI processing and runs the
+matching workflow (PRD section 3.3):
+
+- text: a note whose text is wrapped in ``{{ }}`` is answered in a new,
+  translucent note next to it, streamed as it is generated or batched with
+  other short prompts when batching is enabled;
+- pdf: an ``AI_Icon_PDF_Precis`` image on a PDF starts a map-reduce summary
+  of the document;
+- canvas: an ``AI_Icon_Canvus_Precis`` image on the background summarises
+  the canvas area by area;
+- snapshot: an image titled ``Snapshot at ...`` is preprocessed, read by the
+  vision model and replaced by a note holding its text.
+
+Accepted triggers are journalled and queued on the processing scheduler.
+Every LLM result is cached by model, prompt, generation options and (for
+PDFs and snapshots) asset hash, so a repeated prompt or the same document
+is answered without calling Ollama; text answers expire after
+``text_cache_hours``. Workflows record the stages they complete (the output
+note, chunk summaries, the extracted text) in their checkpoint, so an
+interrupted job resumes from the last completed stage.
+"""
+
+import asyncio
+import io
+import json
+import math
+import re
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Union
+
+from loguru import logger
+
+from .batching import PromptBatcher
+from .canvas_model import CanvasModel, summarize_canvas
+from .canvus_client import CanvusClient
+from .config import Config
+from .exceptions import CanvusAPIError, ProcessingError, ResourceError
+from .image_fetch import ImageFetcher
+from .job_journal import JobCheckpoint, JobJournal
+from .metrics import TRACER
+from .ollama_client import OllamaClient
+from .ollama_pool import OllamaPool
+from .pdf_pipeline import PdfSummarizer, estimate_tokens
+from .processing_queue import JobPriority, ProcessingScheduler
+from .resilience import deadline
+from .response_cache import ResponseCache, cache_key
+from .streaming import StreamingSink, note_writer
+from .vision_preprocess import VisionPreprocessor
+from .widget_store import WidgetRecord, WidgetStore
+from .write_back import WriteBack
+
+Widget = Dict[str, Any]
+WorkflowFunc = Callable[[str, Widget, JobCheckpoint], Awaitable[str]]
+
+# Workflow kinds, as journalled
+TEXT = "text"
+PDF = "pdf"
+CANVAS = "canvas"
+SNAPSHOT = "snapshot"
+
+PRIORITIES = {
+    TEXT: JobPriority.TEXT,
+    SNAPSHOT: JobPriority.IMAGE,
+    PDF: JobPriority.DOCUMENT,
+    CANVAS: JobPriority.DOCUMENT,
+}
+
+TRIGGER = re.compile(r"^\s*\{\{(.+?)\}\}\s*$", re.DOTALL)
+PDF_ICON_TITLE = "AI_Icon_PDF_Precis"
+CANVAS_ICON_TITLE = "AI_Icon_Canvus_Precis"
+SNAPSHOT_PREFIX = "Snapshot at"
+
+TEXT_SYSTEM_PROMPT = (
+    "You are an assistant answering questions written on sticky notes in a "
+    "collaborative workspace. Answer clearly and concisely in plain text."
+)
+OCR_PROMPT = (
+    "Extract all of the text in this image in reading order. Respond with "
+    "the text only."
+)
+# Ollama options for text answers (server defaults when empty); part of their cache key
+TEXT_OPTIONS: Dict[str, Any] = {}
+
+# Response cache template versions; bump one when its prompts change
+TEXT_TEMPLATE = "text/1"
+SUMMARY_TEMPLATE = "summary/1"
+PDF_TEMPLATE = "pdf/1"
+OCR_TEMPLATE = "ocr/1"
+
+# Title of a trigger note while its workflow runs
+PROCESSING_TITLE = "AI: processing..."
+PLACEHOLDER = "Processing..."
+# Response notes are 66% opaque
+RESPONSE_ALPHA = 0.66
+# Characters that fit a response note at its original size
+CHARS_PER_NOTE = 300
+OUTPUT_SIZE = {"width": 600.0, "height": 400.0}
+MARGIN = 20.0
+
+
+def detect_trigger(record: WidgetRecord, store: WidgetStore) -> Optional[str]:
+    """Return the workflow a widget triggers, or None if it is not a trigger."""
+    if record.widget_type == "Note":
+        return TEXT if TRIGGER.match(record.text) else None
+    if record.widget_type != "Image":
+        return None
+    if record.title.startswith(SNAPSHOT_PREFIX):
+        return SNAPSHOT
+    if not record.parent_id:
+        return None
+    # The parent may not have been received yet; the workflow then finds out
+    parent = store.get(record.parent_id)
+    parent_type = parent.widget_type if parent is not None else None
+    if record.title == PDF_ICON_TITLE and parent_type in (None, "Pdf"):
+        return PDF
+    if record.title == CANVAS_ICON_TITLE and parent_type in (None, "CanvasBackground"):
+        return CANVAS
+    return None
+
+
+def translucent(color: Optional[str], alpha: float = RESPONSE_ALPHA) -> Optional[str]:
+    """Return a ``#rrggbb[aa]`` colour with its alpha channel replaced."""
+    if not color or not re.fullmatch(r"#[0-9a-fA-F]{6}([0-9a-fA-F]{2})?", color):
+        return None
+    return f"{color[:7]}{round(alpha * 255):02x}"
+
+
+def response_size(text: str, size: Dict[str, float]) -> Dict[str, float]:
+    """Grow a note's size with the length of its text, keeping the aspect ratio."""
+    width = size.get("width") or OUTPUT_SIZE["width"]
+    height = size.get("height") or OUTPUT_SIZE["height"]
+    factor = max(1.0, math.sqrt(len(text) / CHARS_PER_NOTE))
+    return {"width": round(width * factor, 1), "height": round(height * factor, 1)}
+
+
+def _beside(widget: Widget) -> Dict[str, float]:
+    """Return the location just right of a widget, in its parent's coordinates."""
+    location = widget.get("location") or {}
+    width = (widget.get("size") or {}).get("width", 0.0) * (widget.get("scale") or 1.0)
+    return {"x": location.get("x", 0.0) + width + MARGIN, "y": location.get("y", 0.0)}
+
+
+class WorkflowRunner:
+    """
+    Dispatches triggers to their workflows on the processing scheduler.
+
+    ``dispatch()`` journals an accepted trigger and queues its workflow;
+    the journal entry is completed or failed when the workflow ends, and
+    left open if the job is cancelled so it can be resumed.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        client: CanvusClient,
+        llm: Union[OllamaClient, OllamaPool],
+        scheduler: ProcessingScheduler,
+        journal: JobJournal,
+        cache: ResponseCache,
+        write_back: WriteBack,
+        image_fetcher: ImageFetcher,
+        vision: VisionPreprocessor,
+        batcher: Optional[PromptBatcher] = None,
+    ):
+        """Initialize the runner."""
+        self.config = config
+        self.client = client
+        self.llm = llm
+        self.scheduler = scheduler
+        self.journal = journal
+        self.cache = cache
+        self.write_back = write_back
+        self.image_fetcher = image_fetcher
+        self.vision = vision
+        self.batcher = batcher
+        self.running: Set[str] = set()
+        self.workflows: Dict[str, WorkflowFunc] = {
+            TEXT: self._text,
+            PDF: self._pdf,
+            CANVAS: self._canvas,
+            SNAPSHOT: self._snapshot,
+        }
+
+    def dispatch(
+        self, canvas_id: str, record: WidgetRecord, kind: str, job_id: str
+    ) -> "Optional[asyncio.Future[str]]":
+        """Journal an accepted trigger and queue its workflow."""
+        trigger = {"canvas": canvas_id, "widget": record.as_dict()}
+        return self._submit(self.journal.begin(job_id, kind, trigger))
+
+    def resume(self) -> int:
+        """Queue the unfinished jobs a previous run left in the journal."""
+        resumed = 0
+        for state in self.journal.incomplete():
+            checkpoint = self.journal.begin(state.job_id, state.kind, state.trigger)
+            if state.kind not in self.workflows or "widget" not in state.trigger:
+                checkpoint.fail(f"Unknown job kind {state.kind!r}")
+            elif self._submit(checkpoint) is not None:
+                resumed += 1
+        return resumed
+
+    def _submit(self, checkpoint: JobCheckpoint) -> "Optional[asyncio.Future[str]]":
+        """Queue a journalled job unless it is already queued or running."""
+        state = checkpoint.state
+        if state.job_id in self.running:
+            return None
+        widget_id = state.trigger["widget"]["id"]
+        try:
+            future = self.scheduler.submit(
+                state.trigger["canvas"],
+                partial(self._run, checkpoint),
+                PRIORITIES[state.kind],
+                name=f"{state.kind}:{widget_id}",
+            )
+        except ResourceError as e:
+            logger.warning(f"Dropped {state.kind} trigger {widget_id}: {e}")
+            checkpoint.fail(str(e))
+            return None
+        self.running.add(state.job_id)
+        future.add_done_callback(partial(self._finished, state.job_id))
+        return future
+
+    def _finished(self, job_id: str, future: "asyncio.Future[str]") -> None:
+        """Forget a finished job; its failure was logged by the scheduler."""
+        self.running.discard(job_id)
+        if not future.cancelled():
+            future.exception()
+
+    async def _run(self, checkpoint: JobCheckpoint) -> str:
+        """Run a job's workflow and journal its outcome."""
+        state = checkpoint.state
+        canvas_id = state.trigger["canvas"]
+        widget = state.trigger["widget"]
+        budget = self.config.job_timeout_ms / 1000
+        # Stage spans (fetch, preprocess, inference, write_back) attach to this trace
+        with TRACER.trace(state.kind, canvas=canvas_id, widget=widget["id"], job=state.job_id[:12]):
+            try:
+                # Calls and retries inside the workflow are clipped to the job's budget
+                with deadline(budget) if budget else nullcontext():
+                    result = await self.workflows[state.kind](canvas_id, widget, checkpoint)
+            except Exception as e:
+                checkpoint.fail(str(e) or repr(e))
+                await self._show_error(canvas_id, checkpoint, e)
+                raise
+        checkpoint.complete()
+        return result
+
+    async def _show_error(
+        self, canvas_id: str, checkpoint: JobCheckpoint, error: Exception
+    ) -> None:
+        """Replace the text of a failed job's output note with the error."""
+        note_id = checkpoint.get("note")
+        if note_id is None:
+            return
+        try:
+            await self.write_back.patch(
+                f"/canvases/{canvas_id}/notes/{note_id}", {"text": f"Error: {error}"}
+            )
+        except Exception as e:
+            logger.warning(f"Could not report error on note {note_id}: {e}")
+
+    async def _output_note(
+        self, canvas_id: str, widget: Widget, checkpoint: JobCheckpoint, body: Widget
+    ) -> str:
+        """Create a job's output note next to its trigger, once per job."""
+        note_id = checkpoint.get("note")
+        if note_id is not None:
+            return note_id
+        body = dict(
+            {"location": _beside(widget), "scale": widget.get("scale") or 1.0},
+            parent_id=widget.get("parent_id"),
+            **body,
+        )
+        created = await self.write_back.create(
+            f"/canvases/{canvas_id}/notes", {k: v for k, v in body.items() if v is not None}
+        )
+        checkpoint.record("note", created["id"])
+        return created["id"]
+
+    async def _generate(self, prompt: str, system: str = "") -> str:
+        """Generate a completion, batched with other short prompts if enabled."""
+        llm = self.batcher or self.llm
+        return await llm.generate(prompt, system)
+
+    async def _cached(
+        self,
+        template: str,
+        compute: Callable[[], Awaitable[str]],
+        content_hash: str = "",
+        prompt: str = "",
+        options: Optional[Dict[str, Any]] = None,
+        max_age: Optional[float] = None,
+    ) -> str:
+        """
+        Return the cached result for the current model or compute and store it.
+
+        ``options`` are the generation options, which are part of the key;
+        results older than ``max_age`` seconds are computed again, and a
+        ``max_age`` of 0 bypasses the cache.
+        """
+        if not (content_hash or prompt) or max_age == 0:
+            return await compute()
+        model = self.llm.model
+        if options:
+            prompt = f"{prompt}\x00{json.dumps(options, sort_keys=True)}"
+        key = cache_key(content_hash, model, template, prompt)
+        return await self.cache.get_or_compute(key, compute, model, template, max_age)
+
+    async def _summarize(self, instruction: str, text: str) -> str:
+        """Summarisation call shared by the PDF and canvas workflows."""
+        return await self._cached(
+            SUMMARY_TEMPLATE,
+            partial(self._generate, text, instruction),
+            prompt=f"{instruction}\x00{text}",
+        )
+
+    async def _text(self, canvas_id: str, widget: Widget, checkpoint: JobCheckpoint) -> str:
+        """Answer a ``{{ prompt }}`` note in a new note next to it."""
+        match = TRIGGER.match(widget["text"])
+        if match is None:
+            raise ProcessingError("Note is not a prompt", {"widget": widget["id"]})
+        prompt = match.group(1).strip()
+        trigger_path = f"/canvases/{canvas_id}/notes/{widget['id']}"
+        body = {
+            "text": PLACEHOLDER,
+            "size": widget.get("size"),
+            "background_color": translucent(widget.get("background_color")),
+        }
+        if checkpoint.get("note") is None:
+            _, note_id = await asyncio.gather(
+                self.write_back.patch(trigger_path, {"text": prompt, "title": PROCESSING_TITLE}),
+                self._output_note(canvas_id, widget, checkpoint, body),
+            )
+        else:
+            note_id = checkpoint.get("note")
+
+        options = TEXT_OPTIONS or None
+
+        async def answer_prompt() -> str:
+            if self.batcher is not None and estimate_tokens(prompt) <= self.batcher.max_prompt_tokens:
+                return await self.batcher.generate(prompt, TEXT_SYSTEM_PROMPT, options=options)
+            sink = StreamingSink.from_config(
+                self.config, note_writer(self.write_back, canvas_id, note_id)
+            )
+            return await sink.consume(
+                self.llm.generate_stream(prompt, TEXT_SYSTEM_PROMPT, options=options)
+            )
+
+        answer = await self._cached(
+            TEXT_TEMPLATE,
+            answer_prompt,
+            prompt=f"{TEXT_SYSTEM_PROMPT}\x00{prompt}",
+            options=options,
+            max_age=self.config.text_cache_hours * 3600,
+        )
+        await asyncio.gather(
+            self.write_back.patch(
+                f"/canvases/{canvas_id}/notes/{note_id}",
+                {"text": answer, "size": response_size(answer, widget.get("size") or {})},
+            ),
+            self.write_back.patch(trigger_path, {"title": widget.get("title", "")}),
+        )
+        return answer
+
+    async def _pdf(self, canvas_id: str, widget: Widget, checkpoint: JobCheckpoint) -> str:
+        """Summarise the PDF an icon is attached to into a precis note."""
+        pdf_path = f"/canvases/{canvas_id}/pdfs/{widget['parent_id']}"
+        # Also fails if the icon's parent turns out not to be a PDF
+        pdf = await self.client.get_json(pdf_path)
+        note_id = await self._output_note(
+            canvas_id, widget, checkpoint,
+            {"title": "PDF precis", "text": "Summarising PDF...", "size": OUTPUT_SIZE},
+        )
+        write = note_writer(self.write_back, canvas_id, note_id)
+
+        async def summarize_pdf() -> str:
+            summary = checkpoint.get("summary")
+            if summary is not None:
+                return summary
+            with TRACER.span("fetch"):
+                data = await self.client.get_bytes(f"{pdf_path}/download")
+            summarizer = PdfSummarizer.from_config(
+                self.config, self._summarize, progress=write, checkpoint=checkpoint
+            )
+            return await summarizer.run(io.BytesIO(data))
+
+        summary = await self._cached(PDF_TEMPLATE, summarize_pdf, content_hash=pdf.get("hash") or "")
+        await self.write_back.patch(
+            f"/canvases/{canvas_id}/notes/{note_id}",
+            {"text": summary, "size": response_size(summary, OUTPUT_SIZE)},
+        )
+        return summary
+
+    async def _canvas(self, canvas_id: str, widget: Widget, checkpoint: JobCheckpoint) -> str:
+        """Summarise the whole canvas into an overview note."""
+        note_id = await self._output_note(
+            canvas_id, widget, checkpoint,
+            {"title": "Canvas precis", "text": "Analysing canvas...", "size": OUTPUT_SIZE},
+        )
+        summary = checkpoint.get("summary")
+        if summary is None:
+            widgets = await self.client.get_json(f"/canvases/{canvas_id}/widgets")
+            model = CanvasModel.from_widgets(widgets)
+            summary = await summarize_canvas(
+                model, self._summarize, parallelism=self.config.pdf_parallelism
+            )
+            checkpoint.record("summary", summary)
+        await self.write_back.patch(
+            f"/canvases/{canvas_id}/notes/{note_id}",
+            {"text": summary, "size": response_size(summary, OUTPUT_SIZE)},
+        )
+        return summary
+
+    async def _snapshot(self, canvas_id: str, widget: Widget, checkpoint: JobCheckpoint) -> str:
+        """Replace a snapshot with a note holding the text read from it."""
+        image_path = f"/canvases/{canvas_id}/images/{widget['id']}"
+        note_id = await self._output_note(
+            canvas_id, widget, checkpoint,
+            {
+                "title": "Snapshot text",
+                "text": "Reading the text in this snapshot...",
+                "location": widget.get("location"),
+                "size": OUTPUT_SIZE,
+            },
+        )
+        text = checkpoint.get("text")
+        if text is None:
+            asset = widget.get("hash") or (await self.client.get_json(image_path)).get("hash")
+            if not asset:
+                raise ProcessingError("Snapshot has not finished uploading", {"widget": widget["id"]})
+
+            async def read_text() -> str:
+                # The smallest mipmap that meets the model's input size
+                image = await self.image_fetcher.fetch(
+                    asset, canvas_id, self.config.vision_input_size
+                )
+                prepared = await self.vision.preprocess(image, deskew_text=True, normalize=True)
+                return await self.llm.generate(OCR_PROMPT, images=prepared.images)
+
+            text = await self._cached(OCR_TEMPLATE, read_text, content_hash=asset, prompt=OCR_PROMPT)
+            checkpoint.record("text", text)
+        await self.write_back.patch(
+            f"/canvases/{canvas_id}/notes/{note_id}",
+            {"text": text, "size": response_size(text, OUTPUT_SIZE)},
+        )
+        try:
+            await self.write_back.delete(image_path)
+        except CanvusAPIError as e:
+            if e.details.get("status") != 404:
+                raise
+        return text
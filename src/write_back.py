@@ -0,0 +1,247 @@
+"""
+Write-back layer for Canvus API updates in the Canvus-Local-LLM application.
+
+Workflows issue several small writes per trigger (strip the braces, set the
+processing colour, create the response note, update its status, delete the
+snapshot). This module funnels them through one place that:
+
+- coalesces PATCHes to the same widget within a short window, merging their
+  fields so only the latest value of each field is sent;
+- keeps writes to one widget in order, so a coalesced PATCH never overtakes
+  an earlier one still in flight and a DELETE supersedes pending PATCHes;
+- runs creates concurrently over the pooled keep-alive connection;
+- paces every request with a token bucket per Canvus server.
+
+Creates and deletes run under the caller's deadline (see ``resilience``); a
+merged PATCH runs under the latest deadline of the callers it serves, so one
+job running out of time never fails another job's write.
+"""
+
+import asyncio
+import contextvars
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from .canvus_client import CanvusClient
+from .config import Config
+from .resilience import deadline, remaining_time
+
+
+class TokenBucket:
+    """Rate limiter allowing ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        """Initialize the bucket full."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent; waiters are served in order."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+class _PendingPatch:
+    """Merged fields and waiters for one widget path."""
+
+    __slots__ = ("fields", "future", "timer", "count", "deadline")
+
+    def __init__(self, future: "asyncio.Future[Any]", deadline: Optional[float]):
+        self.fields: Dict[str, Any] = {}
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.count = 0
+        # Monotonic time the merged PATCH must finish by; None if a caller has no deadline
+        self.deadline = deadline
+
+
+class WriteBack:
+    """
+    Coalescing, rate-shaped writer for Canvus API updates.
+
+    ``patch()`` returns once the merged PATCH containing its fields has been
+    applied; every caller coalesced into the same PATCH gets its response.
+    """
+
+    def __init__(
+        self,
+        client: CanvusClient,
+        window: float = 0.1,
+        rate: float = 20.0,
+        burst: int = 40,
+        concurrency: int = 8,
+    ):
+        """Initialize the writer."""
+        self.client = client
+        self.window = window
+        self.bucket = TokenBucket(rate, burst)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending: Dict[str, _PendingPatch] = {}
+        self._tails: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.requested = 0
+        self.sent = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_config(cls, config: Config, client: CanvusClient) -> "WriteBack":
+        """Create a writer using the application configuration."""
+        return cls(
+            client,
+            window=config.write_back_window_ms / 1000,
+            rate=config.canvus_write_rate,
+            burst=config.canvus_write_burst,
+            concurrency=config.canvus_write_concurrency,
+        )
+
+    async def patch(self, path: str, fields: Dict[str, Any]) -> Any:
+        """Update a widget, merging with other PATCHes to it within the window."""
+        self.requested += 1
+        left = remaining_time()
+        limit = None if left is None else time.monotonic() + left
+        pending = self._pending.get(path)
+        if pending is None:
+            pending = self._pending[path] = _PendingPatch(
+                asyncio.get_running_loop().create_future(), limit
+            )
+            pending.timer = asyncio.get_running_loop().call_later(
+                self.window, self._flush, path
+            )
+        else:
+            self.coalesced += 1
+            if pending.deadline is not None:
+                pending.deadline = None if limit is None else max(pending.deadline, limit)
+        pending.fields.update(fields)
+        pending.count += 1
+        return await asyncio.shield(pending.future)
+
+    async def create(self, path: str, body: Dict[str, Any]) -> Any:
+        """Create a widget; creates run concurrently and are not coalesced."""
+        self.requested += 1
+        return await self._send("POST", path, body)
+
+    async def delete(self, path: str) -> Any:
+        """Delete a widget, discarding PATCHes to it that have not been sent."""
+        self.requested += 1
+        pending = self._pending.pop(path, None)
+        if pending is not None:
+            if pending.timer is not None:
+                pending.timer.cancel()
+            self.coalesced += pending.count
+            pending.future.set_result(None)
+        previous, done = self._reserve(path)
+        return await self._ordered(path, previous, done, lambda: self._send("DELETE", path))
+
+    async def flush(self) -> None:
+        """Send every pending PATCH now and wait for all writes to finish."""
+        for path in list(self._pending):
+            self._flush(path)
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Flush outstanding writes."""
+        await self.flush()
+        logger.info(
+            f"Write-back: {self.requested} writes requested, {self.sent} sent, "
+            f"{self.coalesced} coalesced, {self.bucket.waited:.1f}s rate-limited"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request, coalescing and rate-limit counters."""
+        return {
+            "requested": self.requested,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+            "rate_limited_seconds": round(self.bucket.waited, 3),
+        }
+
+    def _flush(self, path: str) -> None:
+        """Send the pending PATCH for ``path``."""
+        pending = self._pending.pop(path, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        # Take the path's place in line now; the task may only start later
+        previous, done = self._reserve(path)
+        # A fresh context, so the task does not inherit the deadline of whoever flushed
+        task = contextvars.Context().run(
+            asyncio.ensure_future,
+            self._bounded(
+                pending.deadline,
+                self._ordered(
+                    path, previous, done, lambda: self._send("PATCH", path, pending.fields)
+                ),
+            ),
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda t: _resolve(pending.future, t))
+
+    def _reserve(self, path: str) -> Tuple[Optional[asyncio.Future], asyncio.Future]:
+        """Queue a write to ``path``; return the previous write's and its own marker."""
+        previous = self._tails.get(path)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[path] = done
+        return previous, done
+
+    @staticmethod
+    async def _bounded(limit: Optional[float], write: Awaitable[Any]) -> Any:
+        """Await ``write`` under the deadline ``limit`` (a monotonic time), if any."""
+        if limit is None:
+            return await write
+        with deadline(limit - time.monotonic()):
+            return await write
+
+    async def _ordered(
+        self,
+        path: str,
+        previous: Optional[asyncio.Future],
+        done: asyncio.Future,
+        request: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run ``request()`` after the previous write reserved for the same path."""
+        try:
+            if previous is not None:
+                await previous
+            return await request()
+        finally:
+            done.set_result(None)
+            if self._tails.get(path) is done:
+                del self._tails[path]
+
+    async def _send(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+        """Send one request under the rate limit and concurrency cap."""
+        async with self._slots:
+            await self.bucket.acquire()
+            self.sent += 1
+            return await self.client.request_json(method, path, json=body)
+
+
+def _resolve(future: "asyncio.Future[Any]", task: "asyncio.Task[Any]") -> None:
+    """Copy the outcome of a finished task to a future."""
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
@@ -0,0 +1,121 @@
+"""
+Tests for the batching module.
+"""
+
+import asyncio
+
+import pytest
+
+from src.batching import PromptBatcher
+from src.exceptions import OllamaError
+
+
+class FakeClient:
+    """Records generate calls and their concurrency."""
+
+    model = "gemma3"
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate(self, prompt, system="", images=None, model=None, options=None):
+        self.calls.append((system, prompt))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if prompt == "fail":
+            raise OllamaError("boom")
+        return f"{system}:{prompt}"
+
+
+class TestPromptBatcher:
+    """Test cases for the PromptBatcher class."""
+
+    @pytest.mark.asyncio
+    async def test_groups_by_system_prompt(self):
+        """Test that interleaved prompts are dispatched grouped by system prompt."""
+        client = FakeClient()
+        batcher = PromptBatcher(client, window=0.02, parallelism=1)
+        prompts = [("A" if i % 2 else "B", f"p{i}") for i in range(6)]
+        results = await asyncio.gather(*(batcher.generate(p, s) for s, p in prompts))
+        assert results == [f"{s}:{p}" for s, p in prompts]
+        systems = [system for system, _ in client.calls]
+        assert systems == ["B", "B", "B", "A", "A", "A"]
+        assert batcher.stats()["batches"] == 2
+        assert batcher.stats()["mean_batch_size"] == 3
+
+    @pytest.mark.asyncio
+    async def test_full_batch_dispatches_early(self):
+        """Test that a full batch does not wait for the window."""
+        batcher = PromptBatcher(FakeClient(delay=0), window=10, max_batch=3)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.generate(f"p{i}") for i in range(3))), timeout=1
+        )
+        assert results == [":p0", ":p1", ":p2"]
+
+    @pytest.mark.asyncio
+    async def test_parallelism(self):
+        """Test that dispatched prompts respect the parallelism limit."""
+        client = FakeClient()
+        batcher = PromptBatcher(client, window=0.01, parallelism=2)
+        await asyncio.gather(*(batcher.generate(f"p{i}") for i in range(8)))
+        assert client.max_active == 2
+
+    @pytest.mark.asyncio
+    async def test_bypass(self):
+        """Test that long prompts and image prompts are not batched."""
+        client = FakeClient(delay=0)
+        batcher = PromptBatcher(client, window=10, max_prompt_tokens=5)
+        await asyncio.wait_for(batcher.generate("word " * 20), timeout=1)
+        await asyncio.wait_for(batcher.generate("short", images=["abc"]), timeout=1)
+        assert batcher.stats()["bypassed"] == 2
+        assert batcher.stats()["batches"] == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_their_caller(self):
+        """Test that a failing prompt does not affect the rest of its batch."""
+        batcher = PromptBatcher(FakeClient(), window=0.01)
+        results = await asyncio.gather(
+            batcher.generate("ok"), batcher.generate("fail"), return_exceptions=True
+        )
+        assert results[0] == ":ok"
+        assert isinstance(results[1], OllamaError)
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending(self):
+        """Test that close dispatches batches still inside their window."""
+        batcher = PromptBatcher(FakeClient(delay=0), window=10)
+        pending = asyncio.ensure_future(batcher.generate("p"))
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert await pending == ":p"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_dispatch_cancels_the_caller(self):
+        """Test that cancelling a dispatched prompt does not leave its caller hanging."""
+        batcher = PromptBatcher(FakeClient(delay=10), window=0)
+        pending = asyncio.ensure_future(batcher.generate("p"))
+        await asyncio.sleep(0.01)
+        for task in list(batcher._dispatching):
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(pending, 1)
+
+    @pytest.mark.asyncio
+    async def test_abandoned_prompt_skipped_after_slot_wait(self):
+        """Test that a prompt whose caller gave up while queued for a slot is not sent."""
+        client = FakeClient(delay=0.05)
+        batcher = PromptBatcher(client, window=0, parallelism=1)
+        first = asyncio.ensure_future(batcher.generate("p0"))
+        second = asyncio.ensure_future(batcher.generate("p1"))
+        await asyncio.sleep(0.01)
+        second.cancel()
+        assert await first == ":p0"
+        await batcher.close()
+        assert client.calls == [("", "p0")]
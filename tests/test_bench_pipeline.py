@@ -0,0 +1,41 @@
+"""
+Smoke tests for the replay-driven pipeline benchmark and its mock servers.
+"""
+
+import pytest
+
+from benchmarks.bench_pipeline import parse_args, regressions, run
+from benchmarks.mock_servers import load_recording, save_recording, synthetic_events
+
+
+class TestPipelineBenchmark:
+    """Test cases for the pipeline load test."""
+
+    @pytest.mark.asyncio
+    async def test_short_replay_answers_every_trigger(self, tmp_path):
+        """Test that a short replay drives every trigger through the application to a response."""
+        recording = tmp_path / "events.ndjson"
+        save_recording(recording, synthetic_events(canvases=3, rate=20, duration=1, trigger_every=5))
+        args = parse_args([
+            "--recording", str(recording), "--load-delay", "0.01", "--failure-rate", "0.2",
+        ])
+        result = await run(args)
+        assert result["events"] == len(load_recording(recording)) == 60
+        assert result["triggers"] == 12
+        # Injected Ollama failures end as error notes; every other trigger is answered
+        assert result["answered"] + result["errors"] == 12
+        assert 0 < result["errors"] < 12
+        assert result["p99_ms"] >= result["p50_ms"] > 0
+        assert result["delivery_ratio"] > 0.9
+
+    def test_regressions(self):
+        """Test that only relative changes beyond the tolerance are reported."""
+        baseline = {"delivery_ratio": 1.0, "p50_ratio": 4.0, "p95_ratio": 6.0, "p99_ratio": 8.0,
+                    "requests_per_trigger": 4.0, "rss_mb": 60, "triggers": 10, "answered": 9,
+                    "errors": 1, "p50_ms": 200.0}
+        # Absolute latencies are not compared; a slower machine has the same ratios
+        assert regressions(dict(baseline, p95_ratio=8.5, p50_ms=900.0), baseline, 0.5) == []
+        problems = regressions(
+            dict(baseline, delivery_ratio=0.4, answered=8, requests_per_trigger=7.0), baseline, 0.5
+        )
+        assert len(problems) == 3
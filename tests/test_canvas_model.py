@@ -0,0 +1,131 @@
+"""
+Tests for the canvas model module.
+"""
+
+import pytest
+
+from src.canvas_model import (
+    GLOBAL_INSTRUCTION,
+    UNANCHORED,
+    CanvasModel,
+    summarize_canvas,
+)
+
+
+def _widget(widget_id, widget_type, x, y, w, h, parent="bg", **fields):
+    widget = {
+        "id": widget_id,
+        "widget_type": widget_type,
+        "location": {"x": x, "y": y},
+        "size": {"width": w, "height": h},
+        "parent_id": parent,
+        "scale": 1,
+        "state": "normal",
+    }
+    widget.update(fields)
+    return widget
+
+
+def _canvas():
+    return [
+        _widget("a1", "Anchor", 0, 0, 2000, 2000, anchor_name="Brainstorm"),
+        _widget("a2", "Anchor", 5000, 0, 1000, 1000, anchor_name="Outcomes"),
+        _widget("a3", "Anchor", 100, 100, 500, 500, anchor_name="Ideas"),
+        _widget("n1", "Note", 200, 200, 100, 100, text="Nested idea"),
+        _widget("n2", "Note", 1500, 1500, 100, 100, text="Loose thought"),
+        _widget("n3", "Note", 5100, 100, 100, 100, text="Decision"),
+        _widget("n4", "Note", 9000, 9000, 100, 100, text="Orphan"),
+        _widget("p1", "Pdf", 5500, 500, 200, 200, title="Report"),
+        _widget("c1", "Note", 10, 10, 50, 50, parent="p1", text="Comment on report"),
+        {"id": "k1", "widget_type": "Connector", "src": {"id": "n2"}, "dst": {"id": "n3"},
+         "state": "normal"},
+    ]
+
+
+class TestCanvasModel:
+    """Test cases for the CanvasModel class."""
+
+    def test_anchor_classification(self):
+        """Test that widgets map to the smallest containing anchor."""
+        model = CanvasModel.from_widgets(_canvas(), cell_size=700)
+        assert model.items["n1"].region == "a3"
+        assert model.items["n2"].region == "a1"
+        assert model.items["n3"].region == "a2"
+        assert model.items["n4"].region == UNANCHORED
+        assert model.region_name("a3") == "Ideas"
+
+    def test_parent_relative_location(self):
+        """Test that child locations are resolved relative to their parent."""
+        model = CanvasModel.from_widgets(_canvas())
+        assert model.items["c1"].bounds[:2] == (5510, 510)
+        assert model.items["c1"].region == "a2"
+
+    def test_connector_graph(self):
+        """Test adjacency and cross-region link counting."""
+        model = CanvasModel.from_widgets(_canvas())
+        assert model.edges["n2"] == {"n3"}
+        assert model.region_links() == {("a1", "a2"): 1}
+        text = model.global_input({"a1": "x", "a2": "y"}, token_budget=500)
+        assert "Brainstorm <-> Outcomes: 1 connections" in text
+
+    def test_region_inputs_respect_budget(self):
+        """Test that region inputs are cut to the token budget."""
+        widgets = [_widget("a", "Anchor", 0, 0, 10000, 10000, anchor_name="Big")]
+        widgets += [
+            _widget(f"n{i}", "Note", i, i, 10, 10, text="lorem ipsum " * 20)
+            for i in range(500)
+        ]
+        inputs = CanvasModel.from_widgets(widgets).region_inputs(token_budget=400)
+        assert len(inputs["a"]) // 4 <= 400
+        assert inputs["a"].startswith("Area: Big (500 items)")
+        assert "more items" in inputs["a"]
+
+    def test_anchors_sharing_a_name(self):
+        """Test that anchors with the same name stay separate regions."""
+        widgets = [
+            _widget("a1", "Anchor", 0, 0, 100, 100, anchor_name="Todo"),
+            _widget("a2", "Anchor", 500, 0, 100, 100, anchor_name="Todo"),
+            _widget("n1", "Note", 10, 10, 10, 10, text="first"),
+            _widget("n2", "Note", 510, 10, 10, 10, text="second"),
+        ]
+        model = CanvasModel.from_widgets(widgets)
+        assert {r: [i.id for i in items] for r, items in model.regions.items()} == {
+            "a1": ["n1"], "a2": ["n2"],
+        }
+        assert sorted(model.region_names[r] for r in ("a1", "a2")) == ["Todo", "Todo (2)"]
+
+    def test_global_input_respects_budget(self):
+        """Test that many region summaries are shortened to fit the budget."""
+        widgets = [
+            _widget(f"a{i}", "Anchor", i * 100, 0, 50, 50, anchor_name=f"A{i}")
+            for i in range(50)
+        ]
+        model = CanvasModel.from_widgets(widgets)
+        summaries = {f"a{i}": "word " * 200 for i in range(50)}
+        text = model.global_input(summaries, token_budget=1000)
+        assert len(text) // 4 <= 1100
+
+    def test_huge_widgets_do_not_blow_up_the_grid(self):
+        """Test that an enormous anchor is indexed without allocating its cells."""
+        widgets = [
+            _widget("a1", "Anchor", -1e9, -1e9, 2e9, 2e9, anchor_name="Everything"),
+            _widget("n1", "Note", 10, 10, 10, 10, text="inside"),
+        ]
+        model = CanvasModel.from_widgets(widgets)
+        assert model.items["n1"].region == "a1"
+        assert len(model.anchors._cells) == 0
+        assert [a.id for a in model.anchors.in_rect((-1e12, -1e12, 1e12, 1e12))] == ["a1"]
+
+    @pytest.mark.asyncio
+    async def test_hierarchical_summary(self):
+        """Test that regions are summarised before the global pass."""
+        calls = []
+
+        async def summarize(instruction, text):
+            calls.append(instruction)
+            return f"summary of {text.splitlines()[0]}"
+
+        result = await summarize_canvas(CanvasModel.from_widgets(_canvas()), summarize)
+        assert calls[-1] == GLOBAL_INSTRUCTION
+        assert len(calls) == 5
+        assert result.startswith("summary of ## ")
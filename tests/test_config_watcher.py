@@ -0,0 +1,106 @@
+"""
+Tests for the configuration watcher module.
+"""
+
+import json
+import os
+
+import pytest
+
+from src.config import Config
+from src.config_watcher import ConfigWatcher, changed_fields
+
+
+def _write(path, **values):
+    path.write_text(json.dumps(values))
+    # Make the change visible even on filesystems with coarse timestamps
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _loader(path):
+    return lambda: Config.model_validate_json(path.read_text())
+
+
+class TestConfigWatcher:
+    """Test cases for the ConfigWatcher class."""
+
+    def test_changed_fields(self):
+        """Test that only differing fields are reported."""
+        old = Config(ollama_model="gemma3")
+        new = Config(ollama_model="llava", max_retries=old.max_retries)
+        assert changed_fields(old, new) == {"ollama_model"}
+
+    @pytest.mark.asyncio
+    async def test_applies_changed_fields(self, tmp_path):
+        """Test that a file change is reloaded and its diff applied."""
+        path = tmp_path / "config.json"
+        _write(path, ollama_model="gemma3")
+        applied = []
+
+        async def apply(config, changed):
+            applied.append((config.ollama_model, changed))
+
+        watcher = ConfigWatcher([path], Config(ollama_model="gemma3"), apply, load=_loader(path))
+        assert await watcher.check() is False
+
+        _write(path, ollama_model="llava", log_level="DEBUG")
+        assert await watcher.check() is True
+        assert applied == [("llava", {"ollama_model", "log_level"})]
+        assert watcher.last_apply_seconds is not None
+        assert await watcher.check() is False
+
+    @pytest.mark.asyncio
+    async def test_invalid_change_is_ignored(self, tmp_path):
+        """Test that a configuration failing validation is not applied."""
+        path = tmp_path / "config.json"
+        _write(path, ollama_model="gemma3")
+        applied = []
+
+        async def apply(config, changed):
+            applied.append(changed)
+
+        watcher = ConfigWatcher([path], Config(), apply, load=_loader(path))
+        _write(path, max_canvas_streams=0)
+        assert await watcher.check() is False
+        assert watcher.failures == 1
+
+        _write(path, max_canvas_streams=50)
+        assert await watcher.check() is True
+        assert applied == [{"max_canvas_streams"}]
+
+    @pytest.mark.asyncio
+    async def test_failed_apply_is_retried_on_next_change(self, tmp_path):
+        """Test that a failed apply keeps the previous configuration as the baseline."""
+        path = tmp_path / "config.json"
+        _write(path)
+        calls = []
+
+        async def apply(config, changed):
+            calls.append(changed)
+            if len(calls) == 1:
+                raise RuntimeError("login failed")
+
+        watcher = ConfigWatcher([path], Config(), apply, load=_loader(path))
+        _write(path, canvus_api_key="bad")
+        assert await watcher.check() is False
+        _write(path, canvus_api_key="good")
+        assert await watcher.check() is True
+        assert calls == [{"canvus_api_key"}, {"canvus_api_key"}]
+
+    @pytest.mark.asyncio
+    async def test_in_place_edits_are_detected(self, tmp_path):
+        """Test that editing the live config object and saving it is still applied."""
+        path = tmp_path / "config.json"
+        _write(path)
+        live = Config()
+        applied = []
+
+        async def apply(config, changed):
+            applied.append(changed)
+
+        watcher = ConfigWatcher([path], live, apply, load=_loader(path))
+        live.ollama_model = "llava"
+        _write(path, ollama_model="llava")
+        assert await watcher.check() is True
+        assert applied == [{"ollama_model"}]
@@ -0,0 +1,123 @@
+"""
+Tests for the duplicate prevention module.
+"""
+
+import asyncio
+
+import pytest
+
+from src.dedup import RecentWidgets, SingleFlight, request_key
+
+
+class TestRequestKey:
+    """Test cases for request_key."""
+
+    def test_key_stability(self):
+        """Test that keys depend on every request component."""
+        base = request_key("gemma3", "hi", "sys", [b"img"])
+        assert base == request_key("gemma3", "hi", "sys", [b"img"])
+        assert base != request_key("llava", "hi", "sys", [b"img"])
+        assert base != request_key("gemma3", "hi", "", [b"img"])
+        assert base != request_key("gemma3", "hi", "sys", [b"other"])
+        assert request_key("m", "ab", "c") != request_key("m", "b", "ac")
+
+
+class TestSingleFlight:
+    """Test cases for the SingleFlight class."""
+
+    @pytest.mark.asyncio
+    async def test_coalescing(self):
+        """Test that concurrent duplicates share one execution."""
+        group = SingleFlight()
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        results = await asyncio.gather(*(group.do("k", generate) for _ in range(5)))
+        assert results == ["answer"] * 5
+        assert calls == 1
+        assert group.stats() == {"calls": 5, "coalesced": 4, "inflight": 0}
+
+        assert await group.do("k", generate) == "answer"
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_waiter_cancellation(self):
+        """Test that cancelling one waiter keeps the shared work alive."""
+        group = SingleFlight()
+        started = asyncio.Event()
+
+        async def generate():
+            started.set()
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.ensure_future(group.do("k", generate))
+        second = asyncio.ensure_future(group.do("k", generate))
+        await started.wait()
+        first.cancel()
+        assert await second == 42
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flight_keeps_newer_one(self):
+        """Test that a cancelled flight finishing late does not drop its successor."""
+        group = SingleFlight()
+        calls = 0
+
+        async def stalled():
+            await asyncio.sleep(10)
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.ensure_future(group.do("k", stalled))
+        await asyncio.sleep(0)
+        first.cancel()
+        second = asyncio.ensure_future(group.do("k", generate))
+        await asyncio.sleep(0.01)
+        assert "k" in group
+        assert await asyncio.gather(second, group.do("k", generate)) == ["answer"] * 2
+        assert calls == 1
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_exception_shared(self):
+        """Test that failures reach every waiter and are not cached."""
+        group = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("down")
+
+        results = await asyncio.gather(
+            group.do("k", fail), group.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert "k" not in group
+
+
+class TestRecentWidgets:
+    """Test cases for the RecentWidgets class."""
+
+    def test_ttl_window(self):
+        """Test duplicate detection within and after the TTL."""
+        recent = RecentWidgets(ttl=10)
+        assert recent.check_and_mark("c", "w", "v1", now=0)
+        assert not recent.check_and_mark("c", "w", "v1", now=5)
+        assert recent.check_and_mark("c", "w", "v2", now=6)
+        assert recent.check_and_mark("c", "w", "v2", now=20)
+
+    def test_bounded(self):
+        """Test that the tracker evicts the oldest entries."""
+        recent = RecentWidgets(max_entries=3)
+        for i in range(5):
+            recent.check_and_mark("c", f"w{i}", now=i)
+        assert len(recent) == 3
+        assert recent.check_and_mark("c", "w0", now=5)
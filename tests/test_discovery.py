@@ -0,0 +1,187 @@
+"""
+Tests for the canvas discovery module.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.discovery import DiscoveryReconciler
+from src.subscription import CollectionSubscription
+
+
+class FakeManager:
+    """Records the canvas streams the reconciler starts and stops."""
+
+    def __init__(self):
+        self.running = set()
+        self.calls = []
+
+    def __contains__(self, canvas_id):
+        return canvas_id in self.running
+
+    def subscribe(self, canvas_id):
+        self.running.add(canvas_id)
+        self.calls.append(("start", canvas_id))
+
+    async def unsubscribe(self, canvas_id):
+        self.running.discard(canvas_id)
+        self.calls.append(("stop", canvas_id))
+
+
+def _canvus(workspaces, clients=()):
+    """
+    Canvus stand-in serving client and workspace lists and streams.
+
+    ``clients`` is streamed one object per line, or as one snapshot line
+    when it is a list of lists (one per connect).
+    """
+    connects = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path[len("/api/v1"):]
+        if path == "/clients":
+            if clients and isinstance(clients[0], list):
+                body = json.dumps(clients[min(len(connects), len(clients) - 1)]) + "\n"
+                connects.append(path)
+            else:
+                body = "".join(json.dumps(c) + "\n" for c in clients)
+            return httpx.Response(200, content=body)
+        client_id = path.split("/")[2]
+        listing = workspaces.get(client_id, [])
+        if "subscribe" in request.url.params:
+            return httpx.Response(200, content=json.dumps(listing) + "\n")
+        return httpx.Response(200, json=listing)
+
+    config = Config(canvus_server_url="http://canvus", canvus_api_key="key")
+    return CanvusClient(config, transport=httpx.MockTransport(handler))
+
+
+def _workspace(index, canvas_id):
+    return {"index": index, "canvas_id": canvas_id, "workspace_state": "open"}
+
+
+class TestDiscoveryReconciler:
+    """Test cases for the DiscoveryReconciler class."""
+
+    @pytest.mark.asyncio
+    async def test_discovers_canvases_from_clients_stream(self):
+        """Test that connected clients' canvases are subscribed immediately."""
+        client = _canvus(
+            {"a": [_workspace(0, "c1"), _workspace(1, "")], "b": [_workspace(0, "c2")]},
+            clients=[{"id": "a", "state": "normal"}, {"id": "b", "state": "normal"}],
+        )
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=10)
+        reconciler.start()
+        for _ in range(100):
+            if manager.running == {"c1", "c2"}:
+                break
+            await asyncio.sleep(0.01)
+        await reconciler.close()
+        await client.close()
+
+        assert manager.running == {"c1", "c2"}
+        assert reconciler.stats()["clients"] == 2
+
+    @pytest.mark.asyncio
+    async def test_shared_canvas_is_reference_counted(self):
+        """Test that a canvas shown by two clients stops only when both leave."""
+        client = _canvus({"a": [_workspace(0, "c1")], "b": [_workspace(0, "c1")]})
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=0.02)
+        await reconciler.add_client("a")
+        await reconciler.add_client("b")
+        assert manager.calls == [("start", "c1")]
+        assert reconciler.refs == {"c1": 2}
+
+        reconciler.remove_client("a")
+        await asyncio.sleep(0.05)
+        assert manager.running == {"c1"}
+
+        reconciler.remove_client("b")
+        await asyncio.sleep(0.05)
+        await reconciler.close()
+        await client.close()
+        assert manager.calls == [("start", "c1"), ("stop", "c1")]
+
+    @pytest.mark.asyncio
+    async def test_workspace_flips_are_debounced(self):
+        """Test that paging through canvases only starts the one that is settled on."""
+        client = _canvus({"a": [_workspace(0, "c1")]})
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=0.05)
+        await reconciler.add_client("a")
+        for canvas_id in ("c2", "c3", "c4", "c5"):
+            reconciler.update_workspace("a", _workspace(0, canvas_id))
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.1)
+        await reconciler.close()
+        await client.close()
+
+        assert sorted(manager.calls) == [("start", "c1"), ("start", "c5"), ("stop", "c1")]
+        assert reconciler.desired() == {"c5"}
+
+    @pytest.mark.asyncio
+    async def test_flip_back_does_not_restart(self):
+        """Test that returning to a canvas before the debounce keeps its stream."""
+        client = _canvus({"a": [_workspace(0, "c1")]})
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=0.05)
+        await reconciler.add_client("a")
+        reconciler.update_workspace("a", _workspace(0, "c2"))
+        reconciler.update_workspace("a", _workspace(0, "c1"))
+        await asyncio.sleep(0.1)
+        await reconciler.close()
+        await client.close()
+
+        assert manager.calls == [("start", "c1")]
+        assert reconciler.stats()["debounced"] == 2
+
+    @pytest.mark.asyncio
+    async def test_client_reconnect_keeps_streams(self):
+        """Test that a client disconnecting and reconnecting causes no churn."""
+        client = _canvus({"a": [_workspace(0, "c1"), _workspace(1, "c2")]})
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=0.05)
+        await reconciler.add_client("a")
+        reconciler.remove_client("a")
+        await reconciler.add_client("a")
+        await asyncio.sleep(0.1)
+        await reconciler.close()
+        await client.close()
+
+        assert manager.calls == [("start", "c1"), ("start", "c2")]
+
+    @pytest.mark.asyncio
+    async def test_reconnect_snapshot_removes_missing_clients(self):
+        """Test that clients absent from the replayed /clients state are released."""
+        client = _canvus(
+            {"a": [_workspace(0, "c1")], "b": [_workspace(0, "c2")]},
+            clients=[
+                [{"id": "a", "state": "normal"}, {"id": "b", "state": "normal"}],
+                [{"id": "a", "state": "normal"}],
+            ],
+        )
+        manager = FakeManager()
+        reconciler = DiscoveryReconciler(client, manager, debounce=0)
+        subscription = CollectionSubscription(
+            client.http, "/clients", reconciler._on_client,
+            on_snapshot=reconciler._on_clients_snapshot,
+        )
+        await subscription._consume()
+        await asyncio.gather(*reconciler._tasks)
+        assert manager.running == {"c1", "c2"}
+
+        # Client b disconnected while the stream was down; its deletion was never sent
+        await subscription._consume()
+        await asyncio.gather(*reconciler._tasks)
+        await reconciler.close()
+        await client.close()
+
+        assert set(reconciler.workspaces) == {"a"}
+        assert manager.running == {"c1"}
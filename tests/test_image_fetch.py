@@ -0,0 +1,146 @@
+"""
+Tests for the mipmap-aware image fetching module.
+"""
+
+import asyncio
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.image_fetch import ImageFetcher, select_mipmap_level
+
+
+def _webp(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 10)).save(buffer, "WEBP")
+    return buffer.getvalue()
+
+
+def _client(handler):
+    config = Config(canvus_server_url="http://canvus", canvus_api_key="key")
+    return CanvusClient(config, transport=httpx.MockTransport(handler))
+
+
+class TestSelectMipmapLevel:
+    """Test cases for select_mipmap_level."""
+
+    def test_levels(self):
+        """Test level selection against the target resolution."""
+        assert select_mipmap_level(4000, 3000, 5, 896) == 2
+        assert select_mipmap_level(4000, 3000, 1, 896) == 1
+        assert select_mipmap_level(800, 600, 3, 896) == 0
+        assert select_mipmap_level(1792, 100, 4, 896) == 1
+
+
+class TestImageFetcher:
+    """Test cases for the ImageFetcher class."""
+
+    @pytest.mark.asyncio
+    async def test_fetch_smallest_sufficient_level(self):
+        """Test that the right level is fetched, decoded and cached."""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request.url.path)
+            assert request.headers["canvas-id"] == "c1"
+            if request.url.path == "/api/v1/mipmaps/abc":
+                return httpx.Response(
+                    200,
+                    json={"resolution": {"width": 4000, "height": 2000},
+                          "max_level": 5, "pages": 1},
+                )
+            assert request.url.path == "/api/v1/mipmaps/abc/2"
+            return httpx.Response(200, content=_webp(1000, 500))
+
+        client = _client(handler)
+        fetcher = ImageFetcher(client)
+        image = await fetcher.fetch("abc", "c1", target=896)
+        assert image.shape == (500, 1000, 3)
+        again = await fetcher.fetch("abc", "c1", target=896)
+        assert again is image
+        assert requests == ["/api/v1/mipmaps/abc", "/api/v1/mipmaps/abc/2"]
+        assert fetcher.stats()["hits"] == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_unsupported_asset_fallback(self):
+        """Test the original asset fallback when mipmaps are not implemented."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.startswith("/api/v1/mipmaps/"):
+                return httpx.Response(501, json={"msg": "Not implemented"})
+            buffer = io.BytesIO()
+            Image.new("RGB", (2000, 1000)).save(buffer, "PNG")
+            return httpx.Response(200, content=buffer.getvalue())
+
+        client = _client(handler)
+        fetcher = ImageFetcher(client)
+        image = await fetcher.fetch("abc", "c1", target=500)
+        assert image.shape == (250, 500, 3)
+        larger = await fetcher.fetch("abc", "c1", target=1000)
+        assert larger.shape == (500, 1000, 3)
+        assert await fetcher.fetch("abc", "c1", target=500) is image
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_cache_bound(self):
+        """Test that decoded images are evicted beyond the byte budget."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.count("/") == 4:
+                return httpx.Response(
+                    200, json={"resolution": {"width": 100, "height": 100}, "max_level": 0}
+                )
+            return httpx.Response(200, content=_webp(100, 100))
+
+        client = _client(handler)
+        fetcher = ImageFetcher(client, max_cache_bytes=100 * 100 * 3 * 2)
+        for name in ("a", "b", "c"):
+            await fetcher.fetch(name, "c1", target=896)
+        assert fetcher.stats()["entries"] == 2
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_counted_once(self):
+        """Test that storing an already cached key does not inflate the byte count."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.count("/") == 4:
+                return httpx.Response(
+                    200, json={"resolution": {"width": 100, "height": 100}, "max_level": 0}
+                )
+            return httpx.Response(200, content=_webp(100, 100))
+
+        client = _client(handler)
+        fetcher = ImageFetcher(client)
+        await asyncio.gather(*(fetcher.fetch("a", "c1", target=896) for _ in range(3)))
+        await fetcher.fetch("a", "c1", target=896)
+        assert fetcher.stats()["entries"] == 1
+        assert fetcher.stats()["cache_bytes"] == 100 * 100 * 3
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_info_cache_bound(self):
+        """Test that mipmap info is evicted least recently used first."""
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request.url.path)
+            if request.url.path.count("/") == 4:
+                return httpx.Response(
+                    200, json={"resolution": {"width": 100, "height": 100}, "max_level": 0}
+                )
+            return httpx.Response(200, content=_webp(100, 100))
+
+        client = _client(handler)
+        fetcher = ImageFetcher(client, max_cache_bytes=0, max_info_entries=2)
+        for name in ("a", "b", "a", "c", "a"):
+            await fetcher.fetch(name, "c1", target=896)
+        assert fetcher.stats()["info_entries"] == 2
+        info = [path for path in requests if path.count("/") == 4]
+        assert info == ["/api/v1/mipmaps/a", "/api/v1/mipmaps/b", "/api/v1/mipmaps/c"]
+        await client.close()
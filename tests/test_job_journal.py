@@ -0,0 +1,130 @@
+"""
+Tests for the job journal module.
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from src.job_journal import COMPLETE, JobJournal, job_key
+from src.pdf_pipeline import MAP_INSTRUCTION, PdfSummarizer
+from tests.test_pdf_pipeline import _make_pdf
+
+
+class TestJobJournal:
+    """Test cases for the JobJournal class."""
+
+    def test_key_components(self):
+        """Test that job IDs change with the canvas, widget and content."""
+        key = job_key("c1", "w1", "{{ hi }}")
+        assert key == job_key("c1", "w1", "{{ hi }}")
+        assert key != job_key("c2", "w1", "{{ hi }}")
+        assert key != job_key("c1", "w1", "{{ hello }}")
+
+    @pytest.mark.asyncio
+    async def test_resume_after_restart(self, tmp_path):
+        """Test that stages survive reopening and completed jobs are skipped."""
+        journal = JobJournal(tmp_path)
+        done = journal.begin("done", "text", {"canvas": "c1"})
+        done.record("answer", "42")
+        done.complete("42")
+        running = journal.begin("running", "pdf", {"canvas": "c1", "widget": "w2"})
+        running.record("map:0", "first")
+        await journal.flush()
+        assert journal.stats()["written"] == 5
+        # Simulate a crash: no close, the writer thread just stops being used
+        reopened = JobJournal(tmp_path)
+        assert reopened.is_complete("done")
+        assert not reopened.is_complete("running")
+        [state] = reopened.incomplete()
+        assert (state.job_id, state.kind, state.trigger["widget"]) == ("running", "pdf", "w2")
+        checkpoint = reopened.begin("running", "pdf", state.trigger)
+        assert checkpoint.get("map:0") == "first"
+        assert checkpoint.get("map:1") is None
+        checkpoint.fail("model unavailable")
+        reopened.close()
+        journal.close()
+
+        final = JobJournal(tmp_path)
+        assert final.incomplete() == []
+        assert not final.is_complete("running")
+        final.close()
+
+    def test_expired_jobs_are_compacted(self, tmp_path):
+        """Test that finished jobs older than the retention period are removed."""
+        journal = JobJournal(tmp_path)
+        journal.begin("old", "text", {}).complete()
+        journal.begin("open", "text", {})
+        journal.close()
+        db = sqlite3.connect(str(tmp_path / "journal.sqlite3"))
+        db.execute("UPDATE entries SET created = ? WHERE job_id = 'old'", (time.time() - 7200,))
+        db.commit()
+        db.close()
+
+        reopened = JobJournal(tmp_path, retention=3600)
+        assert reopened.expired == 2
+        assert not reopened.is_complete("old")
+        assert [state.job_id for state in reopened.incomplete()] == ["open"]
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_writes_do_not_block_the_loop(self, tmp_path):
+        """Test that appends return immediately while the writer holds the database."""
+        journal = JobJournal(tmp_path)
+        with journal._lock:
+            started = time.perf_counter()
+            checkpoint = journal.begin("job", "text", {})
+            for i in range(100):
+                checkpoint.record(f"map:{i}", "x" * 100)
+            elapsed = time.perf_counter() - started
+        assert elapsed < 0.05
+        await journal.flush()
+        assert journal.stats()["pending"] == 0
+        checkpoint.complete()
+        journal.close()
+        rows = sqlite3.connect(str(journal.path)).execute(
+            "SELECT COUNT(*), SUM(kind = ?) FROM entries", (COMPLETE,)
+        ).fetchone()
+        assert rows == (102, 1)
+
+    @pytest.mark.asyncio
+    async def test_pdf_summary_resumes_from_chunk_summaries(self, tmp_path):
+        """Test that a resumed PDF job only summarises the chunks not yet journalled."""
+        calls = {"map": 0}
+        fail_after = 3
+
+        async def summarize(instruction, text):
+            await asyncio.sleep(0)
+            if instruction == MAP_INSTRUCTION:
+                calls["map"] += 1
+                if calls["map"] > fail_after:
+                    raise RuntimeError("crash")
+                return f"map({text.split()[-2]})"
+            return "reduce"
+
+        pages = [f"Page number {i} text" for i in range(6)]
+        journal = JobJournal(tmp_path)
+        summarizer = PdfSummarizer(
+            summarize, parallelism=1, chunk_tokens=8,
+            checkpoint=journal.begin("pdf", "pdf", {}),
+        )
+        with pytest.raises(RuntimeError):
+            await summarizer.run(_make_pdf(pages))
+        await journal.flush()
+        journal.close()
+
+        fail_after = 100
+        calls["map"] = 0
+        reopened = JobJournal(tmp_path)
+        summarizer = PdfSummarizer(
+            summarize, parallelism=1, chunk_tokens=8,
+            checkpoint=reopened.begin("pdf", "pdf", {}),
+        )
+        assert await summarizer.run(_make_pdf(pages)) == "reduce"
+        assert summarizer.chunks_resumed == 3
+        assert calls["map"] == 3
+        checkpoint = reopened.begin("pdf", "pdf", {})
+        assert checkpoint.get("summary") == "reduce"
+        reopened.close()
@@ -0,0 +1,159 @@
+"""
+Tests for the logging setup module.
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+
+import pytest
+from loguru import logger
+
+from src.logging_setup import (
+    BackgroundFileSink,
+    BackgroundStreamSink,
+    configure_logging,
+    reconfigure_logging,
+    sampled,
+)
+
+
+@pytest.fixture(autouse=True)
+def restore_logger():
+    yield
+    logger.remove()
+
+
+class TestSampledLogger:
+    """Test cases for sampled logging."""
+
+    def test_samples_per_key(self):
+        """Test that one in N calls per key reaches the sinks."""
+        configure_logging(level="CRITICAL", log_file=None, sample_every=10)
+        messages = []
+        logger.add(messages.append, level="DEBUG", format="{message}")
+        diff_log = sampled("diff")
+        keepalive_log = sampled("keepalive")
+        for i in range(25):
+            diff_log.debug("diff {}", i)
+            keepalive_log.debug("keepalive {}", i)
+        texts = [m.record["message"] for m in messages]
+        assert [t for t in texts if t.startswith("diff")] == ["diff 0", "diff 10", "diff 20"]
+        assert len([t for t in texts if t.startswith("keepalive")]) == 3
+        assert [m.record["extra"]["sampled"] for m in messages[:4]] == [1, 1, 10, 10]
+        assert diff_log.count == 25
+
+    def test_reports_caller(self):
+        """Test that sampled records point at the calling function."""
+        configure_logging(level="CRITICAL", log_file=None, sample_every=1)
+        messages = []
+        logger.add(messages.append, level="DEBUG", format="{message}")
+        sampled("diff").debug("hello")
+        assert messages[0].record["function"] == "test_reports_caller"
+
+
+class TestBackgroundFileSink:
+    """Test cases for the BackgroundFileSink class."""
+
+    def test_json_lines(self, tmp_path):
+        """Test that the file sink writes JSON lines from its thread."""
+        log_file = tmp_path / "app.log"
+        configure_logging(level="CRITICAL", log_file=str(log_file), json_logs=True)
+        logger.bind(canvas_id="c1").info("hello")
+        logger.remove()
+        record = json.loads(log_file.read_text().splitlines()[0])["record"]
+        assert record["message"] == "hello"
+        assert record["extra"]["canvas_id"] == "c1"
+
+    @pytest.mark.asyncio
+    async def test_complete_waits_for_writes(self, tmp_path):
+        """Test that logger.complete() waits for queued messages."""
+        log_file = tmp_path / "app.log"
+        configure_logging(level="CRITICAL", log_file=str(log_file))
+        for i in range(100):
+            logger.info(f"line {i}")
+        await logger.complete()
+        assert len(log_file.read_text().splitlines()) == 100
+
+    def test_rotation(self, tmp_path):
+        """Test that the file is rotated once it exceeds the size limit."""
+        sink = BackgroundFileSink(str(tmp_path / "app.log"), max_bytes=100)
+        for i in range(10):
+            sink.write(f"{'x' * 30} {i}\n")
+        sink.stop()
+        assert len(list(tmp_path.glob("app.*.log"))) >= 1
+
+    @pytest.mark.asyncio
+    async def test_recovers_after_failed_rotation(self, tmp_path):
+        """Test that a failed rotation neither stalls complete() nor stops writing."""
+        sink = BackgroundFileSink(str(tmp_path / "app.log"), max_bytes=10)
+        failures = []
+
+        def rotate():
+            failures.append(1)
+            raise OSError("disk full")
+
+        sink._rotate = rotate
+        sink.write("first line\n")
+        await asyncio.wait_for(sink.complete(), 2)
+        sink.write("second line\n")
+        await asyncio.wait_for(sink.complete(), 2)
+        sink.stop()
+        assert len(failures) == 2
+        assert (tmp_path / "app.log").read_text() == "first line\nsecond line\n"
+
+
+class TestBackgroundStreamSink:
+    """Test cases for the BackgroundStreamSink class."""
+
+    def test_writes_from_thread(self):
+        """Test that console output is written by the writer thread."""
+        threads = []
+
+        class Stream(io.StringIO):
+            def write(self, text):
+                threads.append(threading.current_thread())
+                return super().write(text)
+
+        stream = Stream()
+        logger.add(BackgroundStreamSink(stream), format="{message}")
+        logger.info("hello")
+        logger.remove()
+        assert stream.getvalue() == "hello\n"
+        assert threads and threading.current_thread() not in threads
+
+
+class TestReconfigureLogging:
+    """Test cases for reloading the log sinks."""
+
+    @pytest.mark.asyncio
+    async def test_joins_old_sinks_off_loop(self, tmp_path, monkeypatch):
+        """Test that a reload does not block the event loop on the old writer threads."""
+        log_file = tmp_path / "app.log"
+        configure_logging(level="CRITICAL", log_file=str(log_file))
+        joined = threading.Event()
+        original_close = BackgroundFileSink._close
+
+        def slow_close(self):
+            time.sleep(0.3)
+            original_close(self)
+            joined.set()
+
+        monkeypatch.setattr(BackgroundFileSink, "_close", slow_close)
+        logger.info("before")
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await reconfigure_logging(level="CRITICAL", log_file=str(log_file))
+        ticker.cancel()
+        assert joined.is_set()
+        assert ticks > 5
+        assert log_file.read_text().count("before") == 1
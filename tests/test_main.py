@@ -2,11 +2,17 @@
 Tests for the main application module.
 """
 
+import asyncio
+
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 
-from src.main import CanvusLLMInterface
+from src.dedup import RecentWidgets
+from src.job_journal import JobJournal
+from src.main import CanvusLLMInterface, main
+from src.resilience import Resilience
+from src.write_back import WriteBack
 from src.exceptions import CanvusLLMException, ConfigurationError
 
 
@@ -31,43 +37,56 @@ class TestCanvusLLMInterface:
     @pytest.mark.asyncio
     async def test_initialization_async(self):
         """Test async initialization."""
-        app = CanvusLLMInterface()
+        app = CanvusLLMInterface(headless=False)
         
         # Mock the tray to avoid actual system tray creation
-        with patch('src.main.CanvusTray') as mock_tray:
-            mock_tray_instance = mock_tray.return_value
-            mock_tray_instance.start_tray.return_value = None
-            
-            # Mock configuration validation with async mocks
-            with patch.object(app.config, 'test_canvus_connection', new_callable=AsyncMock) as mock_canvus:
-                mock_canvus.return_value = True
-                with patch.object(app.config, 'test_ollama_connection', new_callable=AsyncMock) as mock_ollama:
-                    mock_ollama.return_value = True
-                    with patch.object(app.config, 'validate_ollama_model', new_callable=AsyncMock) as mock_model:
-                        mock_model.return_value = True
-                        
-                        # Mock client initialization
-                        with patch.object(app, '_initialize_clients') as mock_clients:
-                            mock_clients.return_value = None
-                            
-                            # Mock processing initialization
-                            with patch.object(app, '_initialize_processing') as mock_processing:
-                                mock_processing.return_value = None
-                                
+        with patch('src.main.TrayStatusSink') as mock_sink:
+            with patch.object(type(app.config), 'is_authenticated', return_value=True):
+                # Mock client initialization
+                with patch.object(app, '_initialize_clients', new_callable=AsyncMock):
+                    # Mock processing initialization
+                    with patch.object(app, '_initialize_processing', new_callable=AsyncMock):
+                        with patch.object(app, '_initialize_metrics', new_callable=AsyncMock):
+                            with patch.object(app, '_initialize_config_watcher'):
                                 await app.initialize()
                                 
                                 assert app.is_running is True
-                                mock_tray.assert_called_once()
+                                mock_sink.assert_called_once()
+                                assert mock_sink.call_args.kwargs["on_exit"] == app.request_stop
+                                mock_sink.return_value.start.assert_called_once()
     
-    def test_restart_method(self):
-        """Test restart method."""
+    @pytest.mark.asyncio
+    async def test_restart_method(self):
+        """Test that restart asks the running application to stop and start again."""
         app = CanvusLLMInterface()
+        app._loop = asyncio.get_running_loop()
+        app._stop_event = asyncio.Event()
+        
+        app.restart()
+        await asyncio.sleep(0)
+        
+        assert app.restart_requested is True
+        assert app.stop_requested_at is not None
+        assert app._stop_event.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_main_restarts_a_fresh_instance(self):
+        """Test that main() starts a new application after a restart request."""
+        started = []
+        
+        async def start(app, restarting_since=None):
+            started.append((app, restarting_since))
+            if len(started) == 1:
+                app.restart()
         
-        # Test that restart calls sys.exit
-        with pytest.raises(SystemExit) as exc_info:
-            app.restart()
+        with patch.object(CanvusLLMInterface, 'start', autospec=True, side_effect=start):
+            await main(["--headless"])
         
-        assert exc_info.value.code == 0
+        [(first, none), (second, since)] = started
+        assert second is not first
+        assert none is None
+        assert since == first.stop_requested_at
+        assert second.restart_requested is False
     
     def test_get_status(self):
         """Test status reporting."""
@@ -126,3 +145,141 @@ class TestCanvusLLMInterface:
                     
                     assert app.connection_status["canvus"] is False
                     assert app.connection_status["ollama"] is False
+
+
+class TestApplyConfig:
+    """Test that reloaded settings recycle only the affected components."""
+
+    def _app(self):
+        app = CanvusLLMInterface(headless=True)
+        app.canvus_client = MagicMock(close=AsyncMock())
+        app.ollama_client = MagicMock(close=AsyncMock())
+        app.image_fetcher = MagicMock()
+        app.write_back = MagicMock(flush=AsyncMock())
+        app.discovery = MagicMock(close=AsyncMock())
+        app.subscription_manager = MagicMock(close=AsyncMock(), subscriptions={"c1": None})
+        app.workflows = MagicMock()
+        return app
+
+    @pytest.mark.asyncio
+    async def test_log_level_keeps_canvus_client(self):
+        """Test that a logging change does not recycle the Canvus client."""
+        app = self._app()
+        client = app.canvus_client
+        config = app.config.model_copy(update={"log_level": "DEBUG"})
+        with patch.object(app, '_reload_logging', new_callable=AsyncMock) as mock_logging:
+            with patch.object(app, '_create_canvus_client', new_callable=AsyncMock) as mock_create:
+                await app.apply_config(config, {"log_level"})
+        mock_logging.assert_awaited_once()
+        mock_create.assert_not_called()
+        assert app.canvus_client is client
+        client.close.assert_not_called()
+        app.subscription_manager.close.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_server_url_recycles_canvus_client(self):
+        """Test that a new Canvus server replaces the client and drops old canvases."""
+        app = self._app()
+        old = app.canvus_client
+        new = MagicMock()
+        config = app.config.model_copy(update={"canvus_server_url": "https://other.example"})
+        with patch.object(app, '_create_canvus_client', new_callable=AsyncMock, return_value=new):
+            with patch('src.main.DiscoveryReconciler') as mock_discovery:
+                await app.apply_config(config, {"canvus_server_url"})
+        assert app.canvus_client is new
+        assert app.image_fetcher.client is new and app.write_back.client is new
+        app.write_back.flush.assert_awaited_once()
+        app.subscription_manager.close.assert_awaited_once()
+        app.subscription_manager.subscribe.assert_not_called()
+        mock_discovery.from_config.return_value.start.assert_called_once()
+        old.close.assert_awaited_once()
+        app.ollama_client.close.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_credentials_resubscribe_canvases(self):
+        """Test that new credentials for the same server re-open the canvas streams."""
+        app = self._app()
+        config = app.config.model_copy(update={"canvus_api_key": "new-key"})
+        with patch.object(app, '_create_canvus_client', new_callable=AsyncMock):
+            with patch('src.main.DiscoveryReconciler'):
+                await app.apply_config(config, {"canvus_api_key"})
+        app.subscription_manager.subscribe.assert_called_once_with("c1")
+
+    @pytest.mark.asyncio
+    async def test_tunables_reach_running_components(self):
+        """Test that components holding the configuration or values from it are updated."""
+        app = self._app()
+        app.resilience = Resilience.from_config(app.config)
+        app.recent_widgets = RecentWidgets(ttl=60)
+        app.write_back = WriteBack(app.canvus_client)
+        changes = {
+            "job_timeout_ms": 1000,
+            "max_retries": 7,
+            "duplicate_window": 5,
+            "write_back_window_ms": 250,
+            "canvus_write_rate": 3,
+        }
+        config = app.config.model_copy(update=changes)
+        with patch('src.main.logger') as mock_logger:
+            await app.apply_config(config, set(changes))
+        assert app.workflows.config is config and app.canvus_client.config is config
+        assert app.resilience.retry.max_retries == 7
+        assert app.recent_widgets.ttl == 5
+        assert app.write_back.window == 0.25 and app.write_back.bucket.rate == 3
+        mock_logger.warning.assert_not_called()
+        app.canvus_client.close.assert_not_called()
+        app.ollama_client.close.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_restart_fields_are_reported(self):
+        """Test that changes only a restart can apply are logged."""
+        app = self._app()
+        config = app.config.model_copy(
+            update={"processing_workers": 9, "batch_window_ms": 50, "duplicate_window": 5}
+        )
+        with patch('src.main.logger') as mock_logger:
+            await app.apply_config(
+                config, {"processing_workers", "batch_window_ms", "duplicate_window"}
+            )
+        mock_logger.warning.assert_called_once_with(
+            "Restart to apply changes to batch_window_ms, processing_workers"
+        )
+
+
+class TestHandleWidgetEvent:
+    """Test that widget updates are routed to the trigger workflows."""
+
+    @pytest.mark.asyncio
+    async def test_triggers_are_dispatched_once(self, tmp_path):
+        """Test that only new triggers reach the workflow runner."""
+        app = CanvusLLMInterface(headless=True)
+        app.accepting = True
+        app.recent_widgets = RecentWidgets(ttl=60)
+        app.job_journal = JobJournal(tmp_path)
+        app.workflows = MagicMock()
+        note = {"id": "n1", "widget_type": "Note", "text": "{{ hi }}"}
+        try:
+            await app._handle_widget_event("c1", {"id": "n0", "widget_type": "Note", "text": "hi"})
+            await app._handle_widget_event("c1", note)
+            await app._handle_widget_event("c1", dict(note, location={"x": 5, "y": 5}))
+            app.job_journal.begin("done", "text", {}).complete()
+            with patch("src.main.job_key", return_value="done"):
+                await app._handle_widget_event("c1", dict(note, id="n2"))
+        finally:
+            app.job_journal.close()
+        app.workflows.dispatch.assert_called_once()
+        canvas_id, record, kind, job_id = app.workflows.dispatch.call_args.args
+        assert (canvas_id, record.id, kind) == ("c1", "n1", "text")
+
+    @pytest.mark.asyncio
+    async def test_snapshot_prunes_deleted_widgets(self):
+        """Test that widgets missing from a replayed canvas state are forgotten."""
+        app = CanvusLLMInterface(headless=True)
+        app.accepting = True
+        app.recent_widgets = RecentWidgets(ttl=60)
+        for widget_id in ("n1", "n2", "n3"):
+            await app._handle_widget_event("c1", {"id": widget_id, "widget_type": "Note"})
+        await app._handle_canvas_snapshot("c1", {"n1", "n3"})
+        await app._handle_canvas_snapshot("c2", {"n1"})
+        assert sorted(record.id for record in app.widget_stores["c1"]) == ["n1", "n3"]
+        assert "c2" not in app.widget_stores
@@ -0,0 +1,170 @@
+"""
+Tests for the metrics and metrics server modules.
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.metrics import MetricsRegistry, Tracer
+from src.metrics_server import create_app
+
+
+class TestMetricsRegistry:
+    """Test cases for the MetricsRegistry class."""
+
+    def test_counter_and_gauge(self):
+        """Test that counters and gauges keep per-label values."""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests", "Requests", ("model",))
+        counter.inc(model="a")
+        counter.inc(2, model="a")
+        gauge = registry.gauge("depth", "Depth")
+        gauge.set(5)
+        gauge.dec()
+        assert counter.value(model="a") == 3
+        assert gauge.value() == 4
+        assert registry.counter("requests", "Requests", ("model",)) is counter
+
+    def test_type_conflict(self):
+        """Test that a name cannot be reused with another metric type."""
+        registry = MetricsRegistry()
+        registry.counter("x", "X")
+        with pytest.raises(ValueError):
+            registry.gauge("x", "X")
+
+    def test_histogram_buckets(self):
+        """Test that histogram buckets are cumulative in the exposition."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        text = registry.render_prometheus()
+        assert "# TYPE latency histogram" in text
+        assert 'latency_bucket{le="0.1"} 1.0' in text
+        assert 'latency_bucket{le="1.0"} 2.0' in text
+        assert 'latency_bucket{le="+Inf"} 3.0' in text
+        assert "latency_count 3.0" in text
+        assert histogram.summary()["count"] == 3
+
+    def test_collectors(self):
+        """Test that collectors are read at scrape time and failures are skipped."""
+        registry = MetricsRegistry()
+        depth = {"text": 1}
+        registry.register_collector(
+            "queue_depth", "Depth", lambda: [({"priority": k}, v) for k, v in depth.items()]
+        )
+        registry.register_collector("broken", "Broken", lambda: 1 / 0)
+        depth["text"] = 7
+        text = registry.render_prometheus()
+        assert 'queue_depth{priority="text"} 7.0' in text
+        assert "broken" not in text
+
+    def test_label_escaping(self):
+        """Test that label values are escaped."""
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ("name",)).inc(name='a"b')
+        assert 'c_total{name="a\\"b"} 1.0' in registry.render_prometheus()
+
+
+class TestTracer:
+    """Test cases for the Tracer class."""
+
+    @pytest.mark.asyncio
+    async def test_trace_records_spans(self):
+        """Test that spans attach to the active trace and feed the histogram."""
+        tracer = Tracer(MetricsRegistry())
+        with tracer.trace("prompt", canvas_id="c1"):
+            with tracer.span("fetch"):
+                await asyncio.sleep(0)
+            with tracer.span("inference"):
+                await asyncio.sleep(0.01)
+        trace = tracer.traces()[0]
+        assert trace["workflow"] == "prompt"
+        assert trace["attributes"] == {"canvas_id": "c1"}
+        assert [s["name"] for s in trace["spans"]] == ["fetch", "inference"]
+        assert trace["spans"][1]["duration_ms"] >= 10
+        assert tracer.stage_seconds.summary(workflow="prompt", stage="inference")["count"] == 1
+
+    def test_errors_are_recorded(self):
+        """Test that failures mark the span and the trace."""
+        tracer = Tracer(MetricsRegistry())
+        with pytest.raises(RuntimeError):
+            with tracer.trace("pdf"):
+                with tracer.span("fetch"):
+                    raise RuntimeError("boom")
+        trace = tracer.traces()[0]
+        assert "boom" in trace["error"]
+        assert "boom" in trace["spans"][0]["error"]
+        assert tracer.trigger_seconds.summary(workflow="pdf", outcome="error")["count"] == 1
+
+    def test_span_without_trace(self):
+        """Test that spans outside a trace are still measured."""
+        tracer = Tracer(MetricsRegistry())
+        with tracer.span("write_back") as span:
+            assert span is None
+        assert tracer.stage_seconds.summary(workflow="none", stage="write_back")["count"] == 1
+
+
+class TestMetricsApp:
+    """Test cases for the metrics HTTP endpoint."""
+
+    def test_endpoints(self):
+        """Test the Prometheus, JSON, traces and status endpoints."""
+        registry = MetricsRegistry()
+        tracer = Tracer(registry)
+        registry.counter("hits", "Hits").inc()
+        with tracer.trace("prompt"):
+            pass
+        client = TestClient(create_app(registry, tracer, get_status=lambda: "Running"))
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "hits_total 1.0" in response.text
+        assert client.get("/metrics.json").json()["hits"]["type"] == "counter"
+        assert client.get("/traces", params={"limit": 1}).json()["traces"][0]["workflow"] == "prompt"
+        assert client.get("/status").json() == {"status": "Running"}
+
+    def test_settings_endpoint(self):
+        """Test that settings changes are forwarded only for known keys."""
+        changes = []
+        client = TestClient(
+            create_app(
+                MetricsRegistry(),
+                on_settings_change=lambda k, v: changes.append((k, v)),
+                settings_token="secret",
+            ),
+            base_url="http://127.0.0.1:9464",
+            headers={"Authorization": "Bearer secret"},
+        )
+        assert client.put("/settings/model", json={"value": "llava"}).status_code == 200
+        assert client.put("/settings/debug", json={"value": "true"}).status_code == 404
+        assert changes == [("model", "llava")]
+
+    def test_settings_endpoint_requires_token_and_local_host(self):
+        """Test that writes without the token or through a foreign Host are rejected."""
+        changes = []
+        app = create_app(
+            MetricsRegistry(),
+            on_settings_change=lambda k, v: changes.append((k, v)),
+            settings_token="secret",
+        )
+        local = TestClient(app, base_url="http://localhost:9464")
+        assert local.put("/settings/model", json={"value": "x"}).status_code == 401
+        assert local.put(
+            "/settings/model", json={"value": "x"}, headers={"Authorization": "Bearer wrong"}
+        ).status_code == 401
+        rebound = TestClient(app, base_url="http://attacker.example:9464")
+        assert rebound.put(
+            "/settings/model", json={"value": "x"}, headers={"Authorization": "Bearer secret"}
+        ).status_code == 403
+        assert changes == []
+        with pytest.raises(ValueError):
+            create_app(MetricsRegistry(), on_settings_change=lambda k, v: None)
+
+    def test_settings_endpoint_disabled(self):
+        """Test that the settings endpoint only exists when a handler is given."""
+        client = TestClient(create_app(MetricsRegistry()))
+        assert client.put("/settings/model", json={"value": "llava"}).status_code in (404, 405)
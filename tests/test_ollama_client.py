@@ -0,0 +1,176 @@
+"""
+Tests for the Ollama client module.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.dedup import SingleFlight
+from src.exceptions import OllamaError
+from src.ollama_client import KeepAlivePolicy, OllamaClient
+from src.resilience import CircuitBreaker, Resilience, RetryPolicy
+
+
+def _generate_response(text="hello", load_ns=0):
+    return {
+        "response": text,
+        "done": True,
+        "load_duration": load_ns,
+        "prompt_eval_duration": 100_000_000,
+        "eval_duration": 500_000_000,
+        "eval_count": 50,
+    }
+
+
+class TestKeepAlivePolicy:
+    """Test cases for the KeepAlivePolicy class."""
+
+    def test_adapts_to_request_gap(self):
+        """Test that keep_alive follows the observed request gap within bounds."""
+        policy = KeepAlivePolicy(minimum=300, maximum=3600, factor=3, alpha=1.0)
+        assert policy.keep_alive("m") == "300s"
+        policy.observe("m", now=0)
+        policy.observe("m", now=10)
+        assert policy.keep_alive("m") == "300s"
+        policy.observe("m", now=610)
+        assert policy.keep_alive("m") == "1800s"
+        policy.observe("m", now=10610)
+        assert policy.keep_alive("m") == "3600s"
+
+
+class TestOllamaClient:
+    """Test cases for the OllamaClient class."""
+
+    @pytest.mark.asyncio
+    async def test_generate_and_metrics(self):
+        """Test generation, keep_alive propagation and load/eval metrics."""
+        payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payloads.append(json.loads(request.content))
+            return httpx.Response(200, json=_generate_response(load_ns=2_000_000_000))
+
+        client = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(handler))
+        assert await client.generate("hi", system="be brief") == "hello"
+        assert payloads[0]["keep_alive"] == "300s"
+        assert payloads[0]["system"] == "be brief"
+        stats = client.stats()["gemma3"]
+        assert stats["cold_loads"] == 1
+        assert stats["load_seconds"] == 2.0
+        assert stats["tokens_per_second"] == 100.0
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_preload_and_ps(self):
+        """Test model preloading and loaded model listing."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/api/ps":
+                return httpx.Response(200, json={"models": [{"name": "gemma3:latest"}]})
+            body = json.loads(request.content)
+            seen.append(body)
+            if body["model"] == "missing":
+                return httpx.Response(404, json={"error": "model not found"})
+            return httpx.Response(200, json={"done": True})
+
+        client = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(handler))
+        await client.preload(["gemma3", "missing"])
+        assert [b["model"] for b in seen] == ["gemma3", "missing"]
+        assert "prompt" not in seen[0]
+        assert await client.loaded_models() == ["gemma3:latest"]
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        """Test that identical concurrent prompts reach Ollama once."""
+        calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, json=_generate_response())
+
+        client = OllamaClient(
+            "http://ollama",
+            "gemma3",
+            single_flight=SingleFlight(),
+            transport=httpx.MockTransport(handler),
+        )
+        results = await asyncio.gather(*(client.generate("same") for _ in range(4)))
+        assert results == ["hello"] * 4
+        assert calls == 1
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_error(self):
+        """Test that API errors raise OllamaError."""
+        client = OllamaClient(
+            "http://ollama",
+            "gemma3",
+            transport=httpx.MockTransport(lambda r: httpx.Response(500, json={"error": "oom"})),
+        )
+        with pytest.raises(OllamaError, match="oom"):
+            await client.generate("hi")
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_generate_is_not_retried(self):
+        """Test that generations fail fast while reads are retried."""
+        paths = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            paths.append(request.url.path)
+            return httpx.Response(503, json={"error": "busy"})
+
+        client = OllamaClient(
+            "http://ollama",
+            "gemma3",
+            transport=httpx.MockTransport(handler),
+            resilience=Resilience(RetryPolicy(max_retries=2, base_delay=0.001, max_delay=0.001)),
+        )
+        with pytest.raises(OllamaError, match="busy"):
+            await client.generate("hi")
+        assert paths == ["/api/generate"]
+        with pytest.raises(Exception):
+            await client.loaded_models()
+        assert paths.count("/api/ps") == 3
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_stream_releases_half_open_trial(self):
+        """Test that closing a stream early or a 4xx frees the trial slot without closing."""
+        status = {"code": 200}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            lines = [{"response": "a", "done": False}, {"response": "b", "done": True}]
+            return httpx.Response(
+                status["code"], content="".join(json.dumps(l) + "\n" for l in lines)
+            )
+
+        resilience = Resilience(failure_threshold=1, reset_timeout=0)
+        client = OllamaClient(
+            "http://ollama", "gemma3",
+            transport=httpx.MockTransport(handler), resilience=resilience,
+        )
+        breaker = resilience.breaker(client._endpoint("/api/generate"))
+        breaker.record_failure()
+        stream = client.generate_stream("hi")
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        status["code"] = 400
+        with pytest.raises(OllamaError):
+            [f async for f in client.generate_stream("hi")]
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        breaker.record_failure()
+        status["code"] = 200
+        assert [f async for f in client.generate_stream("hi")] == ["a", "b"]
+        assert breaker.state == CircuitBreaker.CLOSED
+        await client.close()
@@ -0,0 +1,185 @@
+"""
+Tests for the Ollama pool module, using local stub Ollama servers.
+"""
+
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.config import Config
+from src.dedup import SingleFlight
+from src.ollama_client import OllamaClient
+from src.ollama_pool import OllamaPool, model_name
+from src.resilience import Resilience, RetryPolicy
+
+
+class StubOllama:
+    """Minimal Ollama server processing ``concurrency`` requests at a time."""
+
+    def __init__(self, loaded=(), delay=0.02, concurrency=1):
+        self.loaded = list(loaded)
+        self.delay = delay
+        self.slots = asyncio.Semaphore(concurrency)
+        self.served = 0
+        self.status = 200
+        self.requests = 0
+        app = web.Application()
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/generate", self.generate)
+        self.server = TestServer(app)
+
+    async def start(self) -> str:
+        await self.server.start_server()
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def ps(self, request):
+        return web.json_response({"models": [{"name": name} for name in self.loaded]})
+
+    async def generate(self, request):
+        body = await request.json()
+        self.requests += 1
+        if self.status != 200:
+            return web.json_response({"error": "busy"}, status=self.status)
+        async with self.slots:
+            await asyncio.sleep(self.delay)
+        self.served += 1
+        if model_name(body["model"]) not in self.loaded:
+            self.loaded.append(model_name(body["model"]))
+        return web.json_response(
+            {"response": f"answer {self.served}", "done": True, "eval_count": 10,
+             "eval_duration": 100_000_000, "load_duration": 0}
+        )
+
+
+async def _pool(stubs, **kwargs):
+    urls = [await stub.start() for stub in stubs]
+    return OllamaPool({url: OllamaClient(url, "gemma3") for url in urls}, "gemma3", **kwargs)
+
+
+async def _close(pool, stubs):
+    await pool.close()
+    for stub in stubs:
+        await stub.server.close()
+
+
+class TestOllamaPool:
+    """Test cases for the OllamaPool class."""
+
+    @pytest.mark.asyncio
+    async def test_least_outstanding(self):
+        """Test that concurrent requests are spread across idle hosts."""
+        stubs = [StubOllama(loaded=["gemma3:latest"]) for _ in range(2)]
+        pool = await _pool(stubs)
+        try:
+            await pool.check_health()
+            await asyncio.gather(*(pool.generate(f"q{i}") for i in range(8)))
+        finally:
+            await _close(pool, stubs)
+        assert [stub.served for stub in stubs] == [4, 4]
+
+    @pytest.mark.asyncio
+    async def test_prefers_loaded_model(self):
+        """Test that hosts with the model loaded are preferred when idle."""
+        stubs = [StubOllama(), StubOllama(loaded=["gemma3:latest"])]
+        pool = await _pool(stubs)
+        try:
+            await pool.check_health()
+            for i in range(3):
+                await pool.generate(f"q{i}")
+            # A burst spills onto the cold host once the warm one is busy enough
+            await asyncio.gather(*(pool.generate(f"b{i}") for i in range(6)))
+        finally:
+            await _close(pool, stubs)
+        assert stubs[1].served >= 5
+        assert stubs[0].served >= 1
+
+    @pytest.mark.asyncio
+    async def test_failover(self):
+        """Test that a dead host is skipped and marked unhealthy."""
+        stubs = [StubOllama(), StubOllama()]
+        pool = await _pool(stubs)
+        await stubs[0].server.close()
+        try:
+            results = [await pool.generate(f"q{i}") for i in range(3)]
+            assert all(r.startswith("answer") for r in results)
+            assert stubs[1].served == 3
+            assert pool.backend_stats()[pool.backends[0].url]["healthy"] is False
+            await pool.check_health()
+            assert pool.backends[0].healthy is False
+            assert pool.backends[1].loaded == {"gemma3:latest"}
+        finally:
+            await _close(pool, stubs[1:])
+            await pool.backends[0].client.close()
+
+    @pytest.mark.asyncio
+    async def test_from_config_fails_over_without_retrying(self):
+        """Test that configured hosts fail over at once inside one pool-wide flight."""
+        stubs = [StubOllama(), StubOllama()]
+        urls = [await stub.start() for stub in stubs]
+        stubs[0].status = 503
+        config = Config(ollama_server_url=urls[0], ollama_server_urls=urls[1:])
+        resilience = Resilience(RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.001))
+        flight = SingleFlight()
+        pool = OllamaPool.from_config(config, single_flight=flight, resilience=resilience)
+        try:
+            assert all(b.client.single_flight is None for b in pool.backends)
+            assert (await pool.generate("q")).startswith("answer")
+            assert (stubs[0].requests, stubs[1].requests) == (1, 1)
+            assert resilience.retries == 0
+            assert flight.stats() == {"calls": 1, "coalesced": 0, "inflight": 0}
+        finally:
+            await _close(pool, stubs)
+
+    @pytest.mark.asyncio
+    async def test_coalesces_across_hosts(self):
+        """Test that identical concurrent prompts reach only one host, once."""
+        stubs = [StubOllama(loaded=["gemma3:latest"], delay=0.05) for _ in range(2)]
+        urls = [await stub.start() for stub in stubs]
+        flight = SingleFlight()
+        pool = OllamaPool(
+            {url: OllamaClient(url, "gemma3") for url in urls}, "gemma3", single_flight=flight
+        )
+        try:
+            results = await asyncio.gather(*(pool.generate("same") for _ in range(4)))
+            other = await asyncio.gather(
+                pool.generate("same", options={"temperature": 0}), pool.generate("same")
+            )
+        finally:
+            await _close(pool, stubs)
+        assert len(set(results)) == 1
+        assert stubs[0].served + stubs[1].served == 3
+        assert len(set(other)) == 2
+        assert flight.stats() == {"calls": 6, "coalesced": 3, "inflight": 0}
+
+    @pytest.mark.asyncio
+    async def test_stats_aggregate_hosts(self):
+        """Test that per-model metrics are merged across hosts."""
+        stubs = [StubOllama(loaded=["gemma3:latest"]) for _ in range(2)]
+        pool = await _pool(stubs)
+        try:
+            await asyncio.gather(*(pool.generate(f"q{i}") for i in range(4)))
+        finally:
+            await _close(pool, stubs)
+        assert pool.stats()["gemma3"]["requests"] == 4
+
+    @pytest.mark.asyncio
+    async def test_throughput_scales_with_hosts(self):
+        """Test that throughput grows nearly linearly with the number of hosts."""
+
+        async def run(hosts):
+            stubs = [StubOllama(loaded=["gemma3:latest"], delay=0.08) for _ in range(hosts)]
+            pool = await _pool(stubs)
+            try:
+                await pool.check_health()
+                started = time.monotonic()
+                await asyncio.gather(*(pool.generate(f"q{i}") for i in range(9)))
+                return time.monotonic() - started
+            finally:
+                await _close(pool, stubs)
+
+        single = await run(1)
+        triple = await run(3)
+        assert single / triple > 2.2
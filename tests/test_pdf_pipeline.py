@@ -0,0 +1,145 @@
+"""
+Tests for the PDF summarisation pipeline.
+"""
+
+import asyncio
+import io
+
+import pytest
+
+from src.exceptions import ProcessingError
+from src.pdf_pipeline import (
+    MAP_INSTRUCTION,
+    PdfSummarizer,
+    estimate_tokens,
+    iter_chunks,
+)
+
+
+def _make_pdf(pages):
+    """Build a minimal PDF with one line of Helvetica text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+              % (len(objects) + 1, xref))
+    out.seek(0)
+    return out
+
+
+class TestChunking:
+    """Test cases for token-budgeted chunking."""
+
+    def test_chunks_respect_budget(self):
+        """Test that no chunk exceeds the token budget."""
+        pages = ["word " * 300, "para one\n\npara two", "x" * 5000]
+        chunks = list(iter_chunks(iter(pages), max_tokens=100))
+        assert all(estimate_tokens(text) <= 100 for text, _ in chunks)
+        joined = " ".join(text for text, _ in chunks)
+        assert "para one" in joined and "para two" in joined
+        assert chunks[-1][1] == 3
+
+    def test_small_pages_are_packed(self):
+        """Test that several small pages share one chunk."""
+        chunks = list(iter_chunks(iter(["a", "b", "c"]), max_tokens=100))
+        assert chunks == [("a\nb\nc", 3)]
+
+
+class TestPdfSummarizer:
+    """Test cases for the PdfSummarizer class."""
+
+    @pytest.mark.asyncio
+    async def test_map_reduce(self):
+        """Test parallel map, hierarchical reduce and progress reporting."""
+        active = 0
+        peak = 0
+        calls = {"map": 0, "reduce": 0}
+        progress = []
+
+        async def summarize(instruction, text):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            kind = "map" if instruction == MAP_INSTRUCTION else "reduce"
+            calls[kind] += 1
+            return f"{kind}({len(text.splitlines())})"
+
+        async def report(message):
+            progress.append(message)
+
+        pdf = _make_pdf([f"Page number {i} text" for i in range(20)])
+        summarizer = PdfSummarizer(
+            summarize, parallelism=3, chunk_tokens=8, reduce_fanin=4, progress=report
+        )
+        result = await summarizer.run(pdf)
+
+        assert result.startswith("reduce(")
+        assert calls["map"] == 20
+        assert calls["reduce"] == 7  # 20 maps -> 5 -> 1 + leftover -> 1
+        assert peak <= 3
+        assert progress[-1] == "Summarised 20/20 sections (read 20/20 pages)"
+
+    @pytest.mark.asyncio
+    async def test_single_chunk(self):
+        """Test that a short document needs no reduce step."""
+
+        async def summarize(instruction, text):
+            return "summary"
+
+        summarizer = PdfSummarizer(summarize)
+        assert await summarizer.run(_make_pdf(["Hello"])) == "summary"
+
+    @pytest.mark.asyncio
+    async def test_empty_document(self):
+        """Test that a PDF without text raises ProcessingError."""
+
+        async def summarize(instruction, text):
+            return ""
+
+        with pytest.raises(ProcessingError):
+            await PdfSummarizer(summarize).run(_make_pdf([""]))
+
+    @pytest.mark.asyncio
+    async def test_failure_stops_dispatch(self):
+        """Test that a failed chunk summary stops extraction and further LLM calls."""
+        calls = 0
+
+        async def summarize(instruction, text):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            if calls == 2:
+                raise RuntimeError("model crashed")
+            return "summary"
+
+        summarizer = PdfSummarizer(summarize, parallelism=2, chunk_tokens=8)
+        with pytest.raises(RuntimeError):
+            await summarizer.run(_make_pdf([f"Page number {i} text" for i in range(40)]))
+        assert summarizer.chunks_total < 10
+        assert calls < 10
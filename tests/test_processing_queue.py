@@ -0,0 +1,129 @@
+"""
+Tests for the processing queue module.
+"""
+
+import asyncio
+
+import pytest
+
+from src.exceptions import ProcessingError, ResourceError
+from src.processing_queue import JobPriority, ProcessingScheduler
+
+
+def _recorder(order, label):
+    async def job():
+        order.append(label)
+        return label
+
+    return job
+
+
+class TestProcessingScheduler:
+    """Test cases for the ProcessingScheduler class."""
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """Test that text prompts run before document jobs."""
+        order = []
+        scheduler = ProcessingScheduler(workers=1)
+        scheduler.submit("c1", _recorder(order, "pdf"), JobPriority.DOCUMENT)
+        scheduler.submit("c1", _recorder(order, "image"), JobPriority.IMAGE)
+        last = scheduler.submit("c1", _recorder(order, "text"), JobPriority.TEXT)
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        assert order == ["text", "image", "pdf"]
+        assert last.result() == "text"
+
+    @pytest.mark.asyncio
+    async def test_canvas_fairness(self):
+        """Test round-robin service across canvases at one priority."""
+        order = []
+        scheduler = ProcessingScheduler(workers=1)
+        for i in range(3):
+            scheduler.submit("noisy", _recorder(order, f"noisy{i}"))
+        scheduler.submit("quiet", _recorder(order, "quiet0"))
+        scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        assert order[:2] == ["noisy0", "quiet0"]
+
+    @pytest.mark.asyncio
+    async def test_load_shedding(self):
+        """Test that a full queue rejects with ResourceError."""
+        scheduler = ProcessingScheduler(max_size=2)
+        scheduler.submit("c1", _recorder([], "a"))
+        scheduler.submit("c1", _recorder([], "b"))
+        with pytest.raises(ResourceError):
+            scheduler.submit("c1", _recorder([], "c"))
+        assert scheduler.stats()["rejected"] == 1
+        assert scheduler.stats()["depth_by_priority"]["text"] == 2
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_failure_and_metrics(self):
+        """Test that failures propagate and timings are recorded."""
+
+        async def boom():
+            raise ValueError("boom")
+
+        scheduler = ProcessingScheduler(workers=2)
+        scheduler.start()
+        failed = scheduler.submit("c1", boom)
+        with pytest.raises(ValueError):
+            await failed
+        ok = scheduler.submit("c1", _recorder([], "ok"))
+        assert await ok == "ok"
+        stats = scheduler.stats()
+        assert stats["failed"] == 1
+        assert stats["completed"] == 1
+        assert stats["service_time"]["count"] == 2
+        assert stats["depth"] == 0
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_keeps_worker(self):
+        """Test that a job raising CancelledError fails alone and later jobs still run."""
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        scheduler = ProcessingScheduler(workers=1)
+        scheduler.start()
+        failed = scheduler.submit("c1", cancelled)
+        later = scheduler.submit("c1", _recorder([], "later"))
+        with pytest.raises(ProcessingError):
+            await failed
+        assert await asyncio.wait_for(later, 1) == "later"
+        assert scheduler.stats()["failed"] == 1
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_for_jobs(self):
+        """Test that draining refuses new jobs and waits for queued and running ones."""
+        order = []
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            order.append("slow")
+
+        scheduler = ProcessingScheduler(workers=1)
+        scheduler.start()
+        scheduler.submit("c1", slow)
+        scheduler.submit("c1", _recorder(order, "queued"))
+        assert await scheduler.drain(timeout=1)
+        assert order == ["slow", "queued"]
+        with pytest.raises(ResourceError):
+            scheduler.submit("c1", _recorder(order, "late"))
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_drain_deadline(self):
+        """Test that draining gives up at the deadline and stop cancels the rest."""
+        scheduler = ProcessingScheduler(workers=1)
+        scheduler.start()
+        running = scheduler.submit("c1", lambda: asyncio.sleep(10))
+        queued = scheduler.submit("c1", _recorder([], "queued"))
+        assert not await scheduler.drain(timeout=0.02)
+        await scheduler.stop()
+        assert running.cancelled() and queued.cancelled()
@@ -0,0 +1,272 @@
+"""
+Tests for the resilience module.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.exceptions import (
+    CanvusAPIError,
+    CircuitOpenError,
+    RetryExhaustedError,
+    TimeoutError,
+)
+from src.resilience import (
+    CircuitBreaker,
+    Resilience,
+    RetryPolicy,
+    deadline,
+    hedged,
+    is_retryable,
+    remaining_time,
+)
+
+
+def _layer(max_retries=3, threshold=5, reset=30.0):
+    return Resilience(
+        RetryPolicy(max_retries=max_retries, base_delay=0.001, max_delay=0.002),
+        failure_threshold=threshold,
+        reset_timeout=reset,
+    )
+
+
+class Flaky:
+    """Async callable that fails a number of times before succeeding."""
+
+    def __init__(self, failures, status=503):
+        self.failures = failures
+        self.status = status
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise CanvusAPIError("unavailable", {"status": self.status})
+        return "ok"
+
+
+class TestRetry:
+    """Test cases for retries."""
+
+    def test_is_retryable(self):
+        """Test which errors count as transient."""
+        assert is_retryable(CanvusAPIError("x", {"status": 503}))
+        assert is_retryable(CanvusAPIError("x", {"status": 429}))
+        assert is_retryable(CanvusAPIError("x", {}))
+        assert not is_retryable(CanvusAPIError("x", {"status": 404}))
+        assert not is_retryable(ValueError("x"))
+
+    def test_backoff_is_capped(self):
+        """Test that the jittered delay never exceeds the cap."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+        assert all(0 <= policy.delay(10) <= 4.0 for _ in range(100))
+
+    @pytest.mark.asyncio
+    async def test_retries_until_success(self):
+        """Test that transient failures are retried."""
+        layer = _layer()
+        func = Flaky(2)
+        assert await layer.call("svc", func) == "ok"
+        assert func.calls == 3
+        assert layer.stats()["retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_exhausted(self):
+        """Test that persistent failures raise RetryExhaustedError."""
+        layer = _layer(max_retries=2)
+        func = Flaky(10)
+        with pytest.raises(RetryExhaustedError):
+            await layer.call("svc", func)
+        assert func.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_client_errors_not_retried(self):
+        """Test that 4xx errors are raised immediately."""
+        layer = _layer()
+        func = Flaky(10, status=404)
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", func)
+        assert func.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_disabled(self):
+        """Test that non-idempotent calls make a single attempt."""
+        layer = _layer()
+        func = Flaky(10)
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", func, retry=False)
+        assert func.calls == 1
+
+
+class TestCircuitBreaker:
+    """Test cases for circuit breaking."""
+
+    @pytest.mark.asyncio
+    async def test_opens_and_fails_fast(self):
+        """Test that an open circuit rejects calls without invoking them."""
+        layer = _layer(max_retries=0, threshold=2)
+        func = Flaky(10)
+        for _ in range(2):
+            with pytest.raises(CanvusAPIError):
+                await layer.call("svc", func)
+        with pytest.raises(CircuitOpenError):
+            await layer.call("svc", func)
+        assert func.calls == 2
+        assert layer.stats()["breakers"]["svc"]["state"] == CircuitBreaker.OPEN
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_neutral(self):
+        """Test that 4xx errors neither reset the failure count nor count as failures."""
+        layer = _layer(max_retries=0, threshold=2)
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", Flaky(1))
+        for _ in range(3):
+            with pytest.raises(CanvusAPIError):
+                await layer.call("svc", Flaky(1, status=422))
+        assert layer.breaker("svc").failures == 1
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", Flaky(1))
+        assert layer.breaker("svc").state == CircuitBreaker.OPEN
+
+    @pytest.mark.asyncio
+    async def test_canvus_breaker_per_server(self):
+        """Test that Canvus servers sharing a layer get separate breakers."""
+        layer = _layer(max_retries=0, threshold=1)
+
+        def handler(request):
+            return httpx.Response(503, json={"msg": "busy"})
+
+        clients = [
+            CanvusClient(
+                Config(canvus_server_url=url, canvus_api_key="key"),
+                transport=httpx.MockTransport(handler),
+                resilience=layer,
+            )
+            for url in ("https://a.example.com", "https://b.example.com/")
+        ]
+        try:
+            for client in clients:
+                with pytest.raises(CanvusAPIError):
+                    await client.get_json("/canvases/c1")
+        finally:
+            for client in clients:
+                await client.close()
+        assert sorted(layer.stats()["breakers"]) == [
+            "canvus:https://a.example.com/canvases",
+            "canvus:https://b.example.com/canvases",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_half_open_trial(self):
+        """Test that a successful trial call closes the circuit."""
+        layer = _layer(max_retries=0, threshold=1, reset=0.01)
+        func = Flaky(1)
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", func)
+        await asyncio.sleep(0.02)
+        assert await layer.call("svc", func) == "ok"
+        assert layer.breaker("svc").state == CircuitBreaker.CLOSED
+
+    def test_single_trial_when_half_open(self):
+        """Test that only one call is admitted while half-open."""
+        breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.allow()
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_frees_the_slot(self):
+        """Test that a cancelled half-open trial lets the next call probe again."""
+        layer = _layer(max_retries=0, threshold=1, reset=0)
+        with pytest.raises(CanvusAPIError):
+            await layer.call("svc", Flaky(1))
+
+        async def stalled():
+            await asyncio.sleep(10)
+
+        trial = asyncio.ensure_future(layer.call("svc", stalled))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "ok"
+
+        assert await layer.call("svc", ok) == "ok"
+        assert layer.breaker("svc").state == CircuitBreaker.CLOSED
+
+
+class TestDeadline:
+    """Test cases for deadline propagation."""
+
+    def test_nested_deadline_only_shortens(self):
+        """Test that an inner deadline cannot extend the outer one."""
+        assert remaining_time() is None
+        with deadline(0.5):
+            with deadline(10):
+                assert remaining_time() <= 0.5
+        assert remaining_time() is None
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_retries(self):
+        """Test that retries stop once the deadline would be exceeded."""
+        layer = Resilience(RetryPolicy(max_retries=10, base_delay=1.0, max_delay=1.0))
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        with deadline(0.05):
+            with pytest.raises(TimeoutError):
+                await layer.call("svc", slow)
+
+
+class TestHedging:
+    """Test cases for hedged requests."""
+
+    @pytest.mark.asyncio
+    async def test_hedge_returns_faster_result(self):
+        """Test that a stalled first attempt is overtaken by the hedge."""
+        delays = [1.0, 0.0]
+        cancelled = []
+
+        async def func():
+            delay = delays.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        assert await hedged(func, hedge_delay=0.01) == 0.0
+        await asyncio.sleep(0)
+        assert cancelled == [1.0]
+
+    @pytest.mark.asyncio
+    async def test_canvus_client_retries_get(self):
+        """Test that the Canvus client retries transient GET failures."""
+        calls = []
+
+        def handler(request):
+            calls.append(request.method)
+            if len(calls) == 1:
+                return httpx.Response(503, json={"msg": "busy"})
+            return httpx.Response(200, json={"id": "c1"})
+
+        config = Config(
+            canvus_server_url="https://canvus.example.com", canvus_api_key="key"
+        )
+        client = CanvusClient(
+            config, transport=httpx.MockTransport(handler), resilience=_layer()
+        )
+        try:
+            assert await client.get_json("/canvases/c1") == {"id": "c1"}
+        finally:
+            await client.close()
+        assert calls == ["GET", "GET"]
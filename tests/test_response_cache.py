@@ -0,0 +1,90 @@
+"""
+Tests for the response cache module.
+"""
+
+import time
+
+import pytest
+
+from src.config import Config
+from src.response_cache import ResponseCache, cache_key, default_cache_dir
+
+
+class TestResponseCache:
+    """Test cases for the ResponseCache class."""
+
+    def test_key_components(self):
+        """Test that keys change with model and template version."""
+        key = cache_key("abc123", "gemma3", "v1")
+        assert key == cache_key("abc123", "gemma3", "v1")
+        assert key != cache_key("abc123", "gemma3", "v2")
+        assert key != cache_key("abc123", "llava", "v1")
+
+    def test_hit_miss_and_persistence(self, tmp_path):
+        """Test lookups, counters and reopening the database."""
+        cache = ResponseCache(tmp_path)
+        assert cache.get("k") is None
+        cache.put("k", "summary", "gemma3", "v1")
+        assert cache.get("k") == "summary"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        cache.close()
+
+        reopened = ResponseCache(tmp_path)
+        assert reopened.get("k") == "summary"
+        assert reopened.stats()["bytes"] == len("summary")
+        reopened.close()
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entries are evicted first."""
+        cache = ResponseCache(tmp_path, max_bytes=30)
+        cache.put("a", "x" * 10, "m", "v1")
+        cache.put("b", "x" * 10, "m", "v1")
+        cache.put("c", "x" * 10, "m", "v1")
+        assert cache.get("a") is not None
+        cache.put("d", "x" * 10, "m", "v1")
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["bytes"] <= 30
+        cache.close()
+
+    def test_purge_by_model(self, tmp_path):
+        """Test purging entries for a single model."""
+        cache = ResponseCache(tmp_path)
+        cache.put("a", "1", "gemma3", "v1")
+        cache.put("b", "2", "llava", "v1")
+        assert cache.purge("llava") == 1
+        assert cache.stats()["models"] == {"gemma3": 1}
+        cache.close()
+
+    def test_max_age(self, tmp_path):
+        """Test that entries older than the maximum age count as misses."""
+        cache = ResponseCache(tmp_path)
+        cache.put("k", "answer", "m", "v1")
+        assert cache.get("k", max_age=60) == "answer"
+        time.sleep(0.02)
+        assert cache.get("k", max_age=0.01) is None
+        assert cache.get("k") == "answer"
+        cache.close()
+
+    @pytest.mark.asyncio
+    async def test_get_or_compute(self, tmp_path):
+        """Test that computation only runs on a miss."""
+        cache = ResponseCache(tmp_path)
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            return "result"
+
+        for _ in range(3):
+            assert await cache.get_or_compute("k", compute, "m", "v1") == "result"
+        assert calls == 1
+        cache.close()
+
+    def test_default_location(self, tmp_path):
+        """Test the configured and default cache directories."""
+        assert default_cache_dir(Config(cache_dir=str(tmp_path))) == tmp_path
+        config = Config()
+        assert default_cache_dir(config) == config.get_config_file_path().parent / "cache"
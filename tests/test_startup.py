@@ -0,0 +1,25 @@
+"""
+Tests that application startup does not import heavy optional libraries.
+"""
+
+import json
+import subprocess
+import sys
+
+from benchmarks.bench_startup import HEAVY_MODULES
+
+
+class TestStartupImports:
+    """Test cases for lazy loading of heavy libraries."""
+
+    def test_main_import_is_light(self):
+        """Test that importing the application loads no heavy library."""
+        code = (
+            "import json, sys\n"
+            "import src.main\n"
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        assert json.loads(output.strip().splitlines()[-1]) == []
@@ -0,0 +1,48 @@
+"""
+Tests for the status sink module.
+"""
+
+from loguru import logger
+
+from src.status_sink import LogStatusSink, StatusSink, TrayStatusSink
+
+
+class TestStatusSink:
+    """Test cases for the status sink classes."""
+
+    def test_records_state(self):
+        """Test that the base sink keeps the latest status and valid icon state."""
+        sink = StatusSink()
+        sink.set_status("Running")
+        sink.set_icon_state("processing")
+        sink.set_icon_state("sparkly")
+        assert sink.as_dict() == {"status": "Running", "state": "processing"}
+
+    def test_log_sink_logs_changes_only(self):
+        """Test that the headless sink logs each change once."""
+        messages = []
+        handler = logger.add(messages.append, level="INFO", format="{message}")
+        try:
+            sink = LogStatusSink()
+            sink.start()
+            for status in ("Connecting", "Connecting", "Ready"):
+                sink.set_status(status)
+            sink.set_icon_state("connected")
+            sink.set_icon_state("connected")
+            sink.shutdown()
+        finally:
+            logger.remove(handler)
+        assert [m.record["message"] for m in messages] == [
+            "Status: Connecting",
+            "Status: Ready",
+            "State: connected",
+        ]
+
+    def test_tray_sink_forwards_to_tray(self):
+        """Test that the tray sink updates the tray's tooltip and icon."""
+        sink = TrayStatusSink(on_restart=lambda: None, on_settings_change=lambda k, v: None)
+        sink.set_status("Ready")
+        sink.set_icon_state("error")
+        assert sink.tray.tooltip == "Canvus-Local-LLM: Ready"
+        assert sink.tray.icon_state == "error"
+        sink.shutdown()
@@ -0,0 +1,118 @@
+"""
+Tests for the streaming sink module and Ollama streaming responses.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.ollama_client import OllamaClient
+from src.streaming import INTERRUPTED_SUFFIX, StreamingSink
+
+
+async def _fragments(count):
+    for i in range(count):
+        await asyncio.sleep(0)
+        yield f"t{i} "
+
+
+class TestStreamingSink:
+    """Test cases for the StreamingSink class."""
+
+    @pytest.mark.asyncio
+    async def test_throttled_writes(self):
+        """Test that writes are throttled by token count and end with the full text."""
+        writes = []
+
+        async def write(text):
+            writes.append(text)
+
+        sink = StreamingSink(write, min_interval=60, min_tokens=10)
+        final = await sink.consume(_fragments(35))
+
+        assert final == "".join(f"t{i} " for i in range(35))
+        assert writes[-1] == final
+        assert writes[0] == "t0  ..."
+        assert 3 <= len(writes) <= 5
+        assert sink.time_to_first_visible is not None
+
+    @pytest.mark.asyncio
+    async def test_slow_writer_does_not_block(self):
+        """Test that generation continues while a write is in flight."""
+        writes = []
+
+        async def write(text):
+            await asyncio.sleep(0.05)
+            writes.append(text)
+
+        sink = StreamingSink(write, min_interval=0, min_tokens=1)
+        for i in range(100):
+            await sink.feed("x")
+        assert len(writes) == 0
+        await sink.close()
+        assert writes == ["x ...", "x" * 100]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_generation_is_marked_interrupted(self):
+        """Test that cancelling a stream leaves the partial text marked as interrupted."""
+        writes = []
+
+        async def write(text):
+            writes.append(text)
+
+        async def endless():
+            while True:
+                await asyncio.sleep(0.001)
+                yield "x"
+
+        sink = StreamingSink(write, min_interval=60, min_tokens=1000)
+        task = asyncio.ensure_future(sink.consume(endless()))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert writes[-1] == sink.text + INTERRUPTED_SUFFIX
+
+
+class TestOllamaStreaming:
+    """Test cases for OllamaClient streaming methods."""
+
+    @pytest.mark.asyncio
+    async def test_generate_stream(self):
+        """Test that streamed fragments are yielded and metrics recorded."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert json.loads(request.content)["stream"] is True
+            lines = [{"response": "Hel", "done": False}, {"response": "lo", "done": False},
+                     {"response": "", "done": True, "eval_count": 2, "eval_duration": 10**9}]
+            return httpx.Response(200, content="".join(json.dumps(l) + "\n" for l in lines))
+
+        client = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(handler))
+        fragments = [f async for f in client.generate_stream("hi")]
+        assert fragments == ["Hel", "lo"]
+        assert client.stats()["gemma3"]["tokens_per_second"] == 2.0
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_chat_stream(self):
+        """Test chat streaming into a sink."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            lines = [{"message": {"role": "assistant", "content": c}, "done": False}
+                     for c in ("A", "B", "C")]
+            lines.append({"message": {"role": "assistant", "content": ""}, "done": True})
+            return httpx.Response(200, content="".join(json.dumps(l) + "\n" for l in lines))
+
+        writes = []
+
+        async def write(text):
+            writes.append(text)
+
+        client = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(handler))
+        sink = StreamingSink(write)
+        text = await sink.consume(client.chat_stream([{"role": "user", "content": "hi"}]))
+        assert text == "ABC"
+        assert writes[-1] == "ABC"
+        await client.close()
@@ -0,0 +1,123 @@
+"""
+Tests for the subscription streaming module.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.exceptions import SubscriptionError
+from src.subscription import CanvasSubscription, NDJSONParser, SubscriptionStats
+
+
+def _line(obj) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+
+class TestNDJSONParser:
+    """Test cases for the NDJSONParser class."""
+
+    def test_split_chunks(self):
+        """Test that values split across chunks are reassembled."""
+        parser = NDJSONParser()
+        data = _line({"id": "a"}) + _line({"id": "b"})
+        assert parser.feed(data[:5]) == []
+        assert parser.feed(data[5:20]) == [{"id": "a"}]
+        assert parser.feed(data[20:]) == [{"id": "b"}]
+        assert parser.buffered_bytes == 0
+
+    def test_keepalive_lines(self):
+        """Test that blank keep-alive lines are ignored and counted."""
+        parser = NDJSONParser()
+        assert parser.feed(b"\n\r\n" + _line([{"id": "a"}]) + b"\n") == [[{"id": "a"}]]
+        assert parser.keepalives == 3
+
+    def test_line_size_bound(self):
+        """Test that an unterminated oversized line is rejected."""
+        parser = NDJSONParser(max_line_bytes=16)
+        with pytest.raises(SubscriptionError):
+            parser.feed(b'{"text": "' + b"x" * 32)
+        assert parser.buffered_bytes == 0
+
+    def test_invalid_json(self):
+        """Test that malformed lines are skipped without losing the rest of the chunk."""
+        parser = NDJSONParser()
+        assert parser.feed(b"{not json}\n" + _line({"id": "a"})) == [{"id": "a"}]
+        assert parser.malformed == 1
+
+
+class TestSubscriptionStats:
+    """Test cases for the SubscriptionStats class."""
+
+    def test_rate_and_latency(self):
+        """Test events/sec and parse latency reporting."""
+        stats = SubscriptionStats(rate_window=0.0)
+        stats.record_chunk(100, 10, 0.001)
+        data = stats.as_dict()
+        assert data["events"] == 10
+        assert data["bytes_received"] == 100
+        assert data["events_per_second"] > 0
+        assert data["parse_latency_avg_ms"] == pytest.approx(0.1)
+
+
+class TestCanvasSubscription:
+    """Test cases for the CanvasSubscription class."""
+
+    @pytest.mark.asyncio
+    async def test_dispatch_and_replay_suppression(self):
+        """Test that reconnect snapshots only deliver changed widgets."""
+        received = []
+        connections = []
+
+        async def on_event(canvas_id, widget):
+            received.append((canvas_id, widget["id"], widget.get("text")))
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["subscribe"] == "true"
+            connections.append(request)
+            if len(connections) == 1:
+                body = _line([{"id": "a", "text": "1"}, {"id": "b", "text": "2"}]) + b"\n"
+            else:
+                body = _line([{"id": "a", "text": "1"}, {"id": "b", "text": "3"}])
+                subscription.stop()
+            return httpx.Response(200, content=body)
+
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://canvus"
+        )
+        subscription = CanvasSubscription(client, "c1", on_event, backoff_initial=0.0)
+        await asyncio.wait_for(subscription.run(), timeout=2)
+        await client.aclose()
+
+        assert received == [("c1", "a", "1"), ("c1", "b", "2"), ("c1", "b", "3")]
+        assert subscription.stats.suppressed == 1
+        assert subscription.stats.keepalives == 1
+        assert subscription.stats.reconnects == 1
+
+    @pytest.mark.asyncio
+    async def test_reconnect_on_error_status(self):
+        """Test that HTTP errors trigger a reconnect with backoff."""
+        attempts = []
+
+        async def on_event(canvas_id, widget):
+            subscription.stop()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            attempts.append(request)
+            if len(attempts) < 3:
+                return httpx.Response(503)
+            return httpx.Response(200, content=_line({"id": "a"}))
+
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://canvus"
+        )
+        subscription = CanvasSubscription(
+            client, "c1", on_event, backoff_initial=0.0, backoff_max=0.0
+        )
+        await asyncio.wait_for(subscription.run(), timeout=2)
+        await client.aclose()
+
+        assert len(attempts) == 3
+        assert subscription.stats.reconnects == 2
@@ -0,0 +1,130 @@
+"""
+Tests for the subscription manager module.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.subscription_manager import SubscriptionManager
+
+
+def _client(handler) -> CanvusClient:
+    config = Config(canvus_server_url="http://canvus", canvus_api_key="key")
+    return CanvusClient(config, transport=httpx.MockTransport(handler))
+
+
+def _canvas_id(request: httpx.Request) -> str:
+    return request.url.path.split("/")[4]
+
+
+class TestSubscriptionManager:
+    """Test cases for the SubscriptionManager class."""
+
+    @pytest.mark.asyncio
+    async def test_multiplexed_streams(self):
+        """Test that many canvases share one client and deliver events."""
+        received = {}
+        done = asyncio.Event()
+
+        async def handler(canvas_id, widget):
+            received[canvas_id] = widget["id"]
+            if len(received) == 20:
+                done.set()
+
+        def transport(request: httpx.Request) -> httpx.Response:
+            assert request.headers["Private-Token"] == "key"
+            canvas_id = _canvas_id(request)
+            return httpx.Response(200, content=json.dumps({"id": f"w-{canvas_id}"}) + "\n")
+
+        client = _client(transport)
+        manager = SubscriptionManager(client, handler, max_streams=20)
+        for i in range(20):
+            manager.subscribe(f"c{i}")
+        manager.subscribe("c0")
+        assert len(manager) == 20
+
+        await asyncio.wait_for(done.wait(), timeout=5)
+        assert received["c7"] == "w-c7"
+        assert manager.stats()["subscribed"] == 20
+
+        await manager.close()
+        await client.close()
+        assert len(manager) == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_ceiling(self):
+        """Test that no more than max_streams streams are open at once."""
+        open_streams = 0
+        peak = 0
+
+        async def body():
+            nonlocal open_streams, peak
+            open_streams += 1
+            peak = max(peak, open_streams)
+            try:
+                await asyncio.sleep(0.05)
+                yield b"\n"
+            finally:
+                open_streams -= 1
+
+        async def handler(canvas_id, widget):
+            pass
+
+        client = _client(lambda request: httpx.Response(200, content=body()))
+        manager = SubscriptionManager(client, handler, max_streams=3)
+        for i in range(10):
+            manager.subscribe(f"c{i}")
+        await asyncio.sleep(0.2)
+        await manager.close()
+        await client.close()
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_snapshot_after_queued_events(self):
+        """Test that a replayed state reaches the snapshot handler after earlier events."""
+        calls = []
+        done = asyncio.Event()
+        state = [{"id": "w1"}, {"id": "w2"}]
+        lines = (json.dumps(state) + "\n").encode()
+
+        async def handler(canvas_id, widget):
+            await asyncio.sleep(0.01)
+            calls.append(("event", widget["id"]))
+
+        async def snapshot_handler(canvas_id, widget_ids):
+            calls.append(("snapshot", canvas_id, sorted(widget_ids)))
+            done.set()
+
+        client = _client(lambda request: httpx.Response(200, content=lines))
+        manager = SubscriptionManager(client, handler, snapshot_handler=snapshot_handler)
+        manager.subscribe("c1")
+        stream = manager.subscriptions["c1"]
+        for widget_id in ("w0", "w1"):
+            await stream.queue.put((0.0, {"id": widget_id}))
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await manager.close()
+        await client.close()
+        assert calls[:3] == [("event", "w0"), ("event", "w1"), ("snapshot", "c1", ["w1", "w2"])]
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self):
+        """Test that a stalled handler bounds the per-canvas queue."""
+        release = asyncio.Event()
+        lines = b"".join(json.dumps({"id": f"w{i}"}).encode() + b"\n" for i in range(50))
+
+        async def handler(canvas_id, widget):
+            await release.wait()
+
+        client = _client(lambda request: httpx.Response(200, content=lines))
+        manager = SubscriptionManager(client, handler, queue_size=5)
+        manager.subscribe("c1")
+        await asyncio.sleep(0.1)
+        assert manager.stats()["canvases"]["c1"]["queue_depth"] == 5
+        release.set()
+        await manager.close()
+        await client.close()
@@ -0,0 +1,149 @@
+"""
+Tests for the vision preprocessing module.
+"""
+
+import asyncio
+import base64
+import os
+
+import cv2
+import numpy
+import pytest
+
+from src.exceptions import FileError
+from src.vision_preprocess import (
+    VisionPreprocessor,
+    estimate_skew,
+    run_stages,
+    tile,
+)
+
+
+def _document(width, height, angle=0.0):
+    """Return a BGR image of text lines rotated by ``angle`` degrees."""
+    image = numpy.full((height, width, 3), 255, numpy.uint8)
+    for y in range(40, height - 20, 30):
+        cv2.putText(image, "Canvus sticky note text line", (20, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=(255, 255, 255))
+
+
+def _blocks():
+    """Return the names of the shared memory blocks that exist now."""
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+class TestStages:
+    """Test cases for the individual preprocessing stages."""
+
+    def test_estimate_skew(self):
+        """Test that the skew of rotated text is measured within half a degree."""
+        assert abs(estimate_skew(_document(800, 600))) < 0.5
+        assert abs(estimate_skew(_document(800, 600, angle=4)) + 4) < 0.5
+
+    def test_small_images_are_resized_not_tiled(self):
+        """Test that an image near the model size becomes one fitted image."""
+        [image] = tile(numpy.zeros((1000, 1200, 3), numpy.uint8), target=896)
+        assert image.shape[:2] == (747, 896)
+
+    def test_large_images_are_tiled(self):
+        """Test that a 4K image becomes an overview plus overlapping model-sized crops."""
+        crops = tile(numpy.zeros((2160, 3840, 3), numpy.uint8), target=896, max_tiles=16)
+        overview, tiles = crops[0], crops[1:]
+        assert max(overview.shape[:2]) == 896
+        assert len(tiles) == 15
+        assert all(c.shape[:2] == (896, 896) for c in tiles)
+
+    def test_tile_limit_shrinks_the_image(self):
+        """Test that the number of crops never exceeds ``max_tiles``."""
+        crops = tile(numpy.zeros((4000, 8000, 3), numpy.uint8), target=512, max_tiles=4)
+        assert 1 < len(crops) <= 5
+        assert all(max(c.shape[:2]) <= 512 for c in crops)
+
+    def test_run_stages_outputs_base64_jpeg(self):
+        """Test the full stage sequence on encoded bytes."""
+        ok, png = cv2.imencode(".png", _document(640, 480, angle=3))
+        encoded, size, angle, timings = run_stages(
+            png.tobytes(), target=896, deskew_text=True, normalize=True
+        )
+        assert size == (640, 480)
+        assert abs(angle + 3) < 0.5
+        assert set(timings) == {"decode", "deskew", "normalize", "tile", "encode"}
+        assert base64.b64decode(encoded[0])[:2] == b"\xff\xd8"
+
+    def test_undecodable_bytes(self):
+        """Test that garbage input raises FileError."""
+        with pytest.raises(FileError):
+            run_stages(b"not an image", target=896)
+
+
+class TestVisionPreprocessor:
+    """Test cases for the VisionPreprocessor class."""
+
+    @pytest.mark.asyncio
+    async def test_process_pool_round_trip(self):
+        """Test bytes and array inputs through the worker process and shared memory."""
+        preprocessor = VisionPreprocessor(workers=1, target=512)
+        try:
+            await preprocessor.start()
+            ok, png = cv2.imencode(".png", _document(640, 480))
+            from_bytes = await preprocessor.preprocess(png.tobytes(), normalize=True)
+            rgb = cv2.cvtColor(_document(1200, 400), cv2.COLOR_BGR2RGB)
+            from_array = await preprocessor.preprocess(rgb)
+            with pytest.raises(FileError):
+                await preprocessor.preprocess(b"not an image")
+        finally:
+            await preprocessor.close()
+
+        assert from_bytes.size == (640, 480) and from_bytes.tiles == 0
+        assert from_array.size == (1200, 400) and from_array.tiles == 3
+        image = cv2.imdecode(
+            numpy.frombuffer(base64.b64decode(from_array.images[0]), numpy.uint8),
+            cv2.IMREAD_COLOR,
+        )
+        assert max(image.shape[:2]) == 512
+        stats = preprocessor.stats()
+        assert (stats["processed"], stats["failed"]) == (2, 1)
+        assert stats["stages"]["share"]["count"] == 2
+        assert stats["stages"]["normalize"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_broken_pool_is_replaced(self):
+        """Test that images are processed again after a worker process dies."""
+        preprocessor = VisionPreprocessor(workers=1, target=256)
+        ok, png = cv2.imencode(".png", _document(640, 480))
+        try:
+            await preprocessor.start()
+            broken = preprocessor._pool
+            for process in list(broken._processes.values()):
+                process.kill()
+            result = await preprocessor.preprocess(png.tobytes())
+            assert preprocessor._pool is not broken
+            assert result.size == (640, 480)
+            assert (await preprocessor.preprocess(png.tobytes())).size == (640, 480)
+        finally:
+            await preprocessor.close()
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs POSIX shared memory")
+    async def test_cancelled_results_are_unlinked(self):
+        """Test that a result finished after its caller was cancelled is released."""
+        preprocessor = VisionPreprocessor(workers=1, target=512)
+        ok, png = cv2.imencode(".png", _document(3840, 2160, angle=3))
+        ok, small = cv2.imencode(".png", _document(320, 240))
+        before = _blocks()
+        try:
+            await preprocessor.start()
+            task = asyncio.ensure_future(
+                preprocessor.preprocess(png.tobytes(), deskew_text=True, normalize=True)
+            )
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The single worker takes this image only after finishing the cancelled one
+            await preprocessor.preprocess(small.tobytes())
+            assert not _blocks() - before
+        finally:
+            await preprocessor.close()
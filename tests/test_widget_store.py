@@ -0,0 +1,85 @@
+"""
+Tests for the widget store module.
+"""
+
+import pytest
+
+from src.widget_store import CREATED, DELETED, UPDATED, WidgetRecord, WidgetStore
+
+
+def _note(**fields):
+    widget = {
+        "id": "n1",
+        "widget_type": "Note",
+        "title": "",
+        "text": "hello",
+        "parent_id": "bg",
+        "location": {"x": 0, "y": 0},
+        "size": {"width": 300, "height": 300},
+        "state": "normal",
+    }
+    widget.update(fields)
+    return widget
+
+
+class TestWidgetStore:
+    """Test cases for the WidgetStore class."""
+
+    def test_create_update_delete(self):
+        """Test the lifecycle of change events."""
+        store = WidgetStore("c1")
+        event = store.apply(_note())
+        assert event.kind == CREATED
+        assert event.record.text == "hello"
+
+        event = store.apply(_note(text="{{ question }}"))
+        assert event.kind == UPDATED
+        assert event.fields == frozenset({"text"})
+        assert event.previous == {"text": "hello"}
+        assert store.get("n1").text == "{{ question }}"
+
+        event = store.apply(_note(state="deleted"))
+        assert event.kind == DELETED
+        assert len(store) == 0
+        assert store.apply(_note(state="deleted")) is None
+
+    def test_position_updates_dropped(self):
+        """Test that drag updates are absorbed without events."""
+        store = WidgetStore("c1", drag_window=10.0)
+        store.apply(_note())
+        for i in range(1, 20):
+            assert store.apply(_note(location={"x": i, "y": i})) is None
+        record = store.get("n1")
+        assert (record.x, record.y) == (19, 19)
+        assert store.is_moving("n1")
+        assert store.dropped == 19
+
+    def test_parent_change(self):
+        """Test that ParentID changes are reported."""
+        store = WidgetStore("c1")
+        store.apply(_note())
+        event = store.apply(_note(parent_id="pdf-1", location={"x": 5, "y": 5}))
+        assert event.fields == frozenset({"parent_id"})
+        assert not store.is_moving("other")
+
+    def test_retain(self):
+        """Test that widgets missing from a full state are forgotten."""
+        store = WidgetStore("c1")
+        for i in range(3):
+            store.apply(_note(id=f"n{i}"))
+        assert store.retain(["n0", "n2", "other"]) == 1
+        assert sorted(record.id for record in store) == ["n0", "n2"]
+
+    def test_memory_stats(self):
+        """Test memory-per-widget reporting."""
+        store = WidgetStore("c1")
+        for i in range(100):
+            store.apply(_note(id=f"n{i}"))
+        stats = store.memory_stats()
+        assert stats["widgets"] == 100
+        assert 0 < stats["bytes_per_widget"] < 2000
+
+    def test_record_slots(self):
+        """Test that records do not carry a per-instance __dict__."""
+        with pytest.raises(AttributeError):
+            WidgetRecord("w").unknown = 1
@@ -0,0 +1,458 @@
+"""
+Tests for the trigger workflows module.
+"""
+
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+from PIL import Image
+
+from src import workflows
+from src.batching import PromptBatcher
+from src.canvus_client import API_PREFIX, CanvusClient
+from src.config import Config
+from src.image_fetch import ImageFetcher
+from src.job_journal import JobJournal
+from src.metrics import TRACER
+from src.ollama_client import OllamaClient
+from src.pdf_pipeline import MAP_INSTRUCTION
+from src.processing_queue import ProcessingScheduler
+from src.response_cache import ResponseCache
+from src.vision_preprocess import VisionPreprocessor
+from src.widget_store import WidgetStore
+from src.workflows import (
+    CANVAS,
+    OCR_PROMPT,
+    PDF,
+    PROCESSING_TITLE,
+    SNAPSHOT,
+    TEXT,
+    WorkflowRunner,
+    detect_trigger,
+    translucent,
+)
+from src.write_back import WriteBack
+from tests.test_pdf_pipeline import _make_pdf
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (255, 255, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FakeCanvus:
+    """Canvus stand-in serving one PDF, one asset and a widget list."""
+
+    def __init__(self, pdf=b"", asset=b"", widgets=(), mipmaps=None):
+        self.pdf = pdf
+        self.asset = asset
+        self.mipmaps = mipmaps
+        self.widgets = list(widgets)
+        self.requests = []
+        self.timeouts = []
+        self.notes = {}
+        self.created = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        method = request.method
+        path = request.url.path[len(API_PREFIX):]
+        body = json.loads(request.content) if request.content else None
+        self.requests.append((method, path, body))
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        if method == "POST":
+            self.created += 1
+            note_id = f"note-{self.created}"
+            self.notes[note_id] = dict(body, id=note_id)
+            return httpx.Response(200, json=self.notes[note_id])
+        if method == "PATCH":
+            note = self.notes.setdefault(path.rsplit("/", 1)[1], {})
+            note.update(body)
+            return httpx.Response(200, json=note)
+        if method == "DELETE":
+            return httpx.Response(200)
+        if path.endswith("/download"):
+            return httpx.Response(200, content=self.pdf)
+        if path.endswith("/widgets"):
+            return httpx.Response(200, json=self.widgets)
+        if path.startswith("/mipmaps/"):
+            if self.mipmaps is None:
+                return httpx.Response(501, json={"msg": "no mipmaps"})
+            if path.count("/") == 2:
+                return httpx.Response(200, json=self.mipmaps)
+            return httpx.Response(200, content=self.asset)
+        if path.startswith("/assets/"):
+            return httpx.Response(200, content=self.asset)
+        if "/pdfs/" in path:
+            return httpx.Response(200, json={"id": path.rsplit("/", 1)[1], "hash": "pdf-hash"})
+        return httpx.Response(404, json={"msg": "not found"})
+
+    def patches(self, widget_id):
+        return [body for method, path, body in self.requests
+                if method == "PATCH" and path.endswith(f"/{widget_id}")]
+
+
+class FakeOllama:
+    """Ollama stand-in streaming or returning a canned answer."""
+
+    def __init__(self, status=200, hang_after=None):
+        self.status = status
+        self.hang_after = hang_after
+        self.requests = []
+        self.timeouts = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.requests.append(body)
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        if self.hang_after is not None and len(self.requests) > self.hang_after:
+            await asyncio.Event().wait()
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": "model crashed"})
+        if body["stream"]:
+            lines = [{"response": "Hel", "done": False}, {"response": "lo", "done": False},
+                     {"response": "", "done": True}]
+            return httpx.Response(200, content="".join(json.dumps(l) + "\n" for l in lines))
+        return httpx.Response(200, json={"response": f"answer {len(self.requests)}", "done": True})
+
+
+def _runner(tmp_path, canvus, ollama, batching=False, **settings):
+    config = Config(
+        canvus_server_url="http://canvus", canvus_api_key="key",
+        pdf_chunk_tokens=8, vision_input_size=256, vision_max_tiles=4,
+        stream_write_interval_ms=1, stream_write_tokens=1, **settings,
+    )
+    client = CanvusClient(config, transport=httpx.MockTransport(canvus.handle))
+    llm = OllamaClient("http://ollama", "gemma3", transport=httpx.MockTransport(ollama.handle))
+    scheduler = ProcessingScheduler(workers=2)
+    scheduler.start()
+    return WorkflowRunner(
+        config, client, llm, scheduler, JobJournal(tmp_path), ResponseCache(tmp_path / "cache"),
+        WriteBack(client, window=0.005, rate=1000, burst=100), ImageFetcher(client),
+        VisionPreprocessor(workers=1, target=256),
+        batcher=PromptBatcher(llm, window=0.005) if batching else None,
+    )
+
+
+async def _close(runner):
+    await runner.scheduler.stop()
+    await runner.write_back.close()
+    await runner.vision.close()
+    runner.journal.close()
+    runner.cache.close()
+    await runner.client.close()
+    await runner.llm.close()
+
+
+def _record(store, **widget):
+    widget.setdefault("location", {"x": 100.0, "y": 50.0})
+    widget.setdefault("size", {"width": 300.0, "height": 200.0})
+    return store.apply(widget).record
+
+
+class TestDetectTrigger:
+    """Test cases for trigger detection."""
+
+    def test_kinds(self):
+        """Test that each PRD trigger is recognised and other widgets are not."""
+        store = WidgetStore("c1")
+        _record(store, id="pdf", widget_type="Pdf")
+        _record(store, id="bg", widget_type="CanvasBackground")
+        _record(store, id="other", widget_type="Note")
+        cases = [
+            ({"widget_type": "Note", "text": "{{ what is this? }}"}, TEXT),
+            ({"widget_type": "Note", "text": "{{ unfinished"}, None),
+            ({"widget_type": "Image", "title": "AI_Icon_PDF_Precis", "parent_id": "pdf"}, PDF),
+            ({"widget_type": "Image", "title": "AI_Icon_PDF_Precis", "parent_id": "other"}, None),
+            ({"widget_type": "Image", "title": "AI_Icon_Canvus_Precis", "parent_id": "bg"}, CANVAS),
+            ({"widget_type": "Image", "title": "AI_Icon_Canvus_Precis"}, None),
+            ({"widget_type": "Image", "title": "Snapshot at 10:42"}, SNAPSHOT),
+            ({"widget_type": "Image", "title": "A dog"}, None),
+        ]
+        for i, (widget, kind) in enumerate(cases):
+            assert detect_trigger(_record(store, id=f"w{i}", **widget), store) == kind, widget
+
+    def test_translucent(self):
+        """Test that response colours keep their RGB and get a 66% alpha."""
+        assert translucent("#336699ff") == "#336699a8"
+        assert translucent("#336699") == "#336699a8"
+        assert translucent(None) is None
+
+
+class TestWorkflowRunner:
+    """Test cases for the WorkflowRunner class."""
+
+    @pytest.mark.asyncio
+    async def test_text_streams_answer_into_response_note(self, tmp_path):
+        """Test the text workflow from trigger note to completed response note."""
+        canvus, ollama = FakeCanvus(), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="n1", widget_type="Note", title="Q",
+                         text="{{ Say hello }}", background_color="#336699ff", parent_id="bg")
+        try:
+            assert await runner.dispatch("c1", record, TEXT, "job-1") == "Hello"
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+
+        [created] = [body for method, _, body in canvus.requests if method == "POST"]
+        assert created["background_color"] == "#336699a8"
+        assert created["parent_id"] == "bg" and created["location"] == {"x": 420.0, "y": 50.0}
+        assert canvus.patches("n1")[0] == {"text": "Say hello", "title": PROCESSING_TITLE}
+        assert canvus.patches("n1")[-1] == {"title": "Q"}
+        assert canvus.notes["note-1"]["text"] == "Hello"
+        assert [r["stream"] for r in ollama.requests] == [True]
+        assert ollama.requests[0]["prompt"] == "Say hello"
+        assert JobJournal(tmp_path).is_complete("job-1")
+
+    @pytest.mark.asyncio
+    async def test_calls_are_clipped_to_the_job_budget(self, tmp_path):
+        """Test that every Ollama and Canvus call of a job times out within its budget."""
+        canvus, ollama = FakeCanvus(), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama, job_timeout_ms=2000)
+        store = WidgetStore("c1")
+        record = _record(store, id="n1", widget_type="Note", text="{{ Say hello }}")
+        try:
+            assert await runner.dispatch("c1", record, TEXT, "job-1") == "Hello"
+            await runner.write_back.flush()
+            outside = len(canvus.timeouts)
+            await runner.client.get_json("/canvases/c1/widgets")
+        finally:
+            await _close(runner)
+        assert ollama.timeouts and all(0 < t <= 2.0 for t in ollama.timeouts)
+        # Including the coalesced PATCHes sent after the job's own task went on
+        assert outside > 2 and all(0 < t <= 2.0 for t in canvus.timeouts[:outside])
+        assert canvus.timeouts[outside:] == [30.0]
+
+    @pytest.mark.asyncio
+    async def test_identical_prompt_is_answered_from_cache(self, tmp_path):
+        """Test that a second trigger with the same prompt makes no Ollama request."""
+        canvus, ollama = FakeCanvus(), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        try:
+            for i in range(2):
+                record = _record(store, id=f"n{i}", widget_type="Note", text="{{ Say hello }}")
+                assert await runner.dispatch("c1", record, TEXT, f"job-{i}") == "Hello"
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        assert len(ollama.requests) == 1
+        assert canvus.notes["note-2"]["text"] == "Hello"
+        assert (runner.cache.hits, runner.cache.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_cached_answer_depends_on_options_and_expires(self, tmp_path, monkeypatch):
+        """Test that text answers are keyed on generation options and not cached at 0 hours."""
+        canvus, ollama = FakeCanvus(), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+
+        async def ask(job_id):
+            record = _record(store, id=job_id, widget_type="Note", text="{{ Say hello }}")
+            return await runner.dispatch("c1", record, TEXT, job_id)
+
+        try:
+            await ask("job-1")
+            monkeypatch.setitem(workflows.TEXT_OPTIONS, "temperature", 0)
+            await ask("job-2")
+            await ask("job-3")
+            runner.config.text_cache_hours = 0
+            await ask("job-4")
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        assert [r.get("options") for r in ollama.requests] == [
+            None, {"temperature": 0}, {"temperature": 0}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_short_prompts_are_batched(self, tmp_path):
+        """Test that with batching enabled short prompts go through the batcher."""
+        canvus, ollama = FakeCanvus(), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama, batching=True)
+        store = WidgetStore("c1")
+        try:
+            futures = [
+                runner.dispatch("c1", _record(store, id=f"n{i}", widget_type="Note",
+                                              text=f"{{{{ q{i} }}}}"), TEXT, f"job-{i}")
+                for i in range(2)
+            ]
+            for future in futures:
+                await future
+        finally:
+            await _close(runner)
+        assert runner.batcher.stats()["batched"] == 2
+        assert [r["stream"] for r in ollama.requests] == [False, False]
+
+    @pytest.mark.asyncio
+    async def test_pdf_precis(self, tmp_path):
+        """Test that a PDF icon downloads its parent PDF and writes a precis note."""
+        pdf = _make_pdf([f"Page number {i} text" for i in range(4)]).getvalue()
+        canvus, ollama = FakeCanvus(pdf=pdf), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="icon", widget_type="Image",
+                         title="AI_Icon_PDF_Precis", parent_id="pdf-1")
+        try:
+            summary = await runner.dispatch("c1", record, PDF, "job-pdf")
+            calls = len(ollama.requests)
+            again = _record(store, id="icon-2", widget_type="Image",
+                            title="AI_Icon_PDF_Precis", parent_id="pdf-1")
+            assert await runner.dispatch("c1", again, PDF, "job-pdf-2") == summary
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        # The second icon on the same document is answered from the cache
+        assert canvus.requests.count(("GET", "/canvases/c1/pdfs/pdf-1/download", None)) == 1
+        assert len(ollama.requests) == calls > 4
+        assert canvus.notes["note-1"]["text"] == summary == f"answer {len(ollama.requests)}"
+        assert canvus.notes["note-1"]["parent_id"] == "pdf-1"
+
+    @pytest.mark.asyncio
+    async def test_interrupted_pdf_resumes_on_the_next_start(self, tmp_path):
+        """Test that a PDF job killed mid-way resumes from its journalled chunks."""
+        pdf = _make_pdf([f"Page number {i} text" for i in range(6)]).getvalue()
+        canvus, hanging = FakeCanvus(pdf=pdf), FakeOllama(hang_after=2)
+        runner = _runner(tmp_path, canvus, hanging)
+        store = WidgetStore("c1")
+        record = _record(store, id="icon", widget_type="Image",
+                         title="AI_Icon_PDF_Precis", parent_id="pdf-1")
+        future = runner.dispatch("c1", record, PDF, "job-pdf")
+        while len(hanging.requests) < 3:
+            await asyncio.sleep(0.01)
+        await runner.journal.flush()
+        # The process dies: running jobs are cancelled, nothing is completed
+        await _close(runner)
+        assert future.cancelled()
+
+        ollama = FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        try:
+            [state] = runner.journal.incomplete()
+            assert {"note", "map:0", "map:1"} <= set(state.stages)
+            assert runner.resume() == 1
+            while runner.running:
+                await asyncio.sleep(0.01)
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        maps = [r for r in ollama.requests if r.get("system") == MAP_INSTRUCTION]
+        assert len(maps) == 4
+        assert [method for method, _, _ in canvus.requests].count("POST") == 1
+        assert canvus.notes["note-1"]["text"] == f"answer {len(ollama.requests)}"
+        journal = JobJournal(tmp_path)
+        assert journal.is_complete("job-pdf") and journal.incomplete() == []
+        journal.close()
+
+    @pytest.mark.asyncio
+    async def test_canvas_precis(self, tmp_path):
+        """Test that a canvas icon summarises the widgets of its canvas."""
+        widgets = [
+            {"id": "a1", "widget_type": "Anchor", "anchor_name": "Ideas",
+             "location": {"x": 0, "y": 0}, "size": {"width": 1000, "height": 1000}},
+            {"id": "n1", "widget_type": "Note", "text": "Idea one",
+             "location": {"x": 10, "y": 10}, "size": {"width": 100, "height": 100}},
+            {"id": "n2", "widget_type": "Note", "text": "Loose idea",
+             "location": {"x": 5000, "y": 0}, "size": {"width": 100, "height": 100}},
+        ]
+        canvus, ollama = FakeCanvus(widgets=widgets), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="icon", widget_type="Image",
+                         title="AI_Icon_Canvus_Precis", parent_id="bg")
+        try:
+            summary = await runner.dispatch("c1", record, CANVAS, "job-canvas")
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        # Two regions and the overview
+        assert len(ollama.requests) == 3
+        assert "Idea one" in "".join(r["prompt"] for r in ollama.requests)
+        assert canvus.notes["note-1"]["text"] == summary
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_replaced_by_its_text(self, tmp_path):
+        """Test that a snapshot is preprocessed, read and deleted."""
+        canvus, ollama = FakeCanvus(asset=_png(640, 480)), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="snap", widget_type="Image",
+                         title="Snapshot at 10:42", hash="abc123")
+        try:
+            text = await runner.dispatch("c1", record, SNAPSHOT, "job-snap")
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        [request] = ollama.requests
+        # Fetched at the model's input size, so it is not tiled
+        assert request["prompt"] == OCR_PROMPT and len(request["images"]) == 1
+        assert runner.vision.stats()["processed"] == 1
+        assert canvus.notes["note-1"]["text"] == text
+        assert canvus.notes["note-1"]["location"] == {"x": 100.0, "y": 50.0}
+        assert canvus.requests[-1][:2] == ("DELETE", "/canvases/c1/images/snap")
+
+    @pytest.mark.asyncio
+    async def test_4k_snapshot_uses_a_smaller_mipmap(self, tmp_path):
+        """Test that a 4K snapshot is read from a mipmap level near the model input size."""
+        info = {"resolution": {"width": 3840, "height": 2160}, "max_level": 4}
+        canvus, ollama = FakeCanvus(asset=_png(480, 270), mipmaps=info), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="snap", widget_type="Image",
+                         title="Snapshot at 10:42", hash="abc123")
+        try:
+            await runner.dispatch("c1", record, SNAPSHOT, "job-snap")
+        finally:
+            await _close(runner)
+        [level] = [int(path.rsplit("/", 1)[1]) for method, path, _ in canvus.requests
+                   if path.startswith("/mipmaps/abc123/")]
+        # 480 px wide, the smallest level still at least the 256 px model input
+        assert level == 3
+
+    @pytest.mark.asyncio
+    async def test_failure_is_shown_and_journalled(self, tmp_path):
+        """Test that a failed workflow writes the error and is not resumed."""
+        canvus, ollama = FakeCanvus(), FakeOllama(status=500)
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        record = _record(store, id="n1", widget_type="Note", text="{{ hi }}")
+        try:
+            with pytest.raises(Exception):
+                await runner.dispatch("c1", record, TEXT, "job-1")
+            await runner.write_back.flush()
+        finally:
+            await _close(runner)
+        assert canvus.notes["note-1"]["text"].startswith("Error: ")
+        assert runner.scheduler.failed == 1
+        journal = JobJournal(tmp_path)
+        assert not journal.is_complete("job-1") and journal.incomplete() == []
+
+    @pytest.mark.asyncio
+    async def test_stage_spans_nest_in_the_trigger_trace(self, tmp_path):
+        """Test that each accepted trigger gets a trace holding its stage spans."""
+        canvus, ollama = FakeCanvus(asset=_png(640, 480)), FakeOllama()
+        runner = _runner(tmp_path, canvus, ollama)
+        store = WidgetStore("c1")
+        note = _record(store, id="n1", widget_type="Note", text="{{ Say hello }}")
+        snapshot = _record(store, id="snap", widget_type="Image",
+                           title="Snapshot at 10:42", hash="abc123")
+        try:
+            await runner.dispatch("c1", note, TEXT, "job-text")
+            await runner.dispatch("c1", snapshot, SNAPSHOT, "job-snap")
+        finally:
+            await _close(runner)
+
+        snap, text = TRACER.traces(limit=2)
+        assert (text["workflow"], text["attributes"]["widget"]) == (TEXT, "n1")
+        assert (snap["workflow"], snap["attributes"]["widget"]) == (SNAPSHOT, "snap")
+        assert {"inference", "write_back"} <= {span["name"] for span in text["spans"]}
+        assert {"fetch", "preprocess", "inference"} <= {span["name"] for span in snap["spans"]}
+        for trace in (text, snap):
+            for span in trace["spans"]:
+                assert 0 <= span["offset_ms"]
+                assert span["offset_ms"] + span["duration_ms"] <= trace["duration_ms"] + 0.01
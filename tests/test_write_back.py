@@ -0,0 +1,173 @@
+"""
+Tests for the write-back module.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from src.canvus_client import CanvusClient
+from src.config import Config
+from src.resilience import Resilience, deadline
+from src.write_back import TokenBucket, WriteBack
+
+
+class RecordingCanvus:
+    """Canvus stand-in recording every request it receives."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else None
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        self.requests.append((request.method, request.url.path, body))
+        if request.method == "DELETE":
+            return httpx.Response(200)
+        return httpx.Response(200, json=body or {})
+
+    def client(self, resilience=None) -> CanvusClient:
+        config = Config(canvus_server_url="http://canvus", canvus_api_key="key")
+        return CanvusClient(
+            config, transport=httpx.MockTransport(self.handle), resilience=resilience
+        )
+
+
+class TestTokenBucket:
+    """Test cases for the TokenBucket class."""
+
+    @pytest.mark.asyncio
+    async def test_paces_after_burst(self):
+        """Test that requests beyond the burst are paced at the configured rate."""
+        bucket = TokenBucket(rate=100, burst=5)
+        started = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        elapsed = time.monotonic() - started
+        assert 0.08 <= elapsed < 0.5
+        assert bucket.waited > 0
+
+
+class TestWriteBack:
+    """Test cases for the WriteBack class."""
+
+    @pytest.mark.asyncio
+    async def test_coalesces_patches(self):
+        """Test that PATCHes to one widget within the window become one request."""
+        canvus = RecordingCanvus()
+        writer = WriteBack(canvus.client(), window=0.02)
+        path = "/canvases/c1/notes/n1"
+        results = await asyncio.gather(
+            writer.patch(path, {"text": "a"}),
+            writer.patch(path, {"background_color": "#ff0000"}),
+            writer.patch(path, {"text": "b"}),
+        )
+        await writer.close()
+        await writer.client.close()
+
+        assert canvus.requests == [
+            ("PATCH", "/api/v1" + path, {"text": "b", "background_color": "#ff0000"})
+        ]
+        assert all(result == {"text": "b", "background_color": "#ff0000"} for result in results)
+        assert writer.stats()["coalesced"] == 2
+
+    @pytest.mark.asyncio
+    async def test_merged_patch_runs_under_latest_deadline(self):
+        """Test that a merged PATCH outlives the shorter of its callers' deadlines."""
+        canvus = RecordingCanvus(delay=0.05)
+        writer = WriteBack(canvus.client(Resilience()), window=0.01)
+        path = "/canvases/c1/notes/n1"
+
+        async def patch(seconds, fields):
+            with deadline(seconds):
+                return await writer.patch(path, fields)
+
+        results = await asyncio.gather(patch(0.03, {"text": "a"}), patch(5, {"title": "t"}))
+        await writer.close()
+        await writer.client.close()
+
+        assert results == [{"text": "a", "title": "t"}] * 2
+        assert len(canvus.requests) == 1
+        assert writer.stats()["sent"] == 1
+
+    @pytest.mark.asyncio
+    async def test_writes_to_one_widget_stay_ordered(self):
+        """Test that a later PATCH is not sent before an earlier one completes."""
+        canvus = RecordingCanvus(delay=0.03)
+        writer = WriteBack(canvus.client(), window=0)
+        path = "/canvases/c1/notes/n1"
+        first = asyncio.ensure_future(writer.patch(path, {"text": "first"}))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(writer.patch(path, {"text": "second"}))
+        await asyncio.gather(first, second)
+        await writer.client.close()
+
+        assert [body["text"] for _, _, body in canvus.requests] == ["first", "second"]
+        assert canvus.max_active == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_supersedes_pending_patches(self):
+        """Test that a DELETE drops PATCHes to the same widget not yet sent."""
+        canvus = RecordingCanvus()
+        writer = WriteBack(canvus.client(), window=10)
+        path = "/canvases/c1/notes/snapshot"
+        pending = asyncio.ensure_future(writer.patch(path, {"text": "x"}))
+        await asyncio.sleep(0)
+        await writer.delete(path)
+        assert await pending is None
+        await writer.close()
+        await writer.client.close()
+
+        assert [method for method, _, _ in canvus.requests] == ["DELETE"]
+
+    @pytest.mark.asyncio
+    async def test_delete_after_flush_waits_for_the_patch(self):
+        """Test that a DELETE issued right after a flush is sent after the PATCH."""
+        canvus = RecordingCanvus(delay=0.01)
+        writer = WriteBack(canvus.client(), window=10)
+        path = "/canvases/c1/notes/n1"
+        pending = asyncio.ensure_future(writer.patch(path, {"text": "x"}))
+        await asyncio.sleep(0)
+        writer._flush(path)
+        await writer.delete(path)
+        await pending
+        await writer.client.close()
+
+        assert [method for method, _, _ in canvus.requests] == ["PATCH", "DELETE"]
+
+    @pytest.mark.asyncio
+    async def test_creates_run_concurrently(self):
+        """Test that creates overlap up to the concurrency limit."""
+        canvus = RecordingCanvus(delay=0.02)
+        writer = WriteBack(canvus.client(), concurrency=3)
+        await asyncio.gather(
+            *(writer.create("/canvases/c1/notes", {"text": str(i)}) for i in range(9))
+        )
+        await writer.client.close()
+
+        assert len(canvus.requests) == 9
+        assert canvus.max_active == 3
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending(self):
+        """Test that close sends PATCHes still inside their window."""
+        canvus = RecordingCanvus()
+        writer = WriteBack(canvus.client(), window=10)
+        pending = asyncio.ensure_future(writer.patch("/canvases/c1/notes/n1", {"text": "x"}))
+        await asyncio.sleep(0)
+        await writer.close()
+        await writer.client.close()
+
+        assert await pending == {"text": "x"}
+        assert len(canvus.requests) == 1